@@ -0,0 +1,111 @@
+"""Summarises recorded game sessions per scene and per player.
+
+Measures every session file written by `ww.py --record` (see
+game.session_analysis.session_metrics) on a pool of worker processes, and reports the
+aggregates per scene and per player as text tables, or as CSV files with --output:
+
+    python analyze_sessions.py sessions/ --output summary/
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import math
+import os
+import pathlib
+import sys
+
+from game.session_analysis import SUMMARY_COLUMNS, session_metrics, summarize
+from game.session_recorder import SESSION_EXTENSION
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "paths",
+        nargs="+",
+        help="session files, or directories to search for them recursively",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="worker processes (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--output",
+        metavar="DIR",
+        help="write per_scene.csv and per_player.csv to DIR instead of printing tables",
+    )
+    return parser.parse_args()
+
+
+def find_sessions(paths):
+    sessions = []
+    for path in map(pathlib.Path, paths):
+        if path.is_dir():
+            sessions.extend(sorted(path.rglob(f"*{SESSION_EXTENSION}")))
+        else:
+            sessions.append(path)
+    return [str(session) for session in sessions]
+
+
+def _measure(path):
+    try:
+        return session_metrics(path)
+    except (OSError, ValueError, KeyError) as error:
+        return {"path": path, "error": str(error)}
+
+
+def _format(value):
+    if isinstance(value, float):
+        return "-" if math.isnan(value) else f"{value:.2f}"
+    return str(value)
+
+
+def print_table(rows, key):
+    columns = (key,) + SUMMARY_COLUMNS
+    cells = [columns]
+    cells.extend(tuple(_format(row[column]) for column in columns) for row in rows)
+    widths = [max(len(line[index]) for line in cells) for index in range(len(columns))]
+    for line in cells:
+        text = "  ".join(cell.ljust(width) for cell, width in zip(line, widths))
+        print(text.rstrip())
+
+
+def write_csv(rows, key, path):
+    with open(path, "w", encoding="utf8", newline="") as writer:
+        table = csv.DictWriter(writer, fieldnames=(key,) + SUMMARY_COLUMNS)
+        table.writeheader()
+        table.writerows(rows)
+
+
+def main():
+    args = parse_args()
+    paths = find_sessions(args.paths)
+    if not paths:
+        sys.exit("no session files found")
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        # Large chunks keep the per file overhead of the pool down on big archives
+        chunksize = max(1, len(paths) // (4 * args.workers))
+        results = list(executor.map(_measure, paths, chunksize=chunksize))
+
+    metrics = [result for result in results if "error" not in result]
+    for result in results:
+        if "error" in result:
+            print(f"skipped {result['path']}: {result['error']}", file=sys.stderr)
+
+    tables = {key: summarize(metrics, key) for key in ("scene", "player")}
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+        for key, rows in tables.items():
+            write_csv(rows, key, os.path.join(args.output, f"per_{key}.csv"))
+    else:
+        for key, rows in tables.items():
+            print(f"{len(metrics)} sessions per {key}:")
+            print_table(rows, key)
+            print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+"""Headless frame loop benchmark for every screen.
+
+Runs each screen under SDL's dummy video driver for a fixed number of frames, driven by a
+scripted mouse and synthetic gaze stream, and writes per-frame timing percentiles, a
+breakdown of where the frame time goes (event handling, UI.render, surface scaling and
+presenting), per-frame allocations and the frame scheduler's own statistics as JSON. The
+screens never drop to their idle frame rate while benchmarked. The "flip"
+section covers both pygame.display.flip and the pygame.display.update calls made when
+only dirty rectangles are pushed.
+
+    python benchmark.py --frames 300 --output bench.json
+    python benchmark.py --baseline bench.json --tolerance 0.15
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np  # pylint: disable=wrong-import-position
+import pygame  # pylint: disable=wrong-import-position
+import pygame.freetype  # pylint: disable=wrong-import-position
+
+from game import ui  # pylint: disable=wrong-import-position
+from game.adhawk_control import AdHawkControl  # pylint: disable=wrong-import-position
+from game.assets import assets  # pylint: disable=wrong-import-position
+from game.frame_scheduler import (  # pylint: disable=wrong-import-position
+    frame_scheduler,
+)
+from game.gaze_source import (
+    SyntheticGazeSource,
+)  # pylint: disable=wrong-import-position
+from game.level_selector import LevelSelector  # pylint: disable=wrong-import-position
+from game.play_game import PlayGame  # pylint: disable=wrong-import-position
+from game.renderer import Renderer  # pylint: disable=wrong-import-position
+from game.scene_manager import scene_manager  # pylint: disable=wrong-import-position
+from game.scenes import load_scenes  # pylint: disable=wrong-import-position
+from game.title_screen import TitleScreen  # pylint: disable=wrong-import-position
+from ww import generate_cursor  # pylint: disable=wrong-import-position
+
+DRAW_SIZE = (1280, 720)
+SECTIONS = ("events", "ui_render", "scale", "flip")
+PERCENTILES = (50, 95, 99)
+
+
+def _normalise(points):
+    return [(x / DRAW_SIZE[0], y / DRAW_SIZE[1]) for x, y in points]
+
+
+def _first_scene():
+    return load_scenes()[0]
+
+
+# Each scenario builds a screen and the gaze path it is benchmarked with. The paths hover
+# over the buttons for less than Button.TIME_TO_REGISTER_TRACKER_CLICK so the dwell
+# feedback is exercised without ever leaving the screen under test.
+SCENARIOS = {
+    "title_screen": (
+        TitleScreen,
+        lambda: _normalise([(750, 400), (300, 200), (750, 525), (200, 600)]),
+    ),
+    "level_selector": (
+        LevelSelector,
+        lambda: _normalise([(640, 350), (150, 650), (350, 360), (1100, 100)]),
+    ),
+    "play_game": (
+        lambda *args: PlayGame(*args, _first_scene()),
+        lambda: _normalise([(100, 100), (640, 360), (1100, 600), (300, 500)]),
+    ),
+}
+
+
+class _CountingSurface(pygame.surface.Surface):
+    created = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _CountingSurface.created += 1
+
+
+class _CountingFont(pygame.freetype.Font):
+    def render(self, *args, **kwargs):
+        _CountingSurface.created += 1
+        return super().render(*args, **kwargs)
+
+
+def _counted(func):
+    # Transforms given a destination surface to write into don't allocate
+    def wrapper(*args, **kwargs):
+        if len(args) < 3 and "dest_surface" not in kwargs:
+            _CountingSurface.created += 1
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+class FrameProbe:
+    """Instruments pygame and the UI to time the sections of every frame
+
+    A frame starts when the loop asks pygame for its events and ends when
+    pygame.display.flip or pygame.display.update returns, so the time spent sleeping in
+    Clock.tick is excluded. Once `frames` frames have been recorded a QUIT event is posted
+    after every flip, which unwinds the screen's loop (and any post game screen) back to
+    the caller.
+    """
+
+    def __init__(self, frames: int, count_allocations: bool):
+        self._frames = frames
+        self._count_allocations = count_allocations
+        self._frame_start = None
+        self._sections = dict.fromkeys(SECTIONS, 0.0)
+        self._surfaces_at_start = 0
+        self._python_at_start = 0
+        self.frame_times = []
+        self.section_times = {section: [] for section in SECTIONS}
+        self.surfaces = []
+        self.python_bytes = []
+
+    @property
+    def done(self):
+        return len(self.frame_times) >= self._frames
+
+    def _timed(self, section, func):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if self._frame_start is not None:
+                    self._sections[section] += time.perf_counter() - start
+
+        return wrapper
+
+    def _start_frame(self):
+        self._sections = dict.fromkeys(SECTIONS, 0.0)
+        self._surfaces_at_start = _CountingSurface.created
+        if self._count_allocations:
+            tracemalloc.reset_peak()
+            self._python_at_start = tracemalloc.get_traced_memory()[0]
+        self._frame_start = time.perf_counter()
+
+    def _end_frame(self):
+        frame_time = time.perf_counter() - self._frame_start
+        self._frame_start = None
+        if self.done:
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+            return
+        self.frame_times.append(frame_time)
+        for section in SECTIONS:
+            self.section_times[section].append(self._sections[section])
+        self.surfaces.append(_CountingSurface.created - self._surfaces_at_start)
+        if self._count_allocations:
+            self.python_bytes.append(
+                tracemalloc.get_traced_memory()[1] - self._python_at_start
+            )
+
+    @contextlib.contextmanager
+    def install(self):
+        get_events = pygame.event.get
+        flip = pygame.display.flip
+        update = pygame.display.update
+
+        def frame_events(*args, **kwargs):
+            if self._frame_start is None:
+                self._start_frame()
+            return get_events(*args, **kwargs)
+
+        patches = [
+            (pygame.event, "get", self._timed("events", frame_events)),
+            (pygame.display, "flip", self._timed_present(flip)),
+            (pygame.display, "update", self._timed_present(update)),
+            (
+                pygame.transform,
+                "scale",
+                self._timed("scale", _counted(pygame.transform.scale)),
+            ),
+            (
+                pygame.transform,
+                "smoothscale",
+                self._timed("scale", _counted(pygame.transform.smoothscale)),
+            ),
+            (ui.UI, "render", self._timed("ui_render", ui.UI.render)),
+            (ui.UI, "handle_event", self._timed("events", ui.UI.handle_event)),
+            (pygame.surface, "Surface", _CountingSurface),
+            (pygame, "Surface", _CountingSurface),
+            (pygame.freetype, "Font", _CountingFont),
+        ]
+        originals = [(owner, name, getattr(owner, name)) for owner, name, _ in patches]
+        try:
+            for owner, name, replacement in patches:
+                setattr(owner, name, replacement)
+            yield self
+        finally:
+            for owner, name, original in originals:
+                setattr(owner, name, original)
+
+    def _timed_present(self, present):
+        # Presenting has to be timed inside the frame, before _end_frame closes it
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = present(*args, **kwargs)
+            if self._frame_start is not None:
+                self._sections["flip"] += time.perf_counter() - start
+                self._end_frame()
+            return result
+
+        return wrapper
+
+
+def _percentiles(values, scale=1.0):
+    values = np.asarray(values, dtype=np.float64) * scale
+    if len(values) == 0:
+        return {}
+    result = {"mean": float(values.mean()), "max": float(values.max())}
+    for percentile in PERCENTILES:
+        result[f"p{percentile}"] = float(np.percentile(values, percentile))
+    return result
+
+
+@contextlib.contextmanager
+def _frame_rate(framerate):
+    """Overrides the frame rate cap if given, and keeps the screens from idling"""
+    fps, idle_after = frame_scheduler.fps, frame_scheduler.idle_after
+    if framerate is not None:
+        frame_scheduler.fps = framerate
+    frame_scheduler.idle_after = math.inf
+    try:
+        yield
+    finally:
+        frame_scheduler.fps, frame_scheduler.idle_after = fps, idle_after
+
+
+def _run_screen(name, screen, draw_surface, cursor, frames, framerate, allocations):
+    build_screen, build_path = SCENARIOS[name]
+    gaze_source = SyntheticGazeSource(
+        SyntheticGazeSource.fixations(build_path(), hold=0.6), noise=0.003, seed=0
+    )
+    probe = FrameProbe(frames, allocations)
+    frame_scheduler.reset_stats()
+    with probe.install(), _frame_rate(framerate):
+        adhawk_control = AdHawkControl(screen, draw_surface, (96, 96), gaze_source)
+        try:
+            game_screen = build_screen(screen, draw_surface, cursor, adhawk_control)
+            pygame.event.clear()
+            # Scripted mouse input: keep the pointer circling so every frame has events
+            for step in range(8):
+                angle = 2 * math.pi * step / 8
+                pygame.event.post(
+                    pygame.event.Event(
+                        pygame.MOUSEMOTION,
+                        {
+                            "pos": (
+                                screen.get_width() * (0.5 + 0.3 * math.cos(angle)),
+                                screen.get_height() * (0.5 + 0.3 * math.sin(angle)),
+                            ),
+                            "rel": (0, 0),
+                            "buttons": (0, 0, 0),
+                        },
+                    )
+                )
+            if allocations:
+                tracemalloc.start()
+            try:
+                scene_manager.run(game_screen)
+            finally:
+                if allocations:
+                    tracemalloc.stop()
+        finally:
+            adhawk_control.shutdown()
+    return probe
+
+
+def run_benchmarks(args):
+    Renderer.USE_DIRTY_RECTS = not args.full_redraw
+    pygame.init()
+    pygame.mouse.set_visible(False)
+    screen = pygame.display.set_mode(args.resolution)
+    draw_surface = pygame.surface.Surface(DRAW_SIZE)
+    cursor = generate_cursor()
+
+    results = {
+        "meta": {
+            "frames": args.frames,
+            "warmup": args.warmup,
+            "resolution": list(args.resolution),
+            "framerate_cap": args.fps,
+            "dirty_rects": not args.full_redraw,
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "sdl_video_driver": os.environ["SDL_VIDEODRIVER"],
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "screens": {},
+    }
+    for name in args.screens:
+        total = args.warmup + args.frames
+        timing = _run_screen(
+            name, screen, draw_surface, cursor, total, args.fps, allocations=False
+        )
+        frame_times = timing.frame_times[args.warmup :]
+        sections = {
+            section: _percentiles(times[args.warmup :], 1000)
+            for section, times in timing.section_times.items()
+        }
+        sections["other"] = _percentiles(
+            np.asarray(frame_times)
+            - np.sum(
+                [times[args.warmup :] for times in timing.section_times.values()],
+                axis=0,
+            ),
+            1000,
+        )
+        screen_result = {
+            "frame_ms": _percentiles(frame_times, 1000),
+            "sections_ms": sections,
+            "allocations": {
+                "surfaces_per_frame": _percentiles(timing.surfaces[args.warmup :])
+            },
+            "scheduler": frame_scheduler.stats(),
+        }
+        if not args.no_allocations:
+            # Tracing Python allocations slows everything down, so it gets its own pass
+            traced = _run_screen(
+                name, screen, draw_surface, cursor, total, args.fps, allocations=True
+            )
+            screen_result["allocations"]["python_kib_per_frame"] = _percentiles(
+                traced.python_bytes[args.warmup :], 1 / 1024
+            )
+        results["screens"][name] = screen_result
+    results["assets"] = assets.stats()
+    pygame.quit()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Returns a description of every screen whose p95 frame time regressed"""
+    regressions = []
+    for name, screen_result in results["screens"].items():
+        if name not in baseline.get("screens", {}):
+            continue
+        before = baseline["screens"][name]["frame_ms"]["p95"]
+        after = screen_result["frame_ms"]["p95"]
+        if after > before * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 frame time {before:.2f} ms -> {after:.2f} ms "
+                f"(+{(after / before - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+def _resolution(value):
+    width, height = value.lower().split("x")
+    return (int(width), int(height))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--screens",
+        nargs="+",
+        choices=sorted(SCENARIOS),
+        default=list(SCENARIOS),
+        help="screens to benchmark (default: all)",
+    )
+    parser.add_argument("--frames", type=int, default=300, help="frames to measure")
+    parser.add_argument(
+        "--warmup", type=int, default=30, help="frames to run before measuring"
+    )
+    parser.add_argument(
+        "--resolution",
+        type=_resolution,
+        default=(1920, 1080),
+        help="display resolution, e.g. 1920x1080",
+    )
+    parser.add_argument(
+        "--fps",
+        type=int,
+        help="override the screens' frame rate cap, 0 for uncapped (default: keep it)",
+    )
+    parser.add_argument(
+        "--full-redraw",
+        action="store_true",
+        help="redraw and flip the whole frame every tick instead of dirty rectangles",
+    )
+    parser.add_argument(
+        "--no-allocations",
+        action="store_true",
+        help="skip the traced pass that measures Python allocations per frame",
+    )
+    parser.add_argument(
+        "--output", help="write the JSON results here (default: stdout)"
+    )
+    parser.add_argument(
+        "--baseline", help="JSON results of an earlier run to check for regressions"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="allowed relative p95 frame time increase over the baseline",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    results = run_benchmarks(args)
+    output = json.dumps(results, indent="  ")
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as writer:
+            writer.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf8") as reader:
+            regressions = compare(results, json.load(reader), args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Compares the latency and residual jitter of the gaze filters.
+
+Feeds every filter in game.gaze_filters.FILTERS, with its default settings, a synthetic
+saccade between two noisy fixations and reports how long the filtered gaze takes to cover
+90% of the saccade and how much jitter is left during the fixation, as JSON:
+
+    python evaluate_filters.py --noise 12 --saccade 400
+"""
+import argparse
+import json
+
+from game.gaze_filters import FILTERS, create_filter, evaluate_filter
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--filters",
+        nargs="+",
+        choices=FILTERS,
+        default=list(FILTERS),
+        help="filters to evaluate (default: all)",
+    )
+    parser.add_argument(
+        "--rate", type=float, default=125, help="sample rate in Hz (default: 125)"
+    )
+    parser.add_argument(
+        "--noise",
+        type=float,
+        default=10.0,
+        help="standard deviation of the tracker noise in pixels (default: 10)",
+    )
+    parser.add_argument(
+        "--saccade",
+        type=float,
+        default=300.0,
+        help="length of the saccade in pixels (default: 300)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=4,
+        help="samples per batch, 4 is about one frame at 30 fps (default: 4)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="noise seed")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results = {
+        name: evaluate_filter(
+            create_filter(name),
+            rate=args.rate,
+            noise=args.noise,
+            saccade=args.saccade,
+            batch_size=args.batch_size,
+            seed=args.seed,
+        )
+        for name in args.filters
+    }
+    print(json.dumps(results, indent="  "))
+
+
+if __name__ == "__main__":
+    main()
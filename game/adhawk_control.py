@@ -1,6 +1,4 @@
-from collections import deque
-import math
-from typing import Tuple
+from typing import List, Optional, Tuple
 
 import adhawkapi
 import adhawkapi.frontend
@@ -9,6 +7,14 @@ import numpy as np
 import pygame
 from adhawkapi.publicapi import Events, MarkerSequenceMode, PacketType
 
+from game.assets import assets
+from game.fixation import Fixation, FixationDetector, VelocityThresholdDetector
+from game.gaze_buffer import GazeRingBuffer
+from game.gaze_filters import GazeFilter, OneEuroFilter
+from game.gaze_source import GazeSource
+from game.transforms import Space, surface_transforms
+
+
 class AdHawkControl:
 
     MARKER_DIC = cv2.aruco.DICT_4X4_50  # pylint: disable=no-member
@@ -16,7 +22,8 @@ class AdHawkControl:
         [[10, 10], [10, 10]]
     )  # Marker offsets: [[left, right], [top, bottom]]
 
-    NUM_POINTS = 10
+    # Room for 8 seconds of 125 Hz samples, far more than a frame ever needs
+    GAZE_BUFFER_SIZE = 1024
 
     GAZE_MARKER_SIZE = 20
 
@@ -25,34 +32,62 @@ class AdHawkControl:
         screen: pygame.surface.Surface,
         draw_surface: pygame.surface.Surface,
         dpi: Tuple,
+        gaze_source: Optional[GazeSource] = None,
+        gaze_filter: Optional[GazeFilter] = None,
+        fixation_detector: Optional[FixationDetector] = None,
     ):
-        self._api = adhawkapi.frontend.FrontendApi()
-        self._api.register_stream_handler(
-            PacketType.GAZE_IN_SCREEN, self._handle_gaze_in_screen_stream
-        )
-        self._api.register_stream_handler(PacketType.EVENTS, self._handle_event_stream)
-        self._api.start(connect_cb=self._handle_connect_response)
+        # Filled by the stream handler thread and drained once per frame by update()
+        self._gaze_buffer = GazeRingBuffer(self.GAZE_BUFFER_SIZE)
+        self._samples = self._gaze_buffer.drain()
+        self._timestamp = None
+
+        # Without a gaze source the samples come from the headset through the AdHawk API
+        self._gaze_source = gaze_source
+        self._api = None
+        if gaze_source is None:
+            self._api = adhawkapi.frontend.FrontendApi()
+            self._api.register_stream_handler(
+                PacketType.GAZE_IN_SCREEN, self._handle_gaze_in_screen_stream
+            )
+            self._api.register_stream_handler(
+                PacketType.EVENTS, self._handle_event_stream
+            )
+            self._api.start(connect_cb=self._handle_connect_response)
         self._size_mm = self._pix_to_mm(screen.get_size(), dpi)
         self._marker_ids = [0, 1, 2, 3]
         self._marker_positions = self._create_custom_board()
         self._screen = screen
         self._draw_surface = draw_surface
-        self._aruco_image = pygame.transform.scale(
-            pygame.image.load("data/screen_tracking/aruco_markers.png"),
-            self._draw_surface.get_size(),
+        self._transforms = surface_transforms(screen, draw_surface)
+        # Kept at full resolution, the renderer stretches it over the screen only once
+        self._aruco_image = assets.image("data/screen_tracking/aruco_markers.png")
+        self._gaze_filter = OneEuroFilter() if gaze_filter is None else gaze_filter
+        self._fixation_detector = (
+            VelocityThresholdDetector()
+            if fixation_detector is None
+            else fixation_detector
+        )
+        self._fixations = []
+        self._fixation_detector.fixation_started.add_callback(
+            self._handle_fixation_started
         )
-        self._point_deque = deque()
-        self._running_xcoord = 0
-        self._running_ycoord = 0
         self._xcoord = 0
         self._ycoord = 0
 
+        if self._gaze_source is not None:
+            self._gaze_source.start(self._handle_gaze_in_screen_stream)
+
     def shutdown(self):
+        if self._api is None:
+            self._gaze_source.stop()
+            return
         self._enable_screen_tracking(False)
         self._api.stop_camera_capture(lambda *_args: None)
         self._api.shutdown()
 
     def quickstart(self):
+        if self._api is None:
+            return
         self._api.quick_start_gui(
             mode=MarkerSequenceMode.FIXED_GAZE,
             marker_size_mm=35,
@@ -60,6 +95,8 @@ class AdHawkControl:
         )
 
     def calibrate(self):
+        if self._api is None:
+            return
         self._api.start_calibration_gui(
             mode=MarkerSequenceMode.FIXED_HEAD,
             n_points=9,
@@ -151,32 +188,65 @@ class AdHawkControl:
             markers.append([*marker_pos, marker_size])
         return markers
 
-    def _handle_gaze_in_screen_stream(self, _timestamp, xpos, ypos):
-        """Handler for the gaze in screen stream"""
-        if math.isnan(xpos) or math.isnan(ypos):
-            return
-
-        # Translates the passed coordinates to positions on the screen
-        new_xcoord = round(self._screen.get_width() * xpos)
-        new_ycoord = round(self._screen.get_height() * ypos)
+    def _handle_gaze_in_screen_stream(self, timestamp, xpos, ypos):
+        """Handler for the gaze in screen stream, runs on the API's thread"""
+        self._gaze_buffer.push(timestamp, xpos, ypos)
 
-        # Adds the new point to the point deque, and pops the least recent entry if the size of the deque exceeds
-        # its maximum allowed size
-        old_xcoord = 0
-        old_ycoord = 0
-        self._point_deque.append((new_xcoord, new_ycoord))
-        if len(self._point_deque) > self.NUM_POINTS:
-            (old_xcoord, old_ycoord) = self._point_deque.popleft()
+    def update(self) -> np.ndarray:
+        """Takes in every gaze sample received since the previous call, once per frame
 
-        # Calculates display coordinates as an average of all points in the deque (reduces jitter)
-        self._running_xcoord += new_xcoord - old_xcoord
-        self._running_ycoord += new_ycoord - old_ycoord
+        Returns the samples with their positions translated to draw surface pixels, the
+        space the screens are laid out in, and run through the gaze filter, which then go
+        through fixation detection.
+        """
+        samples = self._gaze_buffer.drain()
+        samples["x"], samples["y"] = self._transforms.xy(
+            samples["x"], samples["y"], Space.NORMALISED, Space.SURFACE
+        )
 
-        self._xcoord = self._running_xcoord / len(self._point_deque)
-        self._ycoord = self._running_ycoord / len(self._point_deque)
+        valid = samples["valid"]
+        if valid.any():
+            filtered = self._gaze_filter.filter(
+                samples["timestamp"][valid],
+                np.column_stack((samples["x"][valid], samples["y"][valid])),
+            )
+            samples["x"][valid] = filtered[:, 0]
+            samples["y"][valid] = filtered[:, 1]
+            self._xcoord, self._ycoord = filtered[-1].tolist()
+        current = self._fixation_detector.fixation
+        self._fixations = [] if current is None else [current]
+        self._fixation_detector.process(samples)
+        if len(samples):
+            self._timestamp = float(samples["timestamp"][-1])
+        self._samples = samples
+        return samples
+
+    def get_samples(self) -> np.ndarray:
+        """The filtered samples taken in by the latest update(), in draw surface pixels"""
+        return self._samples
 
     def get_coords(self):
         return (self._xcoord, self._ycoord)
 
-    def draw(self):
-        self._draw_surface.blit(self._aruco_image, (0, 0))
+    def get_timestamp(self) -> Optional[float]:
+        """Device time of the latest sample taken in, in seconds"""
+        return self._timestamp
+
+    def _handle_fixation_started(self, fixation: Fixation):
+        self._fixations.append(fixation)
+
+    def get_fixation(self) -> Optional[Fixation]:
+        """The fixation in progress, in draw surface pixels, or None during saccades"""
+        return self._fixation_detector.fixation
+
+    def get_fixations(self) -> List[Fixation]:
+        """The fixations in progress at some point during the latest update(), in order"""
+        return self._fixations
+
+    @property
+    def fixation_detector(self) -> FixationDetector:
+        return self._fixation_detector
+
+    def get_overlay(self) -> pygame.surface.Surface:
+        """The ArUco markers the headset tracks the screen with, to draw over every frame"""
+        return self._aruco_image
@@ -0,0 +1,91 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+import pygame
+import pygame.freetype
+
+from game.screen_tools import scale_surface
+
+
+def convert_surface(surface: pygame.surface.Surface) -> pygame.surface.Surface:
+    """Converts a surface to the display's pixel format so blitting it needs no conversion
+
+    Surfaces with per pixel alpha keep it. Nothing is converted before a display mode is
+    set, since there is no format to convert to yet.
+    """
+    if pygame.display.get_surface() is None:
+        return surface
+    if surface.get_flags() & pygame.SRCALPHA:
+        return surface.convert_alpha()
+    return surface.convert()
+
+
+class AssetManager:
+    """Process wide cache of fonts and images
+
+    Fonts are cached by (name, size) and images by (path, size). Cached surfaces are
+    shared, so callers that draw on one have to copy it first.
+    """
+
+    def __init__(self):
+        self._fonts: Dict[Tuple, pygame.freetype.Font] = {}
+        self._surfaces: Dict[Tuple, pygame.surface.Surface] = {}
+        self._lock = threading.Lock()
+        self._font_hits = 0
+        self._font_misses = 0
+        self._surface_hits = 0
+        self._surface_misses = 0
+
+    def font(self, name: str, size: int) -> pygame.freetype.Font:
+        """Returns the system font `name` at `size` points"""
+        key = (name, size)
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is not None:
+                self._font_hits += 1
+                return font
+            self._font_misses += 1
+            font = pygame.freetype.SysFont(name, size)
+            self._fonts[key] = font
+            return font
+
+    def image(self, path: str, size: Optional[Tuple] = None) -> pygame.surface.Surface:
+        """Returns the image at `path` in the display format, scaled to `size` if given"""
+        key = (path, None if size is None else tuple(size))
+        with self._lock:
+            surface = self._surfaces.get(key)
+            if surface is not None:
+                self._surface_hits += 1
+                return surface
+            self._surface_misses += 1
+        # Decoded outside the lock so a slow image does not hold up the other callers
+        surface = pygame.image.load(path)
+        if size is not None:
+            surface = scale_surface(surface, size)
+        surface = convert_surface(surface)
+        with self._lock:
+            return self._surfaces.setdefault(key, surface)
+
+    def clear(self):
+        with self._lock:
+            self._fonts.clear()
+            self._surfaces.clear()
+
+    def stats(self) -> dict:
+        """Hit and miss counters, and the memory taken by the cached surfaces"""
+        with self._lock:
+            return {
+                "fonts": len(self._fonts),
+                "font_hits": self._font_hits,
+                "font_misses": self._font_misses,
+                "surfaces": len(self._surfaces),
+                "surface_hits": self._surface_hits,
+                "surface_misses": self._surface_misses,
+                "surface_bytes": sum(
+                    surface.get_pitch() * surface.get_height()
+                    for surface in self._surfaces.values()
+                ),
+            }
+
+
+assets = AssetManager()
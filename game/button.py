@@ -1,9 +1,14 @@
-from typing import Optional, Tuple
+import threading
+from typing import Optional, Sequence, Tuple
 
 import pygame
-import pygame.freetype
 
-from game.screen_tools import point_screen_to_surface
+from game.assets import assets
+from game.fixation import Fixation, FixationDwell
+from game.renderer import Renderer
+from game.screen_tools import scale_surface
+from game.text_renderer import render_text
+from game.transforms import Space, surface_transforms
 
 from .notification import Notification
 
@@ -13,39 +18,85 @@ class ButtonClicked(Notification):
         self._notify_callbacks(location)
 
 
+class ButtonHovered(Notification):
+    def Notify(self, hovering: bool):
+        self._notify_callbacks(hovering)
+
+
+class ButtonVisibilityChanged(Notification):
+    def Notify(self, visible: bool):
+        self._notify_callbacks(visible)
+
+
 class Button:
 
     button_clicked: ButtonClicked
+    button_hovered: ButtonHovered
+    visibility_changed: ButtonVisibilityChanged
     TIME_TO_REGISTER_TRACKER_CLICK = 1000
     GRACE_PERIOD = 250
+    DWELL_COLORS = [(0, 0, 0), (128, 75, 222)]
+    DWELL_STEPS = 32
 
     def __init__(
         self,
         screen: pygame.surface.Surface,
         draw_surface: pygame.surface.Surface,
-        clock: pygame.time.Clock,
+        renderer: Renderer,
         text: Optional[str],
         position: Tuple,
         size: Tuple,
         image: Optional[pygame.surface.Surface] = None,
         visible: bool = True,
         font_size: int = 48,
+        lock: Optional[threading.RLock] = None,
     ):
+        # Shared with the UI, guards the state the logic thread updates
+        self._lock = threading.RLock() if lock is None else lock
         self._screen = screen
         self._draw_surface = draw_surface
+        self._transforms = surface_transforms(screen, draw_surface)
         self._text = text
         self._size = size
-        self._clock = clock
+        self._renderer = renderer
 
         self._visible = visible
 
         self._mouse_position = (0, 0)
 
+        self._position = position
+
+        self._text_image = None
+        if text:
+            font = assets.font("Comic Sans MS", font_size)
+            self._text_image = render_text(font, text, (255, 0, 0))
+
         self._button_image = pygame.surface.Surface(size, pygame.SRCALPHA)
+        self._button_hover_image = pygame.surface.Surface(size, pygame.SRCALPHA)
+        self._build_images(image)
+
+        self._mouse_click_in = False
+
+        self._rect = self._button_image.get_rect(center=position)
+        self.button_clicked = ButtonClicked()
+        self.button_hovered = ButtonHovered()
+        self.visibility_changed = ButtonVisibilityChanged()
+
+        self._use_tracker = True
+        self._dwell = FixationDwell(self.GRACE_PERIOD / 1000)
+
+        # Dwell feedback is redrawn into this one surface, and only when its step changes
+        self._dwell_image = pygame.surface.Surface(size, pygame.SRCALPHA)
+        self._dwell_step = None
+
+    def _build_images(self, image: Optional[pygame.surface.Surface]):
+        size = self._size
+        self._button_image.fill((0, 0, 0, 0))
+        self._button_hover_image.fill((0, 0, 0, 0))
         if image:
-            self._button_image.blit(
-                pygame.transform.scale(image, self._button_image.get_size()), (0, 0)
-            )
+            scaled_image = scale_surface(image, size)
+            self._button_image.blit(scaled_image, (0, 0))
+            self._button_hover_image.blit(scaled_image, (0, 0))
         pygame.draw.rect(
             self._button_image,
             color=pygame.Color("black"),
@@ -53,13 +104,6 @@ class Button:
             width=2,
             border_radius=3,
         )
-
-        self._button_hover_image = pygame.surface.Surface(size, pygame.SRCALPHA)
-        if image:
-            self._button_hover_image.blit(
-                pygame.transform.scale(image, self._button_hover_image.get_size()),
-                (0, 0),
-            )
         pygame.draw.rect(
             self._button_hover_image,
             color=pygame.Color("black"),
@@ -75,31 +119,15 @@ class Button:
             border_radius=3,
         )
 
-        self._position = position
-
-        if text:
-            font = pygame.freetype.SysFont("Comic Sans MS", font_size)
-
-            text_image, _ = font.render(text, (255, 0, 0), None)
-            text_rect = text_image.get_rect(
+        if self._text_image:
+            text_rect = self._text_image.get_rect(
                 center=(
                     (self._button_image.get_width() / 2),
                     (self._button_image.get_height() / 2),
                 )
             )
-
-            self._button_image.blit(text_image, text_rect)
-            self._button_hover_image.blit(text_image, text_rect)
-
-        self._mouse_click_in = False
-
-        self._rect = self._button_image.get_rect(center=position)
-        self.button_clicked = ButtonClicked()
-
-        self._use_tracker = True
-        self._tracker_inside = False
-        self._tracker_time_inside = 0
-        self._grace_period = 0
+            self._button_image.blit(self._text_image, text_rect)
+            self._button_hover_image.blit(self._text_image, text_rect)
 
     @staticmethod
     def _interpolate_color(colors, percent) -> Tuple:
@@ -120,32 +148,40 @@ class Button:
             return
 
         if self._use_tracker:
-            if self._tracker_inside:
-                colors = [(0, 0, 0), (128, 75, 222)]
-
-                button_image = pygame.surface.Surface(self._size, pygame.SRCALPHA)
-                color = self._interpolate_color(
-                    colors, self._tracker_time_inside / self.TIME_TO_REGISTER_TRACKER_CLICK
+            if self._dwell.inside:
+                step = min(
+                    self.DWELL_STEPS,
+                    int(
+                        self._dwell.time
+                        * 1000
+                        * self.DWELL_STEPS
+                        // self.TIME_TO_REGISTER_TRACKER_CLICK
+                    ),
                 )
-                pygame.draw.rect(
-                    button_image,
-                    color=color,
-                    rect=self._rect,
-                    width=2,
-                    border_radius=3,
-                )
-                button_image.fill(
-                    color, (2, 2, self._rect.width - 2, self._rect.height - 2)
-                )
-                button_image.blit(self._button_hover_image, (0, 0))
-                self._draw_surface.blit(button_image, self._rect)
+                if step != self._dwell_step:
+                    self._draw_dwell_image(step / self.DWELL_STEPS)
+                    self._dwell_step = step
+                self._renderer.blit(self._dwell_image, self._rect, key=step)
             else:
-                self._draw_surface.blit(self._button_image, self._rect)
+                self._renderer.blit(self._button_image, self._rect)
         else:
             if self._rect.collidepoint(self._mouse_position):
-                self._draw_surface.blit(self._button_hover_image, self._rect)
+                self._renderer.blit(self._button_hover_image, self._rect)
             else:
-                self._draw_surface.blit(self._button_image, self._rect)
+                self._renderer.blit(self._button_image, self._rect)
+
+    def _draw_dwell_image(self, progress: float):
+        color = self._interpolate_color(self.DWELL_COLORS, progress)
+        self._dwell_image.fill((0, 0, 0, 0))
+        pygame.draw.rect(
+            self._dwell_image,
+            color=color,
+            rect=pygame.rect.Rect(0, 0, self._size[0], self._size[1]),
+            width=2,
+            border_radius=3,
+        )
+        self._dwell_image.fill(color, (2, 2, self._size[0] - 4, self._size[1] - 4))
+        self._dwell_image.blit(self._button_hover_image, (0, 0))
 
     def handle_event(self, event: pygame.event.Event):
         if not self._visible:
@@ -155,9 +191,13 @@ class Button:
             return
 
         if event.type == pygame.MOUSEMOTION:
-            self._mouse_position = point_screen_to_surface(
-                event.pos, self._screen, self._draw_surface
+            was_inside = self._rect.collidepoint(self._mouse_position)
+            self._mouse_position = self._transforms.point(
+                event.pos, Space.SCREEN, Space.SURFACE
             )
+            inside = self._rect.collidepoint(self._mouse_position)
+            if inside != was_inside:
+                self.button_hovered.Notify(inside)
         elif event.type == pygame.MOUSEBUTTONDOWN:
             if event.button == 1:
                 if self._rect.collidepoint(self._mouse_position):
@@ -173,34 +213,66 @@ class Button:
                     self.button_clicked.Notify(self._mouse_position)
                 self._mouse_click_in = False
 
-    def update_screen_tracker(self, position):
-        if not self._use_tracker or not self._visible:
-            return
+    def update_screen_tracker(
+        self, fixations: Sequence[Fixation], timestamp: Optional[float]
+    ) -> Optional[Tuple]:
+        """Dwells on the fixations since the last update, timed by the gaze samples
 
-        self._tracker_position = position
-        if self._rect.collidepoint(self._tracker_position):
-            if not self._tracker_inside:
-                self._tracker_inside = True
-                self._tracker_time_inside = 0
-                self._grace_period = 0
-            else:
-                self._tracker_time_inside += self._clock.get_time()
-                self._grace_period = 0
-                if self._tracker_time_inside > self.TIME_TO_REGISTER_TRACKER_CLICK:
-                    self.button_clicked.Notify(self._tracker_position)
-        else:
-            if self._tracker_inside:
-                self._tracker_time_inside += self._clock.get_time()
-                self._grace_period += self._clock.get_time()
-                if self._grace_period > self.GRACE_PERIOD:
-                    self._tracker_time_inside = 0
-                    self._tracker_inside = False
+        Returns where the button was clicked when the dwell completes, the caller is
+        responsible for notifying button_clicked.
+        """
+        if not self._use_tracker or not self._visible:
+            return None
+
+        with self._lock:
+            was_inside = self._dwell.inside
+            self._dwell.update(fixations, self._rect, timestamp)
+            if self._dwell.inside != was_inside:
+                self.button_hovered.Notify(self._dwell.inside)
+            if (
+                self._dwell.inside
+                and self._dwell.time * 1000 > self.TIME_TO_REGISTER_TRACKER_CLICK
+            ):
+                position = self._dwell.fixation.center
+                # Another click takes another full dwell
+                self._dwell.restart()
+                return position
+        return None
+
+    def set_image(self, image: Optional[pygame.surface.Surface]):
+        """Replaces the button's image, or removes it when `image` is None"""
+        # New surfaces rather than redrawing the old ones, so the renderer rescales them
+        button_image = pygame.surface.Surface(self._size, pygame.SRCALPHA)
+        button_hover_image = pygame.surface.Surface(self._size, pygame.SRCALPHA)
+        with self._lock:
+            self._button_image = button_image
+            self._button_hover_image = button_hover_image
+            self._build_images(image)
+            self._dwell_step = None
+
+    def get_rect(self) -> pygame.rect.Rect:
+        return self._rect
+
+    def get_dwelling(self) -> bool:
+        """Whether the gaze is dwelling on the button"""
+        return self._dwell.inside
+
+    def set_mouse_position(self, position: Tuple):
+        """Moves the mouse pointer the button knows of, in draw surface coordinates"""
+        self._mouse_position = position
 
     def get_visible(self):
         return self._visible
 
     def set_visible(self, value: bool):
-        self._visible = value
+        with self._lock:
+            if value == self._visible:
+                return
+            self._visible = value
+            if not value and self._dwell.inside:
+                self._dwell.reset()
+                self.button_hovered.Notify(False)
+            self.visibility_changed.Notify(value)
 
     def set_use_tracker(self, value: bool):
         self._use_tracker = value
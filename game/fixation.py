@@ -0,0 +1,307 @@
+import abc
+import math
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pygame
+
+from .notification import Notification
+
+
+class Fixation:
+    """A run of gaze samples that stayed in one place, updated while it lasts"""
+
+    def __init__(self, timestamp: float, xpos: float, ypos: float):
+        self.start = timestamp
+        self.end = timestamp
+        # Time up to which a dwell has used the fixation up, e.g. to click a button
+        self.consumed_until = timestamp
+        self.ended = False
+        self.count = 1
+        self._sum_x = xpos
+        self._sum_y = ypos
+        self._min_x = self._max_x = xpos
+        self._min_y = self._max_y = ypos
+
+    def add(self, timestamp: float, xpos: float, ypos: float):
+        self.end = timestamp
+        self.count += 1
+        self._sum_x += xpos
+        self._sum_y += ypos
+        self._min_x = min(self._min_x, xpos)
+        self._max_x = max(self._max_x, xpos)
+        self._min_y = min(self._min_y, ypos)
+        self._max_y = max(self._max_y, ypos)
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    @property
+    def center(self) -> Tuple:
+        return (self._sum_x / self.count, self._sum_y / self.count)
+
+    @property
+    def dispersion(self) -> float:
+        """Width plus height of the box around the samples, as I-DT defines it"""
+        return self.dispersion_with(self._min_x, self._min_y)
+
+    def dispersion_with(self, xpos: float, ypos: float) -> float:
+        """Dispersion the fixation would have with one more sample at (xpos, ypos)"""
+        return (max(self._max_x, xpos) - min(self._min_x, xpos)) + (
+            max(self._max_y, ypos) - min(self._min_y, ypos)
+        )
+
+
+class FixationStarted(Notification):
+    def Notify(self, fixation: Fixation):
+        self._notify_callbacks(fixation)
+
+
+class FixationUpdated(Notification):
+    def Notify(self, fixation: Fixation):
+        self._notify_callbacks(fixation)
+
+
+class FixationEnded(Notification):
+    def Notify(self, fixation: Fixation):
+        self._notify_callbacks(fixation)
+
+
+class FixationDetector(abc.ABC):
+    """Base class for the online fixation detectors
+
+    Samples are fed one at a time, in constant time each. Consecutive samples the detector
+    accepts form a candidate, which becomes a fixation once it lasts `min_duration`
+    seconds. Up to `max_outliers` consecutive rejected samples, like a noise spike, are
+    skipped without ending it, and so are dropouts shorter than `max_gap` seconds, like a
+    blink.
+    """
+
+    fixation_started: FixationStarted
+    fixation_updated: FixationUpdated
+    fixation_ended: FixationEnded
+
+    def __init__(
+        self, min_duration: float = 0.1, max_gap: float = 0.3, max_outliers: int = 1
+    ):
+        self._min_duration = min_duration
+        self._max_gap = max_gap
+        self._max_outliers = max_outliers
+        self.fixation_started = FixationStarted()
+        self.fixation_updated = FixationUpdated()
+        self.fixation_ended = FixationEnded()
+        self._candidate = None
+        self._started = False
+        self._outliers = 0
+
+    @property
+    def fixation(self) -> Optional[Fixation]:
+        """The fixation in progress, if any"""
+        return self._candidate if self._started else None
+
+    def process(self, samples: np.ndarray):
+        """Feeds a batch of samples with the fields of game.gaze_buffer.GAZE_SAMPLE_DTYPE"""
+        for timestamp, xpos, ypos, valid in samples.tolist():
+            self.add_sample(timestamp, xpos, ypos, valid)
+
+    def add_sample(
+        self, timestamp: float, xpos: float, ypos: float, valid: bool = True
+    ):
+        candidate = self._candidate
+        if candidate is not None and timestamp - candidate.end > self._max_gap:
+            self._end()
+            candidate = None
+
+        if not valid or math.isnan(xpos) or math.isnan(ypos):
+            return
+
+        if candidate is None:
+            self._begin(timestamp, xpos, ypos)
+        elif self._accepts(timestamp, xpos, ypos):
+            self._outliers = 0
+            candidate.add(timestamp, xpos, ypos)
+            self._extend(timestamp, xpos, ypos)
+            if self._started:
+                self.fixation_updated.Notify(candidate)
+            elif candidate.duration >= self._min_duration:
+                self._started = True
+                self.fixation_started.Notify(candidate)
+        else:
+            self._outliers += 1
+            if self._outliers > self._max_outliers:
+                self._end()
+                self._begin(timestamp, xpos, ypos)
+
+    def reset(self):
+        """Ends the fixation in progress, if any"""
+        self._end()
+
+    def _begin(self, timestamp, xpos, ypos):
+        self._candidate = Fixation(timestamp, xpos, ypos)
+        self._extend(timestamp, xpos, ypos)
+
+    def _end(self):
+        if self._started:
+            self._candidate.ended = True
+            self.fixation_ended.Notify(self._candidate)
+        self._candidate = None
+        self._started = False
+        self._outliers = 0
+
+    @abc.abstractmethod
+    def _accepts(self, timestamp, xpos, ypos) -> bool:
+        """Whether a sample belongs to the candidate fixation"""
+
+    def _extend(self, timestamp, xpos, ypos):
+        """Called with every sample added to the candidate"""
+
+
+class VelocityThresholdDetector(FixationDetector):
+    """I-VT: the gaze is fixating while it moves slower than `velocity_threshold`
+
+    The velocity is in pixels per second, measured from the previous accepted sample.
+    """
+
+    def __init__(self, velocity_threshold: float = 1500, **kwargs):
+        super().__init__(**kwargs)
+        self._velocity_threshold = velocity_threshold
+        self._previous = None
+
+    def _accepts(self, timestamp, xpos, ypos):
+        previous_timestamp, previous_x, previous_y = self._previous
+        period = max(timestamp - previous_timestamp, 1e-6)
+        speed = math.hypot(xpos - previous_x, ypos - previous_y) / period
+        return speed <= self._velocity_threshold
+
+    def _extend(self, timestamp, xpos, ypos):
+        self._previous = (timestamp, xpos, ypos)
+
+
+class DispersionThresholdDetector(FixationDetector):
+    """I-DT: the gaze is fixating while its samples fit within `max_dispersion`
+
+    The dispersion is the width plus the height of the box around the samples, in pixels.
+    """
+
+    def __init__(self, max_dispersion: float = 100, **kwargs):
+        super().__init__(**kwargs)
+        self._max_dispersion = max_dispersion
+
+    def _accepts(self, timestamp, xpos, ypos):
+        return self._candidate.dispersion_with(xpos, ypos) <= self._max_dispersion
+
+
+FIXATION_DETECTORS = {
+    "ivt": VelocityThresholdDetector,
+    "idt": DispersionThresholdDetector,
+}
+
+
+def create_fixation_detector(name: str) -> FixationDetector:
+    """Creates one of the FIXATION_DETECTORS with its default settings"""
+    if name not in FIXATION_DETECTORS:
+        raise ValueError(
+            f"unknown fixation detector {name!r}, "
+            f"expected one of {', '.join(FIXATION_DETECTORS)}"
+        )
+    return FIXATION_DETECTORS[name]()
+
+
+class FixationDwell:
+    """Adds up how long the gaze fixates on a target, in sample time
+
+    The dwell starts when the center of a fixation is in the target, and from then on the
+    fixations in the target add their duration. It survives the saccades between them for
+    up to `grace_period` seconds of sample time, and ends as soon as a fixation lands
+    outside of the target. Every fixation since the previous update is taken into account,
+    so the result only depends on the samples, not on how often it is updated.
+    """
+
+    def __init__(self, grace_period: float = 0.25):
+        self._grace_period = grace_period
+        self.starts = 0
+        self.reset()
+
+    @property
+    def inside(self) -> bool:
+        return self._inside
+
+    @property
+    def time(self) -> float:
+        """Seconds the dwell has lasted"""
+        return self._time
+
+    @property
+    def fixation(self) -> Optional[Fixation]:
+        """The latest fixation on the target while the dwell lasts"""
+        return self._fixation
+
+    def update(
+        self,
+        fixations: Sequence[Fixation],
+        rect: pygame.rect.Rect,
+        timestamp: Optional[float],
+    ) -> float:
+        """Takes in the fixations since the previous update, returns the seconds they added
+
+        `fixations` are the fixations that were in progress at some point since the
+        previous update, oldest first, and `timestamp` is the time of the latest sample,
+        which measures the grace period once the last fixation has ended. The target is
+        `rect`, or anything else with a collidepoint method, like a TargetArea.
+        """
+        added = 0
+        for fixation in fixations:
+            added += self._count(self._fixation)
+            if rect.collidepoint(fixation.center):
+                if fixation is not self._fixation:
+                    if (
+                        self._inside
+                        and fixation.start - self._fixation.end > self._grace_period
+                    ):
+                        self.reset()
+                    if not self._inside:
+                        self._inside = True
+                        self.starts += 1
+                    self._fixation = fixation
+                    self._counted_until = fixation.consumed_until
+                    added += self._count(fixation)
+            elif self._inside:
+                self.reset()
+        added += self._count(self._fixation)
+
+        if (
+            self._inside
+            and self._fixation.ended
+            and (
+                timestamp is None or timestamp - self._fixation.end > self._grace_period
+            )
+        ):
+            self.reset()
+        return added
+
+    def _count(self, fixation: Optional[Fixation]) -> float:
+        """Adds the time the fixation grew by since it was last counted"""
+        if fixation is None:
+            return 0
+        start = max(self._counted_until, fixation.consumed_until)
+        self._counted_until = max(start, fixation.end)
+        added = self._counted_until - start
+        self._time += added
+        return added
+
+    def restart(self):
+        """Starts the dwell over, counting only the fixation time still to come
+
+        The fixation time counted so far is used up, so another target that appears under
+        the same fixation does not count it either.
+        """
+        self._time = 0
+        if self._fixation is not None:
+            self._fixation.consumed_until = self._fixation.end
+
+    def reset(self):
+        self._inside = False
+        self._time = 0
+        self._fixation = None
+        self._counted_until = None
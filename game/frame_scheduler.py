@@ -0,0 +1,140 @@
+import collections
+import math
+import time
+from typing import Callable, Dict
+
+import numpy as np
+import pygame
+
+
+class FrameStats:
+    """Frame counters of one screen, kept across its runs"""
+
+    # Frames whose work time the percentiles are computed over
+    WINDOW = 600
+
+    def __init__(self):
+        self.frames = 0
+        self.idle_frames = 0
+        self.over_budget = 0
+        self.busy_time = 0.0
+        self.elapsed = 0.0
+        self.work_times = collections.deque(maxlen=self.WINDOW)
+
+    def add(self, work_time: float, frame_time: float, idle: bool, budget: float):
+        self.frames += 1
+        self.idle_frames += idle
+        self.over_budget += work_time > budget
+        self.busy_time += work_time
+        self.elapsed += frame_time
+        self.work_times.append(work_time)
+
+    def as_dict(self) -> dict:
+        work_ms = np.asarray(self.work_times, dtype=np.float64) * 1000
+        return {
+            "frames": self.frames,
+            "idle_frames": self.idle_frames,
+            "over_budget": self.over_budget,
+            "fps": self.frames / self.elapsed if self.elapsed > 0 else 0.0,
+            # Share of the wall time spent working rather than sleeping
+            "load": self.busy_time / self.elapsed if self.elapsed > 0 else 0.0,
+            "work_ms": {
+                "p50": float(np.percentile(work_ms, 50)) if len(work_ms) else 0.0,
+                "p95": float(np.percentile(work_ms, 95)) if len(work_ms) else 0.0,
+                "max": float(work_ms.max()) if len(work_ms) else 0.0,
+            },
+        }
+
+
+class FrameScheduler:
+    """Runs the frame loop of every screen and paces it
+
+    A frame hands the pending events to the screen, one at a time until it stops
+    running, then lets it draw and present. Events left over when a screen stops are
+    kept for the next one to run, so input is not lost across screen transitions. Frames
+    are capped at `fps`. Once nothing has changed on screen and no event has come in for
+    `idle_after` seconds the loop drops to `idle_fps`, and any event wakes it up
+    straight away, so an unattended kiosk barely uses the CPU. Work time, the time a
+    frame takes without the sleep, is recorded per screen name and checked against the
+    1 / fps budget.
+    """
+
+    FPS = 30
+    IDLE_FPS = 5
+    IDLE_AFTER = 2.0
+
+    def __init__(
+        self,
+        fps: float = FPS,
+        idle_fps: float = IDLE_FPS,
+        idle_after: float = IDLE_AFTER,
+    ):
+        self.fps = fps
+        self.idle_fps = idle_fps
+        self.idle_after = idle_after
+        self._stats: Dict[str, FrameStats] = {}
+        # Counts the runs, so an outer loop can tell a nested screen ran in its frame
+        self._runs = 0
+        # Events taken off the queue and not handled yet, in order
+        self._pending = []
+
+    def run(
+        self,
+        name: str,
+        running: Callable[[], bool],
+        handle_event: Callable[[pygame.event.Event], None],
+        draw: Callable[[], bool],
+    ):
+        """Runs frames while `running()` is true
+
+        `draw` renders and presents the frame and returns whether it changed anything on
+        screen.
+        """
+        self._runs += 1
+        stats = self._stats.setdefault(name, FrameStats())
+        clock = pygame.time.Clock()
+        last_activity = time.perf_counter()
+        idle = False
+
+        while running():
+            runs = self._runs
+            start = time.perf_counter()
+            events = self._pending + pygame.event.get()
+            self._pending = []
+            for index, event in enumerate(events):
+                handle_event(event)
+                if not running():
+                    # The rest goes to whichever screen runs next
+                    self._pending = events[index + 1 :] + self._pending
+                    break
+            changed = draw()
+
+            now = time.perf_counter()
+            work_time = now - start
+            if events or changed:
+                last_activity = now
+            idle = now - last_activity > self.idle_after
+
+            if idle:
+                # Waiting on the queue instead of sleeping lets input end the idle frame
+                event = pygame.event.wait(int(1000 / self.idle_fps))
+                if event.type != pygame.NOEVENT:
+                    self._pending.append(event)
+                clock.tick()
+            else:
+                clock.tick(self.fps)
+
+            # A nested screen ran inside this frame, which says nothing about its cost
+            if runs == self._runs:
+                budget = 1 / self.fps if self.fps > 0 else math.inf
+                stats.add(work_time, time.perf_counter() - start, idle, budget)
+
+    def stats(self) -> Dict[str, dict]:
+        """Frame statistics of every screen that ran, by name"""
+        return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+    def reset_stats(self):
+        self._stats.clear()
+
+
+frame_scheduler = FrameScheduler()
@@ -0,0 +1,79 @@
+import math
+
+import numpy as np
+
+GAZE_SAMPLE_DTYPE = np.dtype(
+    [
+        ("timestamp", np.float64),
+        ("x", np.float64),
+        ("y", np.float64),
+        ("valid", np.bool_),
+    ]
+)
+
+
+class GazeRingBuffer:
+    """Preallocated ring buffer of gaze samples for one producer and one consumer thread
+
+    The producer pushes samples without taking a lock: it writes the next slot and only
+    then publishes it by advancing the write count. The consumer drains every sample
+    published since its last drain in one copy. When the consumer falls more than a buffer
+    behind, the oldest samples are overwritten and counted in `dropped`.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        if capacity < 2:
+            raise ValueError("the gaze ring buffer needs room for at least 2 samples")
+        self._capacity = capacity
+        self._samples = np.zeros(capacity, dtype=GAZE_SAMPLE_DTYPE)
+        # Only the producer writes _written and only the consumer writes _read
+        self._written = 0
+        self._read = 0
+        self._dropped = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def dropped(self) -> int:
+        """Samples overwritten before the consumer drained them"""
+        return self._dropped
+
+    def push(self, timestamp: float, xpos: float, ypos: float):
+        """Adds a sample, marking it invalid when either coordinate is NaN
+
+        Must only be called from the producer thread.
+        """
+        valid = not (math.isnan(xpos) or math.isnan(ypos))
+        self._samples[self._written % self._capacity] = (timestamp, xpos, ypos, valid)
+        self._written += 1
+
+    def drain(self) -> np.ndarray:
+        """Returns a copy of every sample pushed since the previous drain, oldest first
+
+        Must only be called from the consumer thread.
+        """
+        written = self._written
+        # The slot after the newest sample may be half written by the producer already
+        start = max(self._read, written - self._capacity + 1)
+        samples = self._copy(start, written)
+
+        # Samples the producer overwrote while they were being copied are discarded
+        overwritten = self._written - self._capacity + 1
+        if overwritten > start:
+            samples = samples[overwritten - start :]
+            start = min(overwritten, written)
+
+        self._dropped += start - self._read
+        self._read = written
+        return samples
+
+    def _copy(self, start: int, stop: int) -> np.ndarray:
+        first = start % self._capacity
+        count = stop - start
+        if first + count <= self._capacity:
+            return self._samples[first : first + count].copy()
+        return np.concatenate(
+            (self._samples[first:], self._samples[: first + count - self._capacity])
+        )
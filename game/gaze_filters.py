@@ -0,0 +1,266 @@
+import abc
+import math
+from typing import Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class GazeFilter(abc.ABC):
+    """Base class for the filters that smooth the gaze before it drives the UI
+
+    A filter takes batches of valid samples, as the timestamps in seconds and an (n, 2)
+    array of positions, and returns the filtered positions. It keeps its state between
+    batches, so feeding a stream in one batch or frame by frame gives the same result.
+    """
+
+    @abc.abstractmethod
+    def filter(self, timestamps: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        """Returns the filtered positions of a batch"""
+
+    @abc.abstractmethod
+    def reset(self):
+        """Forgets the samples filtered so far"""
+
+
+class PassThroughFilter(GazeFilter):
+    """Leaves the samples untouched"""
+
+    def filter(self, timestamps, positions):
+        return np.array(positions, dtype=np.float64)
+
+    def reset(self):
+        pass
+
+
+class BoxcarFilter(GazeFilter):
+    """Average of the latest `window` samples"""
+
+    def __init__(self, window: int = 10):
+        self._window = window
+        self.reset()
+
+    def filter(self, timestamps, positions):
+        data = np.concatenate((self._history, np.asarray(positions, np.float64)))
+        sums = np.concatenate((np.zeros((1, 2)), np.cumsum(data, axis=0)))
+        ends = np.arange(len(self._history) + 1, len(data) + 1)
+        starts = np.maximum(ends - self._window, 0)
+        self._history = data[max(0, len(data) - self._window + 1) :]
+        return (sums[ends] - sums[starts]) / (ends - starts)[:, np.newaxis]
+
+    def reset(self):
+        self._history = np.empty((0, 2))
+
+
+class MedianFilter(GazeFilter):
+    """Per axis median of the latest `window` samples, which ignores isolated outliers"""
+
+    def __init__(self, window: int = 5):
+        self._window = window
+        self.reset()
+
+    def filter(self, timestamps, positions):
+        positions = np.asarray(positions, np.float64)
+        if len(positions) == 0:
+            return positions.reshape(0, 2)
+        if self._history is None:
+            # Until the window fills up the first sample stands in for the missing ones
+            self._history = np.repeat(positions[:1], self._window - 1, axis=0)
+        data = np.concatenate((self._history, positions))
+        self._history = data[len(data) - self._window + 1 :]
+        return np.median(sliding_window_view(data, self._window, axis=0), axis=-1)
+
+    def reset(self):
+        self._history = None
+
+
+class OneEuroFilter(GazeFilter):
+    """One Euro filter (Casiez et al. 2012)
+
+    A low pass filter whose cutoff frequency rises with the speed of the gaze: it smooths
+    heavily during fixations and follows saccades with little lag. `min_cutoff` (Hz) sets
+    the smoothing at rest and `beta` how quickly the cutoff rises with speed (in pixels
+    per second). The filter is recursive, so a batch is processed sample by sample.
+    """
+
+    def __init__(
+        self,
+        min_cutoff: float = 0.5,
+        beta: float = 0.02,
+        derivative_cutoff: float = 1.0,
+    ):
+        self._min_cutoff = min_cutoff
+        self._beta = beta
+        self._derivative_cutoff = derivative_cutoff
+        self.reset()
+
+    @staticmethod
+    def _alpha(cutoff, period):
+        return 1 / (1 + 1 / (2 * math.pi * cutoff * period))
+
+    def filter(self, timestamps, positions):
+        result = np.empty((len(positions), 2))
+        for index, (timestamp, position) in enumerate(zip(timestamps, positions)):
+            position = np.asarray(position, np.float64)
+            if self._position is None:
+                self._position = position
+            else:
+                period = max(timestamp - self._timestamp, 1e-6)
+                speed = (position - self._position) / period
+                alpha = self._alpha(self._derivative_cutoff, period)
+                self._speed = self._speed + alpha * (speed - self._speed)
+                cutoff = self._min_cutoff + self._beta * np.abs(self._speed)
+                alpha = self._alpha(cutoff, period)
+                self._position = self._position + alpha * (position - self._position)
+            self._timestamp = timestamp
+            result[index] = self._position
+        return result
+
+    def reset(self):
+        self._position = None
+        self._speed = np.zeros(2)
+        self._timestamp = None
+
+
+class KalmanFilter(GazeFilter):
+    """Constant velocity Kalman filter, run independently on each axis
+
+    `process_noise` is the spectral density of the acceleration the model allows for (in
+    pixels squared per second cubed) and `measurement_noise` the standard deviation of
+    the tracker's noise in pixels. The filter is recursive, so a batch is processed sample
+    by sample.
+    """
+
+    def __init__(self, process_noise: float = 5e5, measurement_noise: float = 15.0):
+        self._process_noise = process_noise
+        self._measurement_variance = measurement_noise**2
+        self.reset()
+
+    def filter(self, timestamps, positions):
+        result = np.empty((len(positions), 2))
+        for index, (timestamp, position) in enumerate(zip(timestamps, positions)):
+            position = np.asarray(position, np.float64)
+            if self._state is None:
+                # State per axis is (position, velocity), covariance is [[pp, pv], [pv, vv]]
+                self._state = np.stack((position, np.zeros(2)))
+                self._covariance = np.stack(
+                    (
+                        np.full(2, self._measurement_variance),
+                        np.zeros(2),
+                        np.full(2, 1e6),
+                    )
+                )
+            else:
+                period = max(timestamp - self._timestamp, 1e-6)
+                self._predict(period)
+                self._update(position)
+            self._timestamp = timestamp
+            result[index] = self._state[0]
+        return result
+
+    def _predict(self, period):
+        position, velocity = self._state
+        pp, pv, vv = self._covariance
+        q = self._process_noise
+        self._state = np.stack((position + velocity * period, velocity))
+        self._covariance = np.stack(
+            (
+                pp + 2 * period * pv + period**2 * vv + q * period**3 / 3,
+                pv + period * vv + q * period**2 / 2,
+                vv + q * period,
+            )
+        )
+
+    def _update(self, measurement):
+        position, velocity = self._state
+        pp, pv, vv = self._covariance
+        innovation_variance = pp + self._measurement_variance
+        position_gain = pp / innovation_variance
+        velocity_gain = pv / innovation_variance
+        innovation = measurement - position
+        self._state = np.stack(
+            (
+                position + position_gain * innovation,
+                velocity + velocity_gain * innovation,
+            )
+        )
+        self._covariance = np.stack(
+            (
+                (1 - position_gain) * pp,
+                (1 - position_gain) * pv,
+                vv - velocity_gain * pv,
+            )
+        )
+
+    def reset(self):
+        self._state = None
+        self._covariance = None
+        self._timestamp = None
+
+
+FILTERS = {
+    "none": PassThroughFilter,
+    "boxcar": BoxcarFilter,
+    "median": MedianFilter,
+    "one_euro": OneEuroFilter,
+    "kalman": KalmanFilter,
+}
+
+
+def create_filter(name: str) -> GazeFilter:
+    """Creates one of the FILTERS with its default settings"""
+    if name not in FILTERS:
+        raise ValueError(
+            f"unknown gaze filter {name!r}, expected one of {', '.join(FILTERS)}"
+        )
+    return FILTERS[name]()
+
+
+def evaluate_filter(
+    gaze_filter: GazeFilter,
+    rate: float = 125,
+    noise: float = 10.0,
+    saccade: float = 300.0,
+    fixation: float = 1.0,
+    batch_size: Optional[int] = 4,
+    seed: int = 0,
+) -> dict:
+    """Measures the latency and the residual jitter a filter adds to a synthetic saccade
+
+    The gaze fixates for `fixation` seconds, jumps `saccade` pixels and fixates again,
+    with Gaussian noise of `noise` pixels added to every sample, and is fed to the filter
+    `batch_size` samples at a time like the frames of the game would. The latency is the
+    time the noise free output takes to cover 90% of the saccade, and the jitter is the
+    RMS error of the noisy output over the second half of the second fixation.
+    """
+    count = int(2 * fixation * rate)
+    timestamps = np.arange(count) / rate
+    truth = np.zeros((count, 2))
+    truth[timestamps >= fixation, 0] = saccade
+    noisy = truth + np.random.default_rng(seed).normal(0, noise, truth.shape)
+
+    def run(positions):
+        gaze_filter.reset()
+        step = batch_size or count
+        output = [
+            gaze_filter.filter(
+                timestamps[start : start + step], positions[start : start + step]
+            )
+            for start in range(0, count, step)
+        ]
+        gaze_filter.reset()
+        return np.concatenate(output)
+
+    clean = run(truth)
+    settled = np.nonzero((timestamps >= fixation) & (clean[:, 0] >= 0.9 * saccade))[0]
+    latency = float(timestamps[settled[0]] - fixation) if len(settled) else math.inf
+
+    steady = timestamps >= 1.5 * fixation
+    filtered = run(noisy)
+    error = filtered[steady] - truth[steady]
+    raw_error = noisy[steady] - truth[steady]
+    return {
+        "latency_ms": latency * 1000,
+        "jitter_px": float(np.sqrt(np.mean(np.sum(error**2, axis=1)))),
+        "raw_jitter_px": float(np.sqrt(np.mean(np.sum(raw_error**2, axis=1)))),
+    }
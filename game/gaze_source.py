@@ -0,0 +1,218 @@
+import abc
+import math
+import threading
+import time
+from typing import Callable, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Same signature as the AdHawk GAZE_IN_SCREEN stream handler: (timestamp, xpos, ypos)
+GazeHandler = Callable[[float, float, float], None]
+
+
+class GazeSource(abc.ABC):
+    """Base class for anything that can feed gaze in screen samples to AdHawkControl"""
+
+    @abc.abstractmethod
+    def start(self, handler: GazeHandler):
+        """Starts calling `handler` with every sample"""
+
+    @abc.abstractmethod
+    def stop(self):
+        """Stops calling the handler, returns once it is no longer called"""
+
+
+class ThreadedGazeSource(GazeSource):
+    """Delivers samples from a worker thread, paced by the sample timestamps
+
+    A speed of 1.0 plays back in real time, 4.0 four times faster and 0 (or None) as fast
+    as the handler can consume the samples.
+    """
+
+    def __init__(self, speed: Optional[float] = 1.0):
+        self._speed = speed
+        self._handler = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._finished = threading.Event()
+
+    def start(self, handler: GazeHandler):
+        self.stop()
+        self._handler = handler
+        self._stop_event.clear()
+        self._finished.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def wait_finished(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until every sample has been delivered"""
+        return self._finished.wait(timeout)
+
+    @abc.abstractmethod
+    def _samples(self) -> Iterator[Tuple[float, float, float]]:
+        """The (timestamp, xpos, ypos) samples to deliver, in order"""
+
+    def _run(self):
+        start_time = time.perf_counter()
+        first_timestamp = None
+        for timestamp, xpos, ypos in self._samples():
+            if first_timestamp is None:
+                first_timestamp = timestamp
+            if self._speed:
+                delay = (timestamp - first_timestamp) / self._speed - (
+                    time.perf_counter() - start_time
+                )
+                if delay > 0 and self._stop_event.wait(delay):
+                    return
+            if self._stop_event.is_set():
+                return
+            self._handler(timestamp, xpos, ypos)
+        self._finished.set()
+
+
+class ReplayGazeSource(ThreadedGazeSource):
+    """Plays back a recorded sample file
+
+    The file holds one comma separated `timestamp,xpos,ypos` sample per line, with the
+    timestamp in seconds and the position normalised to the screen (0..1). Lines starting
+    with `#` are ignored and dropouts are written as `nan`.
+    """
+
+    def __init__(self, path: str, speed: Optional[float] = 1.0, loop: bool = False):
+        super().__init__(speed)
+        self._samples_array = np.loadtxt(
+            path, delimiter=",", comments="#", ndmin=2, dtype=np.float64
+        )
+        if self._samples_array.shape[1] != 3:
+            raise ValueError(
+                f"{path}: expected 3 columns (timestamp, xpos, ypos), "
+                f"got {self._samples_array.shape[1]}"
+            )
+        self._loop = loop
+
+    def __len__(self):
+        return len(self._samples_array)
+
+    def _samples(self):
+        if len(self._samples_array) == 0:
+            return
+        timestamps = self._samples_array[:, 0]
+        # Keeps the timestamps increasing when the file is looped
+        period = timestamps[-1] - timestamps[0]
+        if len(timestamps) > 1:
+            period += (timestamps[-1] - timestamps[0]) / (len(timestamps) - 1)
+        offset = 0.0
+        while True:
+            for timestamp, xpos, ypos in self._samples_array.tolist():
+                yield (timestamp + offset, xpos, ypos)
+            if not self._loop:
+                return
+            offset += period
+
+
+class SyntheticGazeSource(ThreadedGazeSource):
+    """Generates samples along a scripted path
+
+    The path is a sequence of `(xpos, ypos, duration)` waypoints in normalised screen
+    coordinates. The gaze travels in a straight line from the previous waypoint to the next
+    one over `duration` seconds, so repeating a waypoint holds a fixation there and a
+    duration of 0 jumps straight to it. Gaussian noise with a standard deviation of `noise`
+    is added to every sample, and each sample has a `dropout_rate` chance of starting a
+    run of NaN samples `dropout_duration` seconds long, like a blink.
+    """
+
+    def __init__(
+        self,
+        path: Sequence[Tuple[float, float, float]],
+        rate: float = 125,
+        noise: float = 0.0,
+        dropout_rate: float = 0.0,
+        dropout_duration: float = 0.15,
+        speed: Optional[float] = 1.0,
+        loop: bool = True,
+        seed: Optional[int] = None,
+    ):
+        super().__init__(speed)
+        if not path:
+            raise ValueError("the synthetic gaze path needs at least one waypoint")
+        if loop and sum(duration for _, _, duration in path) <= 0:
+            raise ValueError("a looping synthetic gaze path needs a non zero duration")
+        self._path = list(path)
+        self._rate = rate
+        self._noise = noise
+        self._dropout_rate = dropout_rate
+        self._dropout_duration = dropout_duration
+        self._loop = loop
+        self._seed = seed
+
+    @staticmethod
+    def circle(
+        center: Tuple = (0.5, 0.5),
+        radius: float = 0.3,
+        period: float = 4,
+        steps: int = 32,
+    ):
+        """Path that keeps circling `center` once every `period` seconds"""
+        path = []
+        for step in range(steps + 1):
+            angle = 2 * math.pi * step / steps
+            path.append(
+                (
+                    center[0] + radius * math.cos(angle),
+                    center[1] + radius * math.sin(angle),
+                    0 if step == 0 else period / steps,
+                )
+            )
+        return path
+
+    @staticmethod
+    def fixations(points: Sequence[Tuple], hold: float = 1.0):
+        """Path that jumps between `points`, fixating on each for `hold` seconds"""
+        path = []
+        for xpos, ypos in points:
+            path.append((xpos, ypos, 0))
+            path.append((xpos, ypos, hold))
+        return path
+
+    def _positions(self):
+        """Yields the noise free position of every sample in the path"""
+        sample_period = 1 / self._rate
+        while True:
+            previous = self._path[0][:2]
+            elapsed = 0.0
+            for xpos, ypos, duration in self._path:
+                while elapsed < duration:
+                    fraction = elapsed / duration
+                    yield (
+                        previous[0] + (xpos - previous[0]) * fraction,
+                        previous[1] + (ypos - previous[1]) * fraction,
+                    )
+                    elapsed += sample_period
+                elapsed -= duration
+                previous = (xpos, ypos)
+            if not self._loop:
+                yield previous
+                return
+
+    def _samples(self):
+        rng = np.random.default_rng(self._seed)
+        sample_period = 1 / self._rate
+        dropout_samples = 0
+        for index, (xpos, ypos) in enumerate(self._positions()):
+            timestamp = index * sample_period
+            if dropout_samples == 0 and rng.random() < self._dropout_rate:
+                dropout_samples = max(1, round(self._dropout_duration * self._rate))
+            if dropout_samples > 0:
+                dropout_samples -= 1
+                yield (timestamp, math.nan, math.nan)
+                continue
+            if self._noise:
+                xpos += rng.normal(0, self._noise)
+                ypos += rng.normal(0, self._noise)
+            yield (timestamp, xpos, ypos)
@@ -0,0 +1,125 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+import pygame
+
+# Colours the normalised density runs through, from sparse to dense
+COLOUR_STOPS = (
+    (0.0, (0, 0, 255)),
+    (0.35, (0, 255, 255)),
+    (0.6, (0, 255, 0)),
+    (0.8, (255, 255, 0)),
+    (1.0, (255, 0, 0)),
+)
+
+
+def _colour_map(levels: int = 256) -> np.ndarray:
+    """RGBA lookup table from density level to colour, transparent where none was seen"""
+    stops = np.array([stop for stop, _ in COLOUR_STOPS])
+    colours = np.array([colour for _, colour in COLOUR_STOPS], dtype=np.float64)
+    positions = np.linspace(0, 1, levels)
+    table = np.empty((levels, 4), dtype=np.uint8)
+    for channel in range(3):
+        table[:, channel] = np.interp(positions, stops, colours[:, channel])
+    table[:, 3] = np.clip(positions * 2, 0, 1) * 180
+    return table
+
+
+def _box_blur(values: np.ndarray, radius: int, axis: int) -> np.ndarray:
+    """Mean over a window of 2 * radius + 1 along an axis, from a running sum"""
+    padding = [(0, 0), (0, 0)]
+    padding[axis] = (radius + 1, radius)
+    padded = np.pad(values, padding)
+    sums = np.cumsum(padded, axis=axis, dtype=np.float32)
+    window = 2 * radius + 1
+    if axis == 0:
+        return (sums[window:] - sums[:-window]) / window
+    return (sums[:, window:] - sums[:, :-window]) / window
+
+
+class GazeHeatmap:
+    """Counts how many gaze samples land on each pixel of a surface
+
+    Samples are added as they arrive, in constant time each. `render` turns the counts
+    into a colour mapped overlay, blurred with three box blurs in a row, which is close
+    to a gaussian, and `render_async` does so on a worker thread so the frame loop never
+    waits for it. The blur and colour pass runs on POOL x POOL blocks of pixels, which
+    the smooth scale back up hides, to keep it to a few milliseconds.
+    """
+
+    # In surface pixels
+    BLUR_RADIUS = 12
+    POOL = 4
+
+    _colours = _colour_map()
+    _executor = None
+
+    def __init__(self, size: Tuple):
+        self._size = tuple(size)
+        # Indexed [y, x] like the pixels of a surface array
+        self._counts = np.zeros((self._size[1], self._size[0]), dtype=np.float32)
+        self._total = 0
+        self._lock = threading.Lock()
+
+    @property
+    def total(self) -> int:
+        """Number of samples counted"""
+        return self._total
+
+    def add(self, xpos: np.ndarray, ypos: np.ndarray):
+        """Counts samples at surface positions, the ones outside of it are ignored"""
+        columns = np.asarray(xpos, dtype=np.int64)
+        rows = np.asarray(ypos, dtype=np.int64)
+        inside = (
+            (columns >= 0)
+            & (columns < self._size[0])
+            & (rows >= 0)
+            & (rows < self._size[1])
+        )
+        with self._lock:
+            np.add.at(self._counts, (rows[inside], columns[inside]), 1)
+            self._total += int(inside.sum())
+
+    def clear(self):
+        with self._lock:
+            self._counts.fill(0)
+            self._total = 0
+
+    def render(self, size: Optional[Tuple] = None) -> pygame.surface.Surface:
+        """Builds the overlay, scaled to `size` if given"""
+        pool = self.POOL
+        rows, columns = self._size[1] // pool, self._size[0] // pool
+        with self._lock:
+            density = (
+                self._counts[: rows * pool, : columns * pool]
+                .reshape(rows, pool, columns, pool)
+                .sum(axis=(1, 3))
+            )
+
+        radius = max(1, self.BLUR_RADIUS // pool)
+        for _ in range(3):
+            density = _box_blur(density, radius, 0)
+            density = _box_blur(density, radius, 1)
+        peak = density.max()
+        if peak > 0:
+            density /= peak
+        levels = (density * (len(self._colours) - 1)).astype(np.intp)
+        # Transposed to the [x, y] order of pygame's surface arrays
+        pixels = self._colours[levels.T]
+
+        overlay = pygame.surface.Surface((columns, rows), pygame.SRCALPHA)
+        pygame.surfarray.pixels3d(overlay)[...] = pixels[..., :3]
+        pygame.surfarray.pixels_alpha(overlay)[...] = pixels[..., 3]
+        return pygame.transform.smoothscale(
+            overlay, self._size if size is None else tuple(size)
+        )
+
+    def render_async(self, size: Optional[Tuple] = None) -> Future:
+        """Builds the overlay on a worker thread, see `render`"""
+        if GazeHeatmap._executor is None:
+            GazeHeatmap._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="heatmap"
+            )
+        return GazeHeatmap._executor.submit(self.render, size)
@@ -1,13 +1,30 @@
-import json
-
 import pygame
 
 from game.adhawk_control import AdHawkControl
+from game.assets import assets
 from game.play_game import PlayGame
+from game.renderer import Renderer
+from game.scene_loader import ScenePrefetcher
+from game.scene_manager import Screen, scene_manager
+from game.scenes import load_scenes, scene_image_path
+from game.text_renderer import render_text
+from game.thumbnails import ThumbnailCache
 from game.ui import UI
 
 
-class LevelSelector:
+class LevelSelector(Screen):
+
+    name = "level_selector"
+
+    LEVEL_BUTTON_SIZE = (350, 350)
+
+    # Levels on either side of the visible one whose thumbnails are kept decoded
+    PREFETCH_DISTANCE = 1
+
+    # Shared by every level selector so thumbnails requested earlier are not lost
+    _thumbnails = None
+    _scene_prefetcher = None
+
     def __init__(
         self,
         screen: pygame.surface.Surface,
@@ -15,43 +32,66 @@ class LevelSelector:
         cursor: pygame.surface.Surface,
         adhawk_control: AdHawkControl,
     ):
-        self._running = True
         self._screen = screen
         self._draw_surface = draw_surface
-        self._bg = pygame.transform.scale(
-            pygame.image.load("data/level_selector/bg.png"), draw_surface.get_size()
-        )
+        # Copied since the title is drawn onto it
+        self._bg = assets.image(
+            "data/level_selector/bg.png", draw_surface.get_size()
+        ).copy()
 
-        font = pygame.freetype.SysFont("Comic Sans MS", 72)
+        font = assets.font("Comic Sans MS", 72)
 
-        text_image, _ = font.render("Select a level", (255, 0, 0), None)
+        text_image = render_text(font, "Select a level", (255, 0, 0))
         self._bg.blit(text_image, (400, 50))
 
-        self._clock = pygame.time.Clock()
-
         self._adhawk_control = adhawk_control
         self._cursor = cursor
-        self._ui = UI(self._screen, self._draw_surface, self._clock)
+        self._renderer = Renderer(self._screen, self._draw_surface)
+        self._renderer.set_background(self._bg, adhawk_control.get_overlay())
+        # The level picked, opened once its scene is loaded, see _open_level
+        self._picked_scene = None
+        self._loading_text = render_text(
+            assets.font("Comic Sans MS", 36),
+            "Loading...",
+            (255, 255, 255),
+            (0, 0, 0),
+            3,
+        )
+        self._ui = UI(self._screen, self._draw_surface, self._renderer)
+
+        scenes_data = load_scenes()
 
-        with open("data/scenes/scenes.json", "r", encoding="utf8") as reader:
-            scenes_data = json.load(reader)
+        if LevelSelector._thumbnails is None:
+            LevelSelector._thumbnails = ThumbnailCache(self.LEVEL_BUTTON_SIZE)
+        if LevelSelector._scene_prefetcher is None:
+            LevelSelector._scene_prefetcher = ScenePrefetcher(screen.get_size())
 
+        # Thumbnails are only decoded for the levels around the visible one
         self._level_index = 0
         self._levels = []
+        self._level_scenes = []
+        self._level_paths = []
+        self._loaded_levels = set()
         for scene in scenes_data:
             level = self._ui.create_button(
                 None,
                 (640, 350),
-                (350, 350),
-                image=pygame.image.load(scene["filename"]),
+                self.LEVEL_BUTTON_SIZE,
                 visible=False,
             )
             self._levels.append(level)
+            self._level_scenes.append(scene)
+            self._level_paths.append(scene_image_path(scene))
             level.button_clicked.add_callback(
                 lambda _, scene=scene: self._play_level(scene)
             )
+            # The scene starts decoding as soon as the player looks at its level
+            level.button_hovered.add_callback(
+                lambda hovering, scene=scene: self._prefetch_scene(scene, hovering)
+            )
 
         self._levels[self._level_index].set_visible(True)
+        self._prefetch_thumbnails()
 
         previous_button = self._ui.create_button(
             "Previous", (350, 360), (150, 150), font_size=36
@@ -70,41 +110,35 @@ class LevelSelector:
         self._ui.set_cursor(cursor)
         self._cursor = cursor
 
-    def run(self):
-        self._running = True
-
-        while self._running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT or (
-                    event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE
-                ):
-                    self._running = False
-                    break
-                else:
-                    self._ui.handle_event(event)
-
-            self._draw_surface.blit(self._bg, (0, 0))
-
-            self._adhawk_control.draw()
-            self._ui.update_screen_tracker(self._adhawk_control.get_coords())
-            
-            self._ui.render()
-
-            self._screen.blit(
-                pygame.transform.scale(
-                    self._draw_surface,
-                    (
-                        (
-                            self._screen.get_width(),
-                            self._screen.get_height(),
-                        )
-                    ),
-                ),
-                (0, 0),
-            )
+    def enter(self):
+        self._picked_scene = None
+        self._renderer.invalidate()
+        # little hack to make sure cursor goes back to actual pointer position on returning
+        self._ui.handle_event(
+            pygame.event.Event(pygame.MOUSEMOTION, {"pos": pygame.mouse.get_pos()})
+        )
 
-            pygame.display.flip()
-            self._clock.tick(30)
+    def handle_event(self, event: pygame.event.Event):
+        if event.type == pygame.QUIT or (
+            event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE
+        ):
+            scene_manager.pop()
+        else:
+            self._ui.handle_event(event)
+
+    def draw(self) -> bool:
+        self._collect_thumbnails()
+        self._open_level()
+        self._ui.render()
+        return self._renderer.present()
+
+    def update(self):
+        self._adhawk_control.update()
+        self._ui.update_screen_tracker(
+            self._adhawk_control.get_coords(),
+            self._adhawk_control.get_fixations(),
+            self._adhawk_control.get_timestamp(),
+        )
 
     def _previous(self, _):
         self._levels[self._level_index].set_visible(False)
@@ -112,6 +146,7 @@ class LevelSelector:
         if self._level_index < 0:
             self._level_index = len(self._levels) - 1
         self._levels[self._level_index].set_visible(True)
+        self._prefetch_thumbnails()
 
     def _next(self, _):
         self._levels[self._level_index].set_visible(False)
@@ -119,13 +154,73 @@ class LevelSelector:
         if self._level_index == len(self._levels):
             self._level_index = 0
         self._levels[self._level_index].set_visible(True)
+        self._prefetch_thumbnails()
+
+    def _nearby_levels(self):
+        return {
+            (self._level_index + offset) % len(self._levels)
+            for offset in range(-self.PREFETCH_DISTANCE, self.PREFETCH_DISTANCE + 1)
+        }
+
+    def _prefetch_thumbnails(self):
+        """Requests the thumbnails around the visible level and releases the others"""
+        nearby = self._nearby_levels()
+        for index in nearby - self._loaded_levels:
+            self._thumbnails.request(self._level_scenes[index])
+        for index in self._loaded_levels - nearby:
+            self._levels[index].set_image(None)
+            self._loaded_levels.discard(index)
+        for index, path in enumerate(self._level_paths):
+            if index not in nearby:
+                self._thumbnails.cancel(path)
+
+    def _collect_thumbnails(self):
+        for index in self._nearby_levels() - self._loaded_levels:
+            thumbnail = self._thumbnails.poll(self._level_paths[index])
+            if thumbnail is not None:
+                self._levels[index].set_image(thumbnail)
+                self._loaded_levels.add(index)
+
+    def _prefetch_scene(self, scene, hovering):
+        # The picked scene keeps loading, whatever the player looks at meanwhile
+        if self._picked_scene is not None:
+            return
+        if hovering:
+            self._scene_prefetcher.prefetch(scene)
+        else:
+            self._scene_prefetcher.cancel(scene_image_path(scene))
 
     def _back_to_main(self, _):
-        self._running = False
+        scene_manager.pop()
 
     def _play_level(self, scene):
-        play = PlayGame(self._screen, self._draw_surface, self._cursor, self._adhawk_control, scene)
-        play.run()
-
-        # little hack to make sure cursor goes back to actual pointer position on returning here
-        self._ui.handle_event(pygame.event.Event(pygame.MOUSEMOTION, {"pos": pygame.mouse.get_pos()}))
+        if self._picked_scene is None:
+            self._scene_prefetcher.prefetch(scene)
+            self._picked_scene = scene
+
+    def _open_level(self):
+        """Opens the picked level once its scene is loaded, the frame loop never waits
+
+        A new scene's pyramid may have to be built first, which takes a while.
+        """
+        scene = self._picked_scene
+        if scene is None:
+            return
+        path = scene_image_path(scene)
+        if not self._scene_prefetcher.ready(path):
+            self._renderer.blit(self._loading_text, (560, 540))
+            return
+        self._picked_scene = None
+        background = self._scene_prefetcher.take(path)
+        if background is None:
+            # Logged by take, the level can be picked again
+            return
+        play = PlayGame(
+            self._screen,
+            self._draw_surface,
+            self._cursor,
+            self._adhawk_control,
+            scene,
+            background,
+        )
+        scene_manager.push(play)
@@ -0,0 +1,77 @@
+import contextlib
+import threading
+import time
+from typing import Callable, Optional
+
+import pygame
+
+
+class LogicThread:
+    """Runs the input processing and game logic of the active screen at a fixed rate
+
+    Each screen registers its update function with `running` for as long as its loop
+    runs, and only the most recently registered one is called, so a nested screen pauses
+    the one that opened it. The render loop keeps running on the main thread at its own
+    rate, so a slow frame never delays the logic. When an update raises, a QUIT event
+    stops the screen and the error is raised again from `running`.
+    """
+
+    RATE = 120
+
+    def __init__(self, rate: float = RATE):
+        self._period = 1 / rate
+        self._updates = []
+        self._condition = threading.Condition()
+        # Held for every update, so a screen only stops once its last update is done
+        self._updating = threading.Lock()
+        self._error: Optional[BaseException] = None
+        self._thread = None
+
+    @contextlib.contextmanager
+    def running(self, update: Callable[[], None]):
+        """Calls `update` at the fixed rate until the with block exits"""
+        with self._condition:
+            self._updates.append(update)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="logic", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify()
+        try:
+            yield
+        finally:
+            with self._updating, self._condition:
+                self._updates.remove(update)
+                error, self._error = self._error, None
+            if error is not None:
+                raise error
+
+    def _run(self):
+        next_tick = time.perf_counter()
+        while True:
+            with self._condition:
+                while not self._updates or self._error is not None:
+                    self._condition.wait()
+                    next_tick = time.perf_counter()
+            with self._updating:
+                with self._condition:
+                    update = self._updates[-1] if self._updates else None
+                if update is not None:
+                    try:
+                        update()
+                    except BaseException as error:  # pylint: disable=broad-except
+                        with self._condition:
+                            self._error = error
+                        pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+            next_tick += self._period
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -self._period:
+                # Ticks missed under load are dropped rather than run back to back
+                next_tick = time.perf_counter()
+
+
+logic_thread = LogicThread()
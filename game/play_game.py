@@ -1,251 +1,589 @@
-from typing import Tuple
-
+from concurrent.futures import Future
+import math
+import pathlib
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
 import pygame
 
 from game.adhawk_control import AdHawkControl
-from game.screen_tools import point_screen_to_surface
+from game.assets import assets, convert_surface
+from game.fixation import Fixation, FixationDwell
+from game.heatmap import GazeHeatmap
+from game.renderer import Renderer
+from game.scene_catalog import scene_size
+from game.scene_loader import load_scene_image
+from game.scene_manager import Screen, scene_manager
+from game.scene_pyramid import ScenePyramid, SceneView
+from game.scenes import scene_image_path
+from game.screen_tools import scale_surface
+from game.session_recorder import RecordKind, session_recorder
+from game.targets import NO_TARGET, WALDO, TargetMap
+from game.text_renderer import render_text
+from game.transforms import Space, display_transforms, surface_transforms
 from game.ui import UI
 
 
-class PlayGame:
+def _close_pyramid(future: Future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class PlayGame(Screen):
+
+    name = "play_game"
+
+    GAME_DURATION = 120
+
+    # Where the post game screen shows the scene with the heatmap over it
+    HEATMAP_POSITION = (440, 345)
+    HEATMAP_SIZE = (400, 225)
+    # Where the post game screen lists the scene's other targets
+    TARGET_STATS_POSITION = (860, 345)
+
+    # The buttons dwells and clicks are recorded on, the record target numbers index it
+    BUTTONS = ("zoom_out", "back")
+
+    # Fixating for ZOOM_DWELL seconds zooms in ZOOM_STEP times where the player looks,
+    # at least up to MIN_MAX_ZOOM and on to the scene's full resolution
+    ZOOM_DWELL = 1.0
+    ZOOM_STEP = 1.5
+    MIN_MAX_ZOOM = 2.0
+    # Looking within PAN_EDGE of an edge of the screen pans PAN_SPEED views per second,
+    # the countdown and the zoom out button are kept clear of that band
+    PAN_EDGE = 0.08
+    PAN_SPEED = 0.5
+
     def __init__(
         self,
         screen: pygame.surface.Surface,
         draw_surface: pygame.surface.Surface,
         cursor: pygame.surface.Surface,
-        adhawk_control: AdHawkControl,        
+        adhawk_control: AdHawkControl,
         scene,
+        background: Optional[pygame.surface.Surface] = None,
     ):
         self._running = True
         self._screen = screen
         self._draw_surface = draw_surface
-        self._bg = pygame.transform.scale(
-            pygame.image.load(scene["filename"]), draw_surface.get_size()
-        )
+        self._scene = scene
+        # The scene is shown at screen resolution, so a prefetched one is already
+        # scaled. Loading it here waits for its pyramid, the level selector never does.
+        if background is None:
+            background = load_scene_image(scene, screen.get_size())
+        self._bg = background
         self._cursor = cursor
 
-        self._clock = pygame.time.Clock()
-        pygame.time.set_timer(pygame.USEREVENT, 1000)
-        
-        self._ui = UI(self._screen, self._draw_surface, self._clock)
+        self._overlay = adhawk_control.get_overlay()
+
+        self._renderer = Renderer(self._screen, self._draw_surface)
+        self._renderer.set_background(self._bg, self._overlay)
+        self._ui = UI(self._screen, self._draw_surface, self._renderer)
         self._ui.set_cursor(cursor)
+        self._zoom_out_button = self._ui.create_button(
+            "Zoom out", (240, 130), (220, 80), visible=False, font_size=36
+        )
+        self._record_button(self._zoom_out_button, "zoom_out")
+        self._zoom_out_button.button_clicked.add_callback(self._zoom_out_clicked)
 
         self._mouse_position = (0, 0)
-        self._counter = 120
+        self._counter = self.GAME_DURATION
+        self._shown_counter = None
+        self._counter_text = None
+        self._game_over = False
+        self._won = False
+        self._start_time = None
+        self._last_update = None
         self._in_waldo = False
         self._looking_at_waldo_time = 0
         self._total_looking_at_waldo_time = 0
         self._number_times_looked_at_waldo = 0
         self._grace_period = 0
-        self._font = pygame.freetype.SysFont("Comic Sans MS", 36)
-        self._stats_font = pygame.freetype.SysFont("Comic Sans MS", 24)
+        self._font = assets.font("Comic Sans MS", 36)
+        self._stats_font = assets.font("Comic Sans MS", 24)
+        # Waldo is located in scene image pixels, and everything else happens on the
+        # draw surface, like the gaze samples, the heatmap and the recording. Those are
+        # laid out like the whole scene, whatever part of it is in view.
+        self._transforms = surface_transforms(screen, draw_surface).with_scene(
+            scene_size(scene)
+        )
+        # Between the draw surface and the part of the scene in view
+        self._view_transforms = self._transforms
+        self._view = SceneView(
+            self._transforms.size(Space.SCENE),
+            max(
+                self.MIN_MAX_ZOOM,
+                self._transforms.size(Space.SCENE)[0] / screen.get_width(),
+            ),
+        )
+        self._view_lock = threading.Lock()
+        # Zooming in is possible once the scene's pyramid is open, the whole scene is
+        # shown from the prefetched background
+        self._pyramid_future = ScenePyramid.open_async(scene)
+        self._pyramid: Optional[ScenePyramid] = None
+        self._view_surface = None
+        self._drawn_view = None
+        # Only the logic thread zooms with fixations, clicking zoom out hands it over
+        self._zoom_fixation = None
+        self._zoomed_until = None
+        self._zoom_out_requested = threading.Event()
         waldo_location = scene["waldo_location"]
-        self._waldo_rect = pygame.rect.Rect(
-            waldo_location["x"],
-            waldo_location["y"],
-            waldo_location["width"],
-            waldo_location["height"],
+        self._waldo_rect = self._transforms.rect(
+            (
+                waldo_location["x"],
+                waldo_location["y"],
+                waldo_location["width"],
+                waldo_location["height"],
+            ),
+            Space.SCENE,
+            Space.SURFACE,
         )
-        self._circle_cache = {}
+        # Waldo and any other target of the scene, hit tested through a label image
+        self._targets = TargetMap.for_scene(scene, self._transforms)
+        target_count = len(self._targets.names)
+        self._target_dwells = [FixationDwell() for _ in range(target_count)]
+        self._dwelling_targets = set()
+        # Per target: ms spent looking at it, fixations and gaze samples that landed on it
+        self._target_look_time = [0.0] * target_count
+        self._target_fixations = np.zeros(target_count, dtype=np.int64)
+        self._target_samples = np.zeros(target_count, dtype=np.int64)
         self._use_tracker = True
         self._adhawk_control = adhawk_control
 
-    def _circlepoints(self, r):
-        r = int(round(r))
-        if r in self._circle_cache:
-            return self._circle_cache[r]
-        x, y, e = r, 0, 1 - r
-        self._circle_cache[r] = points = []
-        while x >= y:
-            points.append((x, y))
-            y += 1
-            if e < 0:
-                e += 2 * y - 1
-            else:
-                x -= 1
-                e += 2 * (y - x) - 1
-        points += [(y, x) for x, y in points if x > y]
-        points += [(-x, y) for x, y in points if x]
-        points += [(x, -y) for x, y in points if y]
-        points.sort()
-        return points
-
-    def _render_outline_text(
-        self,
-        font: pygame.freetype.SysFont,
-        text: str,
-        gfcolor: Tuple,
-        ocolor: Tuple,
-        outline_size=2,
-    ):
-        textsurface, _ = font.render(text, gfcolor, None)
-        w = textsurface.get_width() + 2 * outline_size
-        h = textsurface.get_height() + 2 * outline_size
-
-        osurf = pygame.surface.Surface((w, h + 2 * outline_size), pygame.SRCALPHA)
-        osurf.fill((0, 0, 0, 0))
-
-        surf = osurf.copy()
-
-        osurf.blit(font.render(text, ocolor, None)[0], (0, 0))
-
-        for dx, dy in self._circlepoints(outline_size):
-            surf.blit(osurf, (dx + outline_size, dy + outline_size))
-
-        surf.blit(textsurface, (outline_size, outline_size))
-        return surf
-
-    def run(self):
-        self._running = True
-
-        text = str(self._counter).rjust(2)
-        game_won = False
-
-        while self._running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT or (
-                    event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE
-                ):
-                    self._running = False
-                    break
-                elif event.type == pygame.USEREVENT:
-                    self._counter = self._counter - 1
-                    text = (
-                        str(self._counter).rjust(2)
-                        if self._counter > 0
-                        else "Game over!"
-                    )
-                else:
-                    self._ui.handle_event(event)
-                if event.type == pygame.MOUSEMOTION:
-                    self._mouse_position = point_screen_to_surface(
-                        event.pos, self._screen, self._draw_surface
-                    )
-
-            self._draw_surface.blit(self._bg, (0, 0))
-
-            text_image = self._render_outline_text(
-                self._font,
-                text,
-                (255, 0, 0),
-                (0, 0, 0),
-                2,
-            )
-
-            self._draw_surface.blit(text_image, (640, 30))
-
-            self._adhawk_control.draw()
-            self._ui.update_screen_tracker(self._adhawk_control.get_coords())
-
-            self._ui.render()
+        self._heatmap = GazeHeatmap(draw_surface.get_size())
+        self._heatmap_future = None
+        self._scene_preview = None
+        self._heatmap_preview = None
+
+    def enter(self):
+        if self._pyramid_future is None:
+            self._pyramid_future = ScenePyramid.open_async(self._scene)
+        if self._start_time is None:
+            self._start_time = time.perf_counter()
+            self._last_update = self._start_time
+        session_recorder.start(
+            pathlib.PurePath(scene_image_path(self._scene)).stem,
+            {
+                "scene": scene_image_path(self._scene),
+                # Like the records, in draw surface pixels
+                "waldo_location": {
+                    "x": self._waldo_rect.x,
+                    "y": self._waldo_rect.y,
+                    "width": self._waldo_rect.width,
+                    "height": self._waldo_rect.height,
+                },
+                "surface_size": list(self._draw_surface.get_size()),
+                "scene_size": list(self._transforms.size(Space.SCENE)),
+                # The record target numbers index this list, Waldo is 0
+                "targets": self._targets.names,
+                # The same for the buttons of the dwell and click records
+                "buttons": list(self.BUTTONS),
+                "game_duration": self.GAME_DURATION,
+            },
+        )
+        self._adhawk_control.fixation_detector.fixation_ended.add_callback(
+            self._record_fixation
+        )
 
-            self.waldo_logic()
+    def exit(self):
+        self._adhawk_control.fixation_detector.fixation_ended.remove_callback(
+            self._record_fixation
+        )
+        session_recorder.stop()
+        # Closed once it is open, if it is still being opened
+        self._pyramid_future.add_done_callback(_close_pyramid)
+        self._pyramid_future = None
+        self._pyramid = None
+        self._zoom_out()
+
+    def _record_fixation(self, fixation: Fixation):
+        target = self._targets.target_at(fixation.center)
+        if target != NO_TARGET:
+            self._target_fixations[target] += 1
+        session_recorder.record(
+            RecordKind.FIXATION,
+            fixation.end,
+            *self._to_whole_scene(*fixation.center),
+            fixation.duration,
+        )
 
-            if self._looking_at_waldo_time > 3000:
-                self._running = False
-                game_won = True
+    def _to_whole_scene(self, xpos, ypos):
+        """Where draw surface positions would be with the whole scene in view"""
+        return self._transforms.xy(
+            *self._view_transforms.xy(xpos, ypos, Space.SURFACE, Space.SCENE),
+            Space.SCENE,
+            Space.SURFACE,
+        )
 
-            if self._counter == 0:
-                self._running = False
-                game_won = False
-
-            self._screen.blit(
-                pygame.transform.scale(
-                    self._draw_surface,
-                    (
-                        (
-                            self._screen.get_width(),
-                            self._screen.get_height(),
-                        )
-                    ),
-                ),
-                (0, 0),
-            )
+    def _zoom_at(self, position, factor: float):
+        """Zooms in by `factor`, the scene at the draw surface `position` staying put"""
+        if self._pyramid is None:
+            return
+        with self._view_lock:
+            point = self._view_transforms.point(position, Space.SURFACE, Space.SCENE)
+            if self._view.zoom_at(point, factor):
+                self._follow_view()
+
+    def _pan(self, delta_x: float, delta_y: float):
+        with self._view_lock:
+            if self._view.pan(delta_x, delta_y):
+                self._follow_view()
+
+    def _zoom_out(self):
+        with self._view_lock:
+            if self._view.reset():
+                self._follow_view()
+
+    def _zoom_out_clicked(self, _position):
+        self._zoom_out_requested.set()
+
+    def _follow_view(self):
+        # Called with the view lock held
+        self._view_transforms = self._transforms.with_scene(
+            self._transforms.size(Space.SCENE), self._view.rect
+        )
+        self._targets.set_transforms(self._view_transforms)
 
-            pygame.display.flip()
-            self._clock.tick(30)
+    def _end_game(self):
+        game_won = self._won
+        self._game_over = True
+        session_recorder.record(
+            RecordKind.GAME_END, self._adhawk_control.get_timestamp(), value=game_won
+        )
+        self._zoom_out()
+        self._zoom_out_button.set_visible(False)
 
         back_button = self._ui.create_button("Back", (640, 640), (200, 100))
+        self._record_button(back_button, "back")
         back_button.button_clicked.add_callback(self._back)
 
-        self._bg = pygame.transform.scale(
-            pygame.image.load("data/level_selector/bg.png"),
+        self._heatmap_future = self._heatmap.render_async(self.HEATMAP_SIZE)
+        self._scene_preview = scale_surface(self._bg, self.HEATMAP_SIZE)
+        # The targets are outlined, the preview shows the whole scene like the screen
+        preview_transforms = display_transforms(
+            self.HEATMAP_SIZE,
             self._draw_surface.get_size(),
+            self._transforms.size(Space.SCENE),
         )
+        for target in range(len(self._targets.names)):
+            bounds = self._targets.bounds(target)
+            if bounds is None:
+                continue
+            target_rect = preview_transforms.rect(bounds, Space.SCENE, Space.SCREEN)
+            pygame.draw.rect(
+                self._scene_preview, (255, 255, 255), target_rect.inflate(4, 4), 2
+            )
+
+        # Copied since the results are drawn onto it
+        self._bg = assets.image(
+            "data/level_selector/bg.png", self._draw_surface.get_size()
+        ).copy()
         if game_won:
             self._game_won()
         else:
             self._game_lost()
 
     def _game_won(self):
-        win_text = self._render_outline_text(
-            self._font, "You Win!", (128, 128, 255), (0, 0, 0), 5
-        )
+        win_text = render_text(self._font, "You Win!", (128, 128, 255), (0, 0, 0), 5)
         self._bg.blit(win_text, (550, 100))
-        self._run_post_game_screen()
+        self._show_post_game_screen()
 
     def _game_lost(self):
-        lost_text = self._render_outline_text(
-            self._font, "You Lost!", (255, 128, 128), (0, 0, 0), 5
-        )
+        lost_text = render_text(self._font, "You Lost!", (255, 128, 128), (0, 0, 0), 5)
         self._bg.blit(lost_text, (550, 100))
-        self._run_post_game_screen()
+        self._show_post_game_screen()
 
-    def _run_post_game_screen(self):
+    def _show_post_game_screen(self):
         self._render_stats()
-        self._running = True
-        while self._running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT or (
-                    event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE
-                ):
-                    self._running = False
-                    break
-                else:
-                    self._ui.handle_event(event)
-
-            self._draw_surface.blit(self._bg, (0, 0))
-
-            self._ui.render()
-
-            self._screen.blit(
-                pygame.transform.scale(
-                    self._draw_surface,
-                    (
-                        (
-                            self._screen.get_width(),
-                            self._screen.get_height(),
-                        )
-                    ),
-                ),
-                (0, 0),
+        self._renderer.set_background(self._bg)
+        self.name = "post_game"
+
+    def handle_event(self, event: pygame.event.Event):
+        if event.type == pygame.QUIT or (
+            event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE
+        ):
+            # Leaving a game in progress shows how it went first
+            if self._game_over:
+                scene_manager.pop()
+            else:
+                self._running = False
+            return
+        self._ui.handle_event(event)
+        if event.type == pygame.MOUSEMOTION:
+            self._mouse_position = self._transforms.point(
+                event.pos, Space.SCREEN, Space.SURFACE
             )
+        elif event.type == pygame.MOUSEWHEEL and not self._game_over:
+            self._zoom_at(self._mouse_position, self.ZOOM_STEP**event.y)
 
-            pygame.display.flip()
+    def draw(self) -> bool:
+        # The logic thread stops the game, the post game screen is set up here
+        if not self._running and not self._game_over:
+            self._end_game()
+
+        if self._game_over:
+            self._draw_heatmap()
+        else:
+            self._draw_view()
+            # The logic thread counts down, the text is only rendered when it changes
+            if self._counter != self._shown_counter:
+                self._shown_counter = self._counter
+                text = (
+                    str(self._shown_counter).rjust(2)
+                    if self._shown_counter > 0
+                    else "Game over!"
+                )
+                self._counter_text = render_text(
+                    self._font,
+                    text,
+                    (255, 0, 0),
+                    (0, 0, 0),
+                    2,
+                )
+            self._renderer.blit(self._counter_text, (640, 70))
+
+        self._ui.render()
+        return self._renderer.present()
+
+    def _draw_view(self):
+        """Shows the scene as zoomed in, drawn again as tiles arrive"""
+        with self._view_lock:
+            view = self._view.rect if self._view.zoom > 1 else None
+        if view is None:
+            # The whole scene is the prefetched background
+            if self._drawn_view is not None:
+                self._renderer.set_background(self._bg, self._overlay)
+                self._drawn_view = None
+            return
+        drawn_view = (view, self._pyramid.version)
+        if drawn_view == self._drawn_view:
+            return
+        if self._view_surface is None:
+            self._view_surface = convert_surface(
+                pygame.surface.Surface(self._screen.get_size())
+            )
+        self._pyramid.draw(self._view_surface, view)
+        self._renderer.set_background(self._view_surface, self._overlay)
+        self._drawn_view = drawn_view
+
+    def _draw_heatmap(self):
+        # The overlay is built on a worker thread and shown once it is ready
+        if self._heatmap_preview is None and self._heatmap_future.done():
+            self._heatmap_preview = self._scene_preview.copy()
+            self._heatmap_preview.blit(self._heatmap_future.result(), (0, 0))
+        if self._heatmap_preview is not None:
+            self._renderer.blit(self._heatmap_preview, self.HEATMAP_POSITION)
+
+    def _record_button(self, button, name: str):
+        """Records the dwells on a button and its clicks, before they are acted on"""
+        target = self.BUTTONS.index(name)
+        button.button_hovered.add_callback(
+            lambda hovering: session_recorder.record(
+                RecordKind.DWELL_START if hovering else RecordKind.DWELL_END,
+                self._adhawk_control.get_timestamp(),
+                target=target,
+            )
+        )
+        button.button_clicked.add_callback(
+            lambda position: session_recorder.record(
+                RecordKind.CLICK,
+                self._adhawk_control.get_timestamp(),
+                *position,
+                target=target,
+            )
+        )
 
-    def _back(self, _):
-        self._running = False
+    def _back(self, _position):
+        scene_manager.pop()
 
     def _render_stats(self):
-        total_time = self._render_outline_text(
-            self._stats_font, f"Total time looking at Waldo: {self._total_looking_at_waldo_time / 1000}s", (255, 255, 255), (0, 0, 0), 3
+        total_time = render_text(
+            self._stats_font,
+            f"Total time looking at Waldo: {self._total_looking_at_waldo_time / 1000:.2f}s",
+            (255, 255, 255),
+            (0, 0, 0),
+            3,
         )
         self._bg.blit(total_time, (450, 250))
-        times_looked = self._render_outline_text(
-            self._stats_font, f"Number of times looked at Waldo: {self._number_times_looked_at_waldo}", (255, 255, 255), (0, 0, 0), 3
+        times_looked = render_text(
+            self._stats_font,
+            f"Number of times looked at Waldo: {self._number_times_looked_at_waldo}",
+            (255, 255, 255),
+            (0, 0, 0),
+            3,
         )
         self._bg.blit(times_looked, (450, 300))
+        # The other targets in a column beside the scene, there is no room under Waldo's
+        xpos, ypos = self.TARGET_STATS_POSITION
+        for stats in self.target_stats()[WALDO + 1 :]:
+            text = render_text(
+                self._stats_font,
+                f"{stats['name']}: {stats['look_time']:.2f}s, "
+                f"{stats['fixations']} fixations",
+                (255, 255, 255),
+                (0, 0, 0),
+                3,
+            )
+            self._bg.blit(text, (xpos, ypos))
+            ypos += text.get_height() + 5
+        # The plain scene until the heatmap is ready
+        self._bg.blit(self._scene_preview, self.HEATMAP_POSITION)
+
+    def target_stats(self) -> List[Dict]:
+        """How each target of the scene was looked at, Waldo first
+
+        `look_time` is in seconds and `looks` the number of times the player started
+        looking at it. Only Waldo is followed when playing with the mouse.
+        """
+        looks = [dwell.starts for dwell in self._target_dwells]
+        look_time = list(self._target_look_time)
+        looks[WALDO] = self._number_times_looked_at_waldo
+        look_time[WALDO] = self._total_looking_at_waldo_time
+        return [
+            {
+                "name": name,
+                "look_time": look_time[target] / 1000,
+                "looks": looks[target],
+                "fixations": int(self._target_fixations[target]),
+                "samples": int(self._target_samples[target]),
+            }
+            for target, name in enumerate(self._targets.names)
+        ]
+
+    def update(self):
+        """Gaze handling, the countdown and target detection, run by the logic thread"""
+        now = time.perf_counter()
+        elapsed = now - self._last_update
+        self._last_update = now
+
+        self._adhawk_control.update()
+        self._ui.update_screen_tracker(
+            self._adhawk_control.get_coords(),
+            self._adhawk_control.get_fixations(),
+            self._adhawk_control.get_timestamp(),
+        )
+        if self._game_over or not self._running:
+            return
+
+        self._counter = max(0, self.GAME_DURATION - int(now - self._start_time))
+        samples = self._adhawk_control.get_samples()
+        valid = samples["valid"]
+        targets = self._targets.lookup(samples["x"][valid], samples["y"][valid])
+        self._target_samples += np.bincount(
+            targets[targets != NO_TARGET], minlength=len(self._target_samples)
+        )
+        # The heatmap and the recording are laid out like the whole scene
+        xpos, ypos = self._to_whole_scene(samples["x"], samples["y"])
+        self._heatmap.add(xpos[valid], ypos[valid])
+        session_recorder.record_gaze(samples["timestamp"], xpos, ypos, valid)
+
+        looked_at = self._looked_at()
+        self.waldo_logic(elapsed * 1000)
+        now_looked_at = self._looked_at()
+        for target in sorted(looked_at.keys() - now_looked_at.keys()):
+            session_recorder.record(
+                RecordKind.TARGET_EXIT,
+                self._adhawk_control.get_timestamp(),
+                value=looked_at[target] / 1000,
+                target=target,
+            )
+        for target in sorted(now_looked_at.keys() - looked_at.keys()):
+            session_recorder.record(
+                RecordKind.TARGET_ENTER,
+                self._adhawk_control.get_timestamp(),
+                target=target,
+            )
 
+        if self._looking_at_waldo_time > 3000:
+            self._won = True
+            self._running = False
+        elif self._counter == 0:
+            self._running = False
+        else:
+            self._view_logic(elapsed)
+
+    def _view_logic(self, elapsed: float):
+        """Zooms in where the player fixates and pans towards the edge they look at"""
+        if self._pyramid is None:
+            future = self._pyramid_future
+            if future is None or not future.done() or future.exception() is not None:
+                return
+            self._pyramid = future.result()
+
+        if self._zoom_out_requested.is_set():
+            self._zoom_out_requested.clear()
+            # The fixation that zoomed out does not go on to zoom back in
+            self._zoom_fixation = self._adhawk_control.get_fixation()
+            self._zoomed_until = math.inf
+            self._zoom_out()
 
-    def waldo_logic(self):
         if self._use_tracker:
-            pos = self._adhawk_control.get_coords()
+            self._zoom_logic()
+            position = self._adhawk_control.get_coords()
         else:
-            pos = self._mouse_position
+            position = self._mouse_position
+        if (
+            self._view.zoom > 1
+            and all(map(math.isfinite, position))
+            and not self._on_zoom_out_button(position)
+        ):
+            width, height = self._draw_surface.get_size()
+            delta_x = (position[0] > width * (1 - self.PAN_EDGE)) - (
+                position[0] < width * self.PAN_EDGE
+            )
+            delta_y = (position[1] > height * (1 - self.PAN_EDGE)) - (
+                position[1] < height * self.PAN_EDGE
+            )
+            if delta_x or delta_y:
+                step = self.PAN_SPEED * elapsed
+                self._pan(delta_x * step, delta_y * step)
+
+        zoomed = self._view.zoom > 1
+        if self._zoom_out_button.get_visible() != zoomed:
+            self._zoom_out_button.set_visible(zoomed)
+
+    def _zoom_logic(self):
+        """Every ZOOM_DWELL seconds of a fixation zooms in once more"""
+        fixation = self._adhawk_control.get_fixation()
+        if fixation is None:
+            return
+        if fixation is not self._zoom_fixation:
+            self._zoom_fixation = fixation
+            self._zoomed_until = fixation.start
+        # Dwelling on the button to zoom out does not zoom in
+        if self._on_zoom_out_button(fixation.center):
+            self._zoomed_until = max(self._zoomed_until, fixation.end)
+        elif fixation.end - self._zoomed_until >= self.ZOOM_DWELL:
+            self._zoomed_until = fixation.end
+            self._zoom_at(fixation.center, self.ZOOM_STEP)
+
+    def _on_zoom_out_button(self, position) -> bool:
+        return self._zoom_out_button.get_visible() and (
+            self._zoom_out_button.get_rect().collidepoint(position)
+        )
 
-        if self._waldo_rect.collidepoint(pos):
+    def _looked_at(self) -> Dict[int, float]:
+        """The targets being looked at, with the ms the current look has lasted"""
+        if not self._use_tracker:
+            return {WALDO: self._looking_at_waldo_time} if self._in_waldo else {}
+        return {
+            target: self._target_dwells[target].time * 1000
+            for target in self._dwelling_targets
+        }
+
+    def waldo_logic(self, elapsed: float):
+        """Adds up the time spent looking at Waldo, `elapsed` is the ms since the last
+        call"""
+        if self._use_tracker:
+            self._target_tracker_logic()
+            return
+
+        pos = self._mouse_position
+        if self._targets.area(WALDO).collidepoint(pos):
             if self._in_waldo:
-                delta = self._clock.get_time()
+                delta = elapsed
                 self._looking_at_waldo_time += delta
                 self._total_looking_at_waldo_time += delta
             else:
@@ -255,10 +593,37 @@ class PlayGame:
             self._grace_period = 0
         else:
             if self._in_waldo:
-                delta = self._clock.get_time()
+                delta = elapsed
                 self._looking_at_waldo_time += delta
                 self._total_looking_at_waldo_time += delta
                 self._grace_period += delta
                 if self._grace_period > 250:
                     self._in_waldo = False
                     self._grace_period = 0
+
+    def _target_tracker_logic(self):
+        """Only fixations on a target count, so noise and blinks do not end the look
+
+        Only the targets under the fixations and the ones already being looked at are
+        updated, however many targets the scene has.
+        """
+        fixations = self._adhawk_control.get_fixations()
+        timestamp = self._adhawk_control.get_timestamp()
+        targets = self._dwelling_targets | {
+            self._targets.target_at(fixation.center) for fixation in fixations
+        }
+        targets.discard(NO_TARGET)
+        for target in targets:
+            delta = self._target_dwells[target].update(
+                fixations, self._targets.area(target), timestamp
+            )
+            self._target_look_time[target] += delta * 1000
+        self._dwelling_targets = {
+            target for target in targets if self._target_dwells[target].inside
+        }
+
+        waldo_dwell = self._target_dwells[WALDO]
+        self._number_times_looked_at_waldo = waldo_dwell.starts
+        self._in_waldo = waldo_dwell.inside
+        self._looking_at_waldo_time = waldo_dwell.time * 1000
+        self._total_looking_at_waldo_time = self._target_look_time[WALDO]
@@ -0,0 +1,171 @@
+from typing import List, Optional, Tuple, Union
+import weakref
+
+import pygame
+
+from game.screen_tools import scale_surface, scale_surface_to_screen
+from game.transforms import Space, surface_transforms
+
+
+class Renderer:
+    """Composes each frame from a static background and the blits queued for that frame
+
+    Layout is done in draw surface coordinates, but frames are drawn straight onto the
+    screen: every surface is scaled to screen resolution the first time it is blitted and
+    the scaled copy is reused for as long as the surface lives, so no frame ever rescales
+    the whole draw surface.
+
+    With dirty rectangles enabled only the regions whose blits changed since the previous
+    frame (a surface that moved, appeared, disappeared or was swapped for another one) are
+    redrawn and pushed to the display with pygame.display.update. Blits of a surface whose
+    pixels change in place need a `key` that changes with them, which also refreshes the
+    scaled copy, and anything else can be forced onto the next frame with `invalidate`.
+    """
+
+    USE_DIRTY_RECTS = True
+
+    # Past this fraction of the screen a full redraw is cheaper than the pieces
+    FULL_REDRAW_FRACTION = 0.5
+
+    def __init__(
+        self,
+        screen: pygame.surface.Surface,
+        draw_surface: pygame.surface.Surface,
+        use_dirty_rects: Optional[bool] = None,
+    ):
+        self._screen = screen
+        self._draw_surface = draw_surface
+        self._transforms = surface_transforms(screen, draw_surface)
+        self._use_dirty_rects = (
+            self.USE_DIRTY_RECTS if use_dirty_rects is None else use_dirty_rects
+        )
+        self._screen_rect = screen.get_rect()
+        self._background = pygame.surface.Surface(screen.get_size())
+        self._scaled = weakref.WeakKeyDictionary()
+        self._blits = []
+        self._previous_blits = {}
+        self._dirty = []
+        self._full_redraw = True
+
+    def set_background(
+        self, background: pygame.surface.Surface, *overlays: pygame.surface.Surface
+    ):
+        """Sets the static layer every frame is drawn on, with any overlays baked in
+
+        The background and overlays cover the whole frame whatever their size.
+        """
+        self._background = scale_surface(background, self._screen.get_size()).copy()
+        for overlay in overlays:
+            self._background.blit(
+                scale_surface(overlay, self._screen.get_size()), (0, 0)
+            )
+        self.invalidate()
+
+    def blit(
+        self,
+        source: pygame.surface.Surface,
+        position: Union[Tuple, pygame.rect.Rect],
+        key=None,
+    ):
+        """Queues a blit onto the frame being built, at a draw surface position"""
+        scaled = self._scale(source, key)
+        # Sized like the scaled copy, mapping both corners could round it a pixel off
+        xpos, ypos = self._transforms.point(
+            tuple(position)[:2], Space.SURFACE, Space.SCREEN
+        )
+        rect = pygame.rect.Rect((round(xpos), round(ypos)), scaled.get_size())
+        self._blits.append((scaled, rect, key))
+
+    def invalidate(self, rect: Optional[pygame.rect.Rect] = None):
+        """Forces a region of the draw surface, or the whole frame, to be redrawn"""
+        if rect is None:
+            self._full_redraw = True
+        else:
+            self._dirty.append(self._transforms.rect(rect, Space.SURFACE, Space.SCREEN))
+
+    def present(self) -> bool:
+        """Draws the queued blits and pushes the result to the display
+
+        Returns whether the frame differs from the previous one.
+        """
+        blits = self._blits
+        self._blits = []
+
+        current = {}
+        for source, rect, key in blits:
+            current[(id(source), tuple(rect), key)] = (source, rect)
+        changed = (
+            self._full_redraw
+            or bool(self._dirty)
+            or current.keys() != self._previous_blits.keys()
+        )
+
+        if not self._use_dirty_rects or self._full_redraw:
+            dirty = [self._screen_rect]
+        else:
+            dirty = self._dirty
+            for signature, (_, rect) in current.items():
+                if signature not in self._previous_blits:
+                    dirty.append(rect)
+            for signature, (_, rect) in self._previous_blits.items():
+                if signature not in current:
+                    dirty.append(rect)
+            dirty = self._merge(dirty)
+            area = sum(rect.width * rect.height for rect in dirty)
+            if area > self.FULL_REDRAW_FRACTION * self._screen_rect.width * (
+                self._screen_rect.height
+            ):
+                dirty = [self._screen_rect]
+
+        # Keeping the sources referenced keeps their ids unique until the next comparison
+        self._previous_blits = current
+        self._dirty = []
+        self._full_redraw = False
+
+        for area in dirty:
+            self._screen.blit(self._background, area, area)
+            for source, rect, _ in blits:
+                if rect.colliderect(area):
+                    clipped = rect.clip(area)
+                    self._screen.blit(source, clipped, clipped.move(-rect.x, -rect.y))
+
+        if dirty == [self._screen_rect]:
+            pygame.display.flip()
+        else:
+            pygame.display.update(dirty)
+        return changed
+
+    def _scale(self, source: pygame.surface.Surface, key) -> pygame.surface.Surface:
+        """Returns the screen resolution copy of a surface, scaling it on first use
+
+        A new key rescales the surface into its existing copy, without allocating.
+        """
+        cached = self._scaled.get(source)
+        if cached is None:
+            cached = (
+                key,
+                scale_surface_to_screen(source, self._screen, self._draw_surface),
+            )
+            self._scaled[source] = cached
+        elif cached[0] != key:
+            if cached[1] is not source:
+                scale_surface_to_screen(
+                    source, self._screen, self._draw_surface, cached[1]
+                )
+            cached = (key, cached[1])
+            self._scaled[source] = cached
+        return cached[1]
+
+    def _merge(self, rects: List[pygame.rect.Rect]) -> List[pygame.rect.Rect]:
+        """Clips the rects to the screen and joins the ones that overlap"""
+        merged = []
+        for rect in rects:
+            rect = rect.clip(self._screen_rect)
+            if rect.width == 0 or rect.height == 0:
+                continue
+            index = rect.collidelist(merged)
+            while index != -1:
+                rect.union_ip(merged.pop(index))
+                index = rect.collidelist(merged)
+            merged.append(rect)
+        return merged
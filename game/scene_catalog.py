@@ -0,0 +1,188 @@
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import os
+import pathlib
+import struct
+from typing import Dict, List, Optional, Tuple
+
+from game.scenes import scene_image_path
+
+SCENE_SUFFIXES = (".png", ".jpg", ".jpeg")
+
+# Size and modification time of every image when it was last hashed, kept out of the
+# catalog because they differ between checkouts
+STATS_FILE = "data/cache/scene_stats.json"
+
+# Given to new scenes until someone annotates them, in scene image pixels like every
+# Waldo location
+PLACEHOLDER_LOCATION = {"x": 0, "y": 0, "width": 10, "height": 10}
+
+# JPEG start of frame markers, the ones that carry the image size
+_JPEG_FRAME_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def image_size(path: str) -> Tuple[int, int]:
+    """Reads the width and height of a PNG or JPEG image from its header
+
+    Anything else is decoded with pygame.
+    """
+    with open(path, "rb") as reader:
+        head = reader.read(24)
+        if head[:8] == b"\x89PNG\r\n\x1a\n" and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if head[:2] == b"\xff\xd8":
+            reader.seek(2)
+            while True:
+                marker = reader.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF:
+                    break
+                if marker[1] in (0x01, 0xFF) or 0xD0 <= marker[1] <= 0xD7:
+                    # Fill bytes and markers without a length
+                    reader.seek(-1 if marker[1] == 0xFF else 0, os.SEEK_CUR)
+                    continue
+                (length,) = struct.unpack(">H", reader.read(2))
+                if marker[1] in _JPEG_FRAME_MARKERS:
+                    height, width = struct.unpack(">xHH", reader.read(5))
+                    return (width, height)
+                reader.seek(length - 2, os.SEEK_CUR)
+
+    import pygame  # pylint: disable=import-outside-toplevel
+
+    return pygame.image.load(path).get_size()
+
+
+def scene_size(scene: Dict) -> Tuple[int, int]:
+    """Size of a scene's image, from the catalog or else from the image itself"""
+    if "width" in scene and "height" in scene:
+        return (scene["width"], scene["height"])
+    return image_size(scene_image_path(scene))
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as reader:
+        for block in iter(lambda: reader.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _file_stat(path: str) -> Dict:
+    stat = os.stat(path)
+    return {"bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def inspect_image(path: str) -> Tuple[Dict, Dict]:
+    """Hashes an image and reads its size, the catalog fields that need its content
+
+    Also returns the file's stats from before it was read, for STATS_FILE.
+    """
+    stat = _file_stat(path)
+    width, height = image_size(path)
+    sha1 = file_hash(path)
+    return {"sha1": sha1, "width": width, "height": height}, {"sha1": sha1, **stat}
+
+
+def _unchanged(entry: Optional[Dict], stat: Optional[Dict], path: str) -> bool:
+    if entry is None or stat is None or stat["sha1"] != entry.get("sha1"):
+        return False
+    return (stat["bytes"], stat["mtime_ns"]) == tuple(_file_stat(path).values())
+
+
+def load_stats(path: str = STATS_FILE) -> Dict[str, Dict]:
+    """Reads the image stats written by write_stats, none if there are none yet"""
+    try:
+        with open(path, "r", encoding="utf8") as reader:
+            return json.load(reader)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_stats(stats: Dict[str, Dict], path: str = STATS_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf8") as writer:
+        json.dump(stats, writer)
+    os.replace(temporary_path, path)
+
+
+def update_catalog(
+    scenes: List[Dict],
+    directory: str,
+    workers: Optional[int] = None,
+    stats: Optional[Dict[str, Dict]] = None,
+) -> Tuple[List[Dict], Dict]:
+    """Brings a scene catalog in line with the images in `directory`
+
+    Only new images and images whose size or modification time changed since `stats`
+    (see load_stats) are inspected, on a pool of `workers` processes, and `stats` is
+    updated for every image in place. Every other field of an entry, such as its
+    annotations, is kept. An image that was renamed or moved keeps the entry of the one
+    with the same hash that disappeared. Entries of images that no longer exist are
+    dropped. Paths are stored relative to the working directory, with / separators.
+
+    Returns the new catalog, sorted by path, and how many entries were added, updated,
+    moved, removed and left unchanged.
+    """
+    # Relative however `directory` is given, to match the catalog's filenames
+    images = sorted(
+        pathlib.Path(os.path.relpath(path)).as_posix()
+        for path in pathlib.Path(directory).rglob("*")
+        if path.suffix.lower() in SCENE_SUFFIXES and path.is_file()
+    )
+    entries = {scene_image_path(scene): dict(scene) for scene in scenes}
+
+    if stats is None:
+        stats = {}
+    to_inspect = [
+        path
+        for path in images
+        if not _unchanged(entries.get(path), stats.get(path), path)
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        inspected = dict(zip(to_inspect, executor.map(inspect_image, to_inspect)))
+    present = set(images)
+    for path in set(stats) - present:
+        del stats[path]
+    stats.update((path, stat) for path, (_, stat) in inspected.items())
+
+    # Entries that lost their image, by hash, for renamed and moved images to claim
+    orphans = {
+        entry["sha1"]: entry
+        for path, entry in entries.items()
+        if path not in present and "sha1" in entry
+    }
+    counts = {"added": 0, "updated": 0, "moved": 0, "removed": 0, "unchanged": 0}
+    catalog = []
+    for path in images:
+        entry = entries.get(path)
+        details = inspected[path][0] if path in inspected else None
+        if details is None or (
+            entry is not None and entry.get("sha1") == details["sha1"]
+        ):
+            counts["unchanged"] += 1
+        elif entry is not None:
+            counts["updated"] += 1
+        else:
+            entry = orphans.pop(details["sha1"], None)
+            if entry is None:
+                entry = {"waldo_location": dict(PLACEHOLDER_LOCATION)}
+                counts["added"] += 1
+            else:
+                counts["moved"] += 1
+        entry.update(details or {})
+        # Catalogs written before STATS_FILE kept these in the entries
+        for key in ("filename", "bytes", "mtime_ns"):
+            entry.pop(key, None)
+        # The file name first, to keep the catalog readable
+        catalog.append({"filename": path, **entry})
+    counts["removed"] = sum(path not in present for path in entries) - counts["moved"]
+    return catalog, counts
+
+
+def write_catalog(scenes: List[Dict], path: str):
+    """Writes the catalog to a temporary file and moves it over `path` in one step"""
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf8") as writer:
+        writer.write(json.dumps(scenes, ensure_ascii=False, indent="  "))
+    os.replace(temporary_path, path)
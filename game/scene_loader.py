@@ -0,0 +1,83 @@
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+import pygame
+
+from game.assets import convert_surface
+from game.scene_pyramid import ScenePyramid, load_overview
+from game.scenes import scene_image_path
+
+logger = logging.getLogger(__name__)
+
+
+def load_scene_image(scene: Dict, size: Tuple) -> pygame.surface.Surface:
+    """The whole scene scaled to `size`, read from its pyramid
+
+    The scene image itself is never decoded once the pyramid is built, so large posters
+    take no more memory than screen sized scenes. Waits for a missing pyramid to be
+    built, see ScenePyramid.build_async.
+    """
+    directory = ScenePyramid.build_async(scene).result()
+    return convert_surface(load_overview(directory, size))
+
+
+class ScenePrefetcher:
+    """Decodes the scene a player is about to pick on a worker thread
+
+    Only one scene is prefetched at a time: asking for another one cancels the previous
+    request, or discards its result if it already started.
+    """
+
+    def __init__(self, size: Tuple):
+        self._size = tuple(size)
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="scene-prefetch"
+        )
+        self._path = None
+        self._future: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    def prefetch(self, scene: Dict):
+        path = scene_image_path(scene)
+        with self._lock:
+            if self._path == path and self._future is not None:
+                return
+            if self._future is not None:
+                self._future.cancel()
+            self._path = path
+            self._future = self._executor.submit(load_scene_image, scene, self._size)
+
+    def cancel(self, path: str):
+        with self._lock:
+            if self._path != path:
+                return
+            self._future.cancel()
+            self._path = None
+            self._future = None
+
+    def ready(self, path: str) -> bool:
+        """Whether `path` is being prefetched and take would not wait for it"""
+        with self._lock:
+            return self._path == path and self._future.done()
+
+    def take(self, path: str) -> Optional[pygame.surface.Surface]:
+        """Returns the prefetched scene, waiting for it if it is still being decoded
+
+        None means `path` was not prefetched, or failed to load, and has to be loaded by
+        the caller. Failures are logged rather than raised, this runs in the frame loop.
+        """
+        with self._lock:
+            if self._path != path:
+                return None
+            future = self._future
+            self._path = None
+            self._future = None
+        try:
+            return future.result()
+        except CancelledError:
+            return None
+        except Exception as error:  # pylint: disable=broad-except
+            logger.warning("prefetching %s failed: %s", path, error)
+            return None
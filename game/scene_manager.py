@@ -0,0 +1,111 @@
+import abc
+import contextlib
+from typing import List
+
+import pygame
+
+from game.frame_scheduler import frame_scheduler
+from game.logic_thread import logic_thread
+
+
+class Screen(abc.ABC):
+    """Base class of the screens run by the SceneManager
+
+    `name` labels the screen's frame statistics.
+    """
+
+    name = "screen"
+
+    def enter(self):
+        """Called when the screen comes to the top of the stack"""
+
+    def exit(self):
+        """Called when the screen leaves the top of the stack"""
+
+    def handle_event(self, event: pygame.event.Event):
+        pass
+
+    @abc.abstractmethod
+    def draw(self) -> bool:
+        """Renders and presents a frame, returns whether anything changed on screen"""
+
+    def update(self):
+        """Gaze handling and game logic, run by the logic thread while on top"""
+
+
+class SceneManager:
+    """Stack of screens, of which only the top one runs
+
+    Screens stay built while they are on the stack, so returning to one is instant and
+    keeps its state and caches. Transitions requested during a frame, e.g. from a button
+    callback, take effect once the frame is done.
+    """
+
+    def __init__(self):
+        self._stack: List[Screen] = []
+        # Keeps each screen's update registered with the logic thread while it is stacked
+        self._updates: List[contextlib.ExitStack] = []
+        self._transitions = []
+
+    @property
+    def top(self) -> Screen:
+        return self._stack[-1]
+
+    def push(self, screen: Screen):
+        """Runs `screen` on top of the current one"""
+        self._transitions.append((self._push, screen))
+
+    def pop(self):
+        """Closes the current screen and returns to the one below, if any"""
+        self._transitions.append((self._pop,))
+
+    def replace(self, screen: Screen):
+        """Closes the current screen and runs `screen` in its place"""
+        self._transitions.append((self._pop,))
+        self._transitions.append((self._push, screen))
+
+    def run(self, screen: Screen):
+        """Runs `screen` and whatever it opens, until the stack is empty"""
+        self._push(screen)
+        try:
+            while self._stack:
+                top = self.top
+                name = top.name
+                frame_scheduler.run(
+                    name,
+                    lambda: not self._transitions and top.name == name,
+                    top.handle_event,
+                    top.draw,
+                )
+                transitions, self._transitions = self._transitions, []
+                for transition, *args in transitions:
+                    transition(*args)
+        finally:
+            self._transitions = []
+            while self._updates:
+                self._stack.pop()
+                self._updates.pop().close()
+
+    def _push(self, screen: Screen):
+        if self._stack:
+            self.top.exit()
+        self._stack.append(screen)
+        screen.enter()
+        updates = contextlib.ExitStack()
+        updates.enter_context(logic_thread.running(screen.update))
+        self._updates.append(updates)
+
+    def _pop(self):
+        if not self._stack:
+            return
+        screen = self._stack.pop()
+        try:
+            # Raises any error the screen's update ran into
+            self._updates.pop().close()
+        finally:
+            screen.exit()
+        if self._stack:
+            self.top.enter()
+
+
+scene_manager = SceneManager()
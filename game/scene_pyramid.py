@@ -0,0 +1,399 @@
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+import json
+import math
+import os
+import shutil
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import pygame
+
+from game.assets import convert_surface
+from game.scene_catalog import file_hash
+from game.scenes import scene_image_path
+from game.screen_tools import scale_surface
+
+PYRAMID_DIR = "data/cache/pyramids"
+PYRAMID_FILE = "pyramid.json"
+
+# Side of the square tiles, in pixels of their level
+TILE_SIZE = 256
+TILE_QUALITY = 90
+
+
+def pyramid_path(scene: Dict, directory: str = PYRAMID_DIR) -> str:
+    """Where a scene's pyramid is kept, named after the image's content
+
+    A renamed image keeps its pyramid and a replaced one gets a new one.
+    """
+    digest = scene.get("sha1") or file_hash(scene_image_path(scene))
+    return os.path.join(directory, digest)
+
+
+def _tile_path(directory: str, level: int, row: int, column: int) -> str:
+    return os.path.join(directory, str(level), f"{row}_{column}.jpg")
+
+
+def _read_description(directory: str) -> Dict:
+    with open(os.path.join(directory, PYRAMID_FILE), encoding="utf8") as reader:
+        return json.load(reader)
+
+
+def _level_sizes(description: Dict) -> List[Tuple]:
+    """The size of every level, halved rounding up like build_pyramid does"""
+    sizes = [(description["width"], description["height"])]
+    for _ in range(description["levels"] - 1):
+        width, height = sizes[-1]
+        sizes.append(((width + 1) // 2, (height + 1) // 2))
+    return sizes
+
+
+def build_pyramid(image_path: str, directory: str, tile_size: int = TILE_SIZE):
+    """Cuts an image into tiles, at full size and at every halving of it
+
+    Level 0 is the image itself, and each level is half the size of the one below,
+    down to the first one that fits in a single tile. Tiles are written to a
+    temporary directory that is moved to `directory` once complete, so a pyramid is
+    either all there or not at all.
+    """
+    image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"cannot read image {image_path}")
+    height, width = image.shape[:2]
+    temporary = f"{directory}.{os.getpid()}.{threading.get_ident()}.tmp"
+    shutil.rmtree(temporary, ignore_errors=True)
+
+    level = 0
+    while True:
+        os.makedirs(os.path.join(temporary, str(level)))
+        level_height, level_width = image.shape[:2]
+        for row in range(math.ceil(level_height / tile_size)):
+            for column in range(math.ceil(level_width / tile_size)):
+                tile = image[
+                    row * tile_size : (row + 1) * tile_size,
+                    column * tile_size : (column + 1) * tile_size,
+                ]
+                cv2.imwrite(
+                    _tile_path(temporary, level, row, column),
+                    tile,
+                    [cv2.IMWRITE_JPEG_QUALITY, TILE_QUALITY],
+                )
+        if level_width <= tile_size and level_height <= tile_size:
+            break
+        # Halved with area averaging, rounding up so no edge pixel is lost
+        image = cv2.resize(
+            image,
+            ((level_width + 1) // 2, (level_height + 1) // 2),
+            interpolation=cv2.INTER_AREA,
+        )
+        level += 1
+
+    with open(os.path.join(temporary, PYRAMID_FILE), "w", encoding="utf8") as writer:
+        json.dump(
+            {
+                "width": width,
+                "height": height,
+                "tile_size": tile_size,
+                "levels": level + 1,
+            },
+            writer,
+        )
+    try:
+        os.rename(temporary, directory)
+    except OSError:
+        # Someone else built it first
+        shutil.rmtree(temporary, ignore_errors=True)
+
+
+def load_overview(directory: str, size: Tuple) -> pygame.surface.Surface:
+    """The whole scene of a pyramid scaled to `size`
+
+    Only the smallest level at least `size` big is decoded, so a poster of any size
+    costs about as much as an image a few times the size of the result.
+    """
+    description = _read_description(directory)
+    sizes = _level_sizes(description)
+    level = 0
+    while (
+        level + 1 < len(sizes)
+        and sizes[level + 1][0] >= size[0]
+        and sizes[level + 1][1] >= size[1]
+    ):
+        level += 1
+    tile_size = description["tile_size"]
+    image = pygame.surface.Surface(sizes[level])
+    for row in range(math.ceil(sizes[level][1] / tile_size)):
+        for column in range(math.ceil(sizes[level][0] / tile_size)):
+            tile = pygame.image.load(_tile_path(directory, level, row, column))
+            image.blit(tile, (column * tile_size, row * tile_size))
+    return scale_surface(image, size)
+
+
+def ensure_pyramid(scene: Dict, directory: str = PYRAMID_DIR) -> Tuple[str, bool]:
+    """Returns the path of the scene's pyramid, and whether it had to be built"""
+    path = pyramid_path(scene, directory)
+    if os.path.exists(os.path.join(path, PYRAMID_FILE)):
+        return path, False
+    os.makedirs(directory, exist_ok=True)
+    build_pyramid(scene_image_path(scene), path)
+    return path, True
+
+
+def _ensure_pyramid(scene: Dict) -> bool:
+    return ensure_pyramid(scene)[1]
+
+
+def update_pyramids(scenes: Sequence[Dict], workers: Optional[int] = None) -> Dict:
+    """Builds the pyramids of the catalog's scenes that do not have one yet
+
+    Returns how many were built and how many already existed.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        built = sum(executor.map(_ensure_pyramid, scenes))
+    return {"built": built, "cached": len(scenes) - built}
+
+
+class ScenePyramid:
+    """Draws any part of a scene at screen resolution from its tiled pyramid
+
+    Only the tiles in view are decoded, from the level closest to the resolution they
+    are shown at, on a pool of worker threads. The MAX_TILES most recently drawn tiles
+    are kept, so memory use stays the same whatever the size of the scene. Until a
+    tile is loaded its part of the view is drawn from the smallest level, which is
+    always loaded. `version` changes whenever a tile arrives, to know when a view
+    drawn with missing tiles is worth drawing again.
+    """
+
+    MAX_TILES = 192
+    WORKERS = 2
+
+    _opener = None
+    # One thread builds the missing pyramids, so a single scene image is decoded whole
+    # at a time, and each scene's build is shared by everyone waiting for it
+    _builder = None
+    _builds: Dict[str, Future] = {}
+    _builds_lock = threading.Lock()
+
+    def __init__(self, directory: str):
+        description = _read_description(directory)
+        self._directory = directory
+        self._size = (description["width"], description["height"])
+        self._tile_size = description["tile_size"]
+        self._levels = description["levels"]
+        self._top = self._load_tile((self._levels - 1, 0, 0))
+        self._tiles: "OrderedDict[Tuple, pygame.surface.Surface]" = OrderedDict()
+        self._pending: Dict[Tuple, Future] = {}
+        self._failed = set()
+        self._lock = threading.Lock()
+        self._version = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.WORKERS, thread_name_prefix="scene-tiles"
+        )
+
+    @classmethod
+    def build_async(cls, scene: Dict) -> Future:
+        """The directory of a scene's pyramid, built in the background if missing
+
+        However many callers ask for a scene, its pyramid is built once. A failed build
+        is tried again by the next request.
+        """
+        directory = pyramid_path(scene)
+        with ScenePyramid._builds_lock:
+            future = ScenePyramid._builds.get(directory)
+            if future is not None and not (
+                future.done() and future.exception() is not None
+            ):
+                return future
+            if os.path.exists(os.path.join(directory, PYRAMID_FILE)):
+                future = Future()
+                future.set_result(directory)
+            else:
+                if ScenePyramid._builder is None:
+                    ScenePyramid._builder = ThreadPoolExecutor(
+                        max_workers=1, thread_name_prefix="scene-pyramid-build"
+                    )
+                future = ScenePyramid._builder.submit(lambda: ensure_pyramid(scene)[0])
+            ScenePyramid._builds[directory] = future
+            return future
+
+    @classmethod
+    def open_async(cls, scene: Dict) -> Future:
+        """Opens a scene's pyramid on a worker thread, once it is built"""
+        if ScenePyramid._opener is None:
+            ScenePyramid._opener = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="scene-pyramid"
+            )
+        build = cls.build_async(scene)
+        return ScenePyramid._opener.submit(lambda: cls(build.result()))
+
+    @property
+    def size(self) -> Tuple:
+        return self._size
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def close(self):
+        """Stops loading tiles and lets go of the loaded ones"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._tiles.clear()
+            self._pending.clear()
+
+    def level_for(self, scale: float) -> int:
+        """The smallest level with at least `scale` of its pixels per scene pixel"""
+        if scale <= 0:
+            return self._levels - 1
+        level = int(math.floor(math.log2(1 / scale))) if scale < 1 else 0
+        return max(0, min(self._levels - 1, level))
+
+    def draw(self, surface: pygame.surface.Surface, view: Tuple) -> bool:
+        """Draws the `view` (x, y, width, height) of the scene over all of `surface`
+
+        Returns whether every tile was there, tiles that were not are requested.
+        """
+        left, top, width, height = view
+        scale_x = surface.get_width() / width
+        scale_y = surface.get_height() / height
+        level = self.level_for(max(scale_x, scale_y))
+        factor = 1 << level
+        span = self._tile_size * factor
+        rows = math.ceil(self._size[1] / span)
+        columns = math.ceil(self._size[0] / span)
+        first_row, last_row = int(top // span), math.ceil((top + height) / span)
+        first_column, last_column = int(left // span), math.ceil((left + width) / span)
+        wanted = [
+            (level, row, column)
+            for row in range(max(0, first_row), min(rows, last_row))
+            for column in range(max(0, first_column), min(columns, last_column))
+        ]
+        with self._lock:
+            tiles = {key: self._tiles.get(key) for key in wanted}
+            for key, tile in tiles.items():
+                if tile is not None:
+                    self._tiles.move_to_end(key)
+            # Tiles that went out of view before being loaded are not worth loading
+            for key in list(self._pending):
+                if key not in tiles and self._pending[key].cancel():
+                    del self._pending[key]
+            missing = [key for key, tile in tiles.items() if tile is None]
+            for key in missing:
+                if key not in self._pending and key not in self._failed:
+                    self._pending[key] = self._executor.submit(self._load, key)
+        complete = all(tile is not None for tile in tiles.values())
+        if not complete:
+            self._draw_top(surface, view)
+        for (_, row, column), tile in tiles.items():
+            if tile is None:
+                continue
+            # Both edges are rounded, so neighbouring tiles meet without a gap
+            x0 = round((column * span - left) * scale_x)
+            y0 = round((row * span - top) * scale_y)
+            x1 = round((column * span + tile.get_width() * factor - left) * scale_x)
+            y1 = round((row * span + tile.get_height() * factor - top) * scale_y)
+            if x1 > x0 and y1 > y0:
+                surface.blit(scale_surface(tile, (x1 - x0, y1 - y0)), (x0, y0))
+        return complete
+
+    def _draw_top(self, surface: pygame.surface.Surface, view: Tuple):
+        """Fills the view from the smallest level, blurry but always there"""
+        left, top, width, height = view
+        factor_x = self._top.get_width() / self._size[0]
+        factor_y = self._top.get_height() / self._size[1]
+        area = pygame.rect.Rect(
+            int(left * factor_x),
+            int(top * factor_y),
+            max(1, math.ceil(width * factor_x)),
+            max(1, math.ceil(height * factor_y)),
+        ).clip(self._top.get_rect())
+        if area.width and area.height:
+            surface.blit(
+                scale_surface(self._top.subsurface(area), surface.get_size()), (0, 0)
+            )
+
+    def _load_tile(self, key: Tuple) -> pygame.surface.Surface:
+        return convert_surface(pygame.image.load(_tile_path(self._directory, *key)))
+
+    def _load(self, key: Tuple):
+        try:
+            tile = self._load_tile(key)
+        except (OSError, pygame.error):
+            # Drawn from the smallest level from now on
+            with self._lock:
+                self._pending.pop(key, None)
+                self._failed.add(key)
+            return
+        with self._lock:
+            self._pending.pop(key, None)
+            self._tiles[key] = tile
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > self.MAX_TILES:
+                self._tiles.popitem(last=False)
+            self._version += 1
+
+
+class SceneView:
+    """The part of a scene in view, zoomed in and panned around within the scene
+
+    The view keeps the scene's aspect ratio, a zoom of 1 shows all of it and
+    `max_zoom` is as far in as it goes. Positions are in scene pixels.
+    """
+
+    def __init__(self, scene_size: Tuple, max_zoom: float):
+        self._scene_size = tuple(scene_size)
+        self._max_zoom = max(1.0, max_zoom)
+        self._zoom = 1.0
+        self._left = 0.0
+        self._top = 0.0
+
+    @property
+    def zoom(self) -> float:
+        return self._zoom
+
+    @property
+    def rect(self) -> Tuple:
+        """(x, y, width, height) of the view"""
+        return (
+            self._left,
+            self._top,
+            self._scene_size[0] / self._zoom,
+            self._scene_size[1] / self._zoom,
+        )
+
+    def zoom_at(self, point: Tuple, factor: float) -> bool:
+        """Zooms by `factor` keeping the scene `point` where it is in view
+
+        Returns whether the view changed.
+        """
+        zoom = max(1.0, min(self._max_zoom, self._zoom * factor))
+        if zoom == self._zoom:
+            return False
+        ratio = self._zoom / zoom
+        self._left = point[0] - (point[0] - self._left) * ratio
+        self._top = point[1] - (point[1] - self._top) * ratio
+        self._zoom = zoom
+        self._clamp()
+        return True
+
+    def pan(self, delta_x: float, delta_y: float) -> bool:
+        """Moves the view by fractions of its size, returns whether it moved"""
+        _, _, width, height = self.rect
+        previous = (self._left, self._top)
+        self._left += delta_x * width
+        self._top += delta_y * height
+        self._clamp()
+        return (self._left, self._top) != previous
+
+    def reset(self) -> bool:
+        changed = self._zoom != 1.0
+        self._zoom = 1.0
+        self._left = self._top = 0.0
+        return changed
+
+    def _clamp(self):
+        _, _, width, height = self.rect
+        self._left = max(0.0, min(self._scene_size[0] - width, self._left))
+        self._top = max(0.0, min(self._scene_size[1] - height, self._top))
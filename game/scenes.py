@@ -0,0 +1,16 @@
+import json
+import pathlib
+from typing import Dict, List
+
+SCENES_FILE = "data/scenes/scenes.json"
+
+
+def load_scenes(path: str = SCENES_FILE) -> List[Dict]:
+    with open(path, "r", encoding="utf8") as reader:
+        return json.load(reader)
+
+
+def scene_image_path(scene: Dict) -> str:
+    """Returns the scene's image path with separators that work on every platform"""
+    # Catalogs written on Windows store backslash separated paths
+    return pathlib.PureWindowsPath(scene["filename"]).as_posix()
@@ -1,17 +1,46 @@
 import pygame
-from typing import Tuple
+from typing import Optional, Tuple
 
-def point_screen_to_surface(
-    point: Tuple,
+def size_surface_to_screen(
+    size: Tuple,
     screen: pygame.surface.Surface,
     draw_surface: pygame.surface.Surface,
-)-> Tuple:
-    return (point[0] * draw_surface.get_width() / screen.get_width(), point[1] * draw_surface.get_height() / screen.get_height())
+) -> Tuple:
+    """Size in screen pixels of something `size` big on the draw surface"""
+    return (
+        max(1, round(size[0] * screen.get_width() / draw_surface.get_width())),
+        max(1, round(size[1] * screen.get_height() / draw_surface.get_height())),
+    )
+
+
+def scale_surface(
+    surface: pygame.surface.Surface,
+    size: Tuple,
+    dest: Optional[pygame.surface.Surface] = None,
+) -> pygame.surface.Surface:
+    """Scales an asset once, filtering it when the pixel format allows
 
+    Passing the result of an earlier scale of the same surface as `dest` rescales into it
+    instead of allocating a new surface.
+    """
+    if surface.get_size() == tuple(size):
+        return surface
+    if dest is None:
+        if surface.get_bitsize() in (24, 32):
+            return pygame.transform.smoothscale(surface, size)
+        return pygame.transform.scale(surface, size)
+    if surface.get_bitsize() in (24, 32):
+        return pygame.transform.smoothscale(surface, size, dest)
+    return pygame.transform.scale(surface, size, dest)
 
-def point_surface_to_screen(
-    point: Tuple,
+
+def scale_surface_to_screen(
+    surface: pygame.surface.Surface,
     screen: pygame.surface.Surface,
     draw_surface: pygame.surface.Surface,
-) -> Tuple:
-    return (point[0] * screen.get_width() / draw_surface.get_width(), point[1] * screen.get_height() / draw_surface.get_height())
+    dest: Optional[pygame.surface.Surface] = None,
+) -> pygame.surface.Surface:
+    """Scales a surface laid out on the draw surface to screen resolution"""
+    return scale_surface(
+        surface, size_surface_to_screen(surface.get_size(), screen, draw_surface), dest
+    )
@@ -0,0 +1,120 @@
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from game.session_recorder import RecordKind, load_session
+from game.targets import WALDO
+
+# Summary columns, in the order they are reported
+SUMMARY_COLUMNS = (
+    "sessions",
+    "found_rate",
+    "first_fixation_s_mean",
+    "first_fixation_s_p50",
+    "revisits_mean",
+    "dwell_false_positive_rate",
+    "search_path_px_p10",
+    "search_path_px_p50",
+    "search_path_px_p90",
+)
+
+
+def session_metrics(path: str) -> Dict:
+    """Measures one session file, with a pass over its records per metric
+
+    - first_fixation_s: seconds from the first gaze sample to when the player first
+      looked at Waldo, the first TARGET_ENTER record on him, NaN if they never did. The
+      fixation records cannot tell, the one that wins the game ends after it.
+    - revisits: times the player came back to Waldo after first looking at him, from
+      the TARGET_ENTER records on Waldo after the first one, other targets ignored
+    - dwells, dwell_clicks: button dwells, and the ones that ended in a click. A dwell
+      that ends without a click is counted as a false positive.
+    - search_path_px: length of the path through the fixations, in draw surface pixels
+    """
+    metadata, records = load_session(path)
+    kinds = records["kind"]
+    timestamps = records["timestamp"]
+
+    gaze = kinds == RecordKind.GAZE
+    start = timestamps[gaze][0] if gaze.any() else np.nan
+
+    waldo_entries = (kinds == RecordKind.TARGET_ENTER) & (records["target"] == WALDO)
+    if waldo_entries.any():
+        first_fixation = timestamps[np.argmax(waldo_entries)] - start
+    else:
+        first_fixation = np.nan
+
+    fixations = records[kinds == RecordKind.FIXATION]
+
+    search_path = float(
+        np.hypot(np.diff(fixations["x"]), np.diff(fixations["y"])).sum()
+    )
+
+    # A click comes before the end of its dwell, if the dwell ends at all, and dwells
+    # on different buttons are told apart by their target
+    button_records = records[
+        (kinds == RecordKind.DWELL_START)
+        | (kinds == RecordKind.DWELL_END)
+        | (kinds == RecordKind.CLICK)
+    ]
+    dwells = dwell_clicks = 0
+    for button in np.unique(button_records["target"]):
+        dwell_events = button_records["kind"][button_records["target"] == button]
+        dwells += int((dwell_events == RecordKind.DWELL_START).sum())
+        follows_start = np.concatenate(
+            ([False], dwell_events[:-1] == RecordKind.DWELL_START)
+        )
+        dwell_clicks += int(((dwell_events == RecordKind.CLICK) & follows_start).sum())
+
+    game_end = records[kinds == RecordKind.GAME_END]
+    return {
+        "path": path,
+        "scene": metadata["scene"],
+        "player": metadata.get("player", "anonymous"),
+        "found": bool(len(game_end) and game_end["value"][-1] > 0),
+        "first_fixation_s": float(first_fixation),
+        "revisits": max(0, int(waldo_entries.sum()) - 1),
+        "dwells": dwells,
+        "dwell_clicks": dwell_clicks,
+        "search_path_px": search_path,
+    }
+
+
+def _nan_statistic(function, values: np.ndarray) -> float:
+    values = values[~np.isnan(values)]
+    return float(function(values)) if len(values) else float("nan")
+
+
+def summarize(metrics: Iterable[Dict], key: str) -> List[Dict]:
+    """Aggregates session metrics by `key`, e.g. "scene" or "player"
+
+    Returns one row per value of `key` with the SUMMARY_COLUMNS, sorted by the value.
+    """
+    groups: Dict[str, List[Dict]] = {}
+    for session in metrics:
+        groups.setdefault(session[key], []).append(session)
+
+    rows = []
+    for name in sorted(groups):
+        sessions = groups[name]
+        first_fixation = np.array([s["first_fixation_s"] for s in sessions])
+        search_path = np.array([s["search_path_px"] for s in sessions])
+        dwells = sum(s["dwells"] for s in sessions)
+        dwell_clicks = sum(s["dwell_clicks"] for s in sessions)
+        row = {
+            key: name,
+            "sessions": len(sessions),
+            "found_rate": float(np.mean([s["found"] for s in sessions])),
+            "first_fixation_s_mean": _nan_statistic(np.mean, first_fixation),
+            "first_fixation_s_p50": _nan_statistic(np.median, first_fixation),
+            "revisits_mean": float(np.mean([s["revisits"] for s in sessions])),
+            "dwell_false_positive_rate": (
+                (dwells - dwell_clicks) / dwells if dwells else float("nan")
+            ),
+        }
+        for percentile in (10, 50, 90):
+            row[f"search_path_px_p{percentile}"] = float(
+                np.percentile(search_path, percentile)
+            )
+        rows.append(row)
+    return rows
@@ -0,0 +1,281 @@
+import enum
+import json
+import os
+import queue
+import re
+import threading
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Records have a fixed size, so a session file is an array once its header is skipped
+SESSION_RECORD_DTYPE = np.dtype(
+    [
+        ("timestamp", np.float64),
+        ("x", np.float32),
+        ("y", np.float32),
+        ("value", np.float32),
+        ("kind", np.uint8),
+        ("target", np.uint8),
+    ],
+    align=True,
+)
+
+SESSION_MAGIC = b"WWSESS01"
+SESSION_EXTENSION = ".session"
+
+# The records start at a multiple of this, so memory mapped records stay aligned
+HEADER_ALIGNMENT = 64
+
+
+class RecordKind(enum.IntEnum):
+    """What a record stands for, and what its fields hold
+
+    Positions are in draw surface coordinates and timestamps in gaze sample time.
+    """
+
+    # value: 1 for a valid sample, 0 for a dropout
+    GAZE = 0
+    # x, y: center, value: duration in seconds, recorded when the fixation ends
+    FIXATION = 1
+    # target: button, an index into the metadata's `buttons`, when the gaze or the
+    # mouse starts to dwell on it
+    DWELL_START = 2
+    # target: button, when the gaze or the mouse leaves it
+    DWELL_END = 3
+    # target: button, x, y: where it was clicked
+    CLICK = 4
+    # target: target the player started looking at, an index into the metadata's
+    # `targets`, 0 is Waldo
+    TARGET_ENTER = 5
+    # target: target looked away from, value: seconds spent looking at it
+    TARGET_EXIT = 6
+    # value: 1 if the player found Waldo
+    GAME_END = 7
+
+
+def _header(metadata: dict) -> bytes:
+    text = json.dumps(metadata).encode("utf8")
+    size = len(SESSION_MAGIC) + 4 + len(text)
+    padding = -size % HEADER_ALIGNMENT
+    return (
+        SESSION_MAGIC
+        + (len(text) + padding).to_bytes(4, "little")
+        + text
+        + b" " * padding
+    )
+
+
+def load_session(path: str) -> Tuple[dict, np.ndarray]:
+    """Returns the metadata and the records of a session file, memory mapped
+
+    A file whose writing was cut short loses at most its last, partial record.
+    """
+    with open(path, "rb") as reader:
+        if reader.read(len(SESSION_MAGIC)) != SESSION_MAGIC:
+            raise ValueError(f"{path} is not a session file")
+        length = int.from_bytes(reader.read(4), "little")
+        metadata = json.loads(reader.read(length))
+        offset = reader.tell()
+        count = (os.fstat(reader.fileno()).st_size - offset) // (
+            SESSION_RECORD_DTYPE.itemsize
+        )
+    if metadata.get("record_size") != SESSION_RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} was written with a different record layout")
+    if count == 0:
+        return metadata, np.zeros(0, dtype=SESSION_RECORD_DTYPE)
+    return metadata, np.memmap(
+        path, dtype=SESSION_RECORD_DTYPE, mode="r", offset=offset, shape=(count,)
+    )
+
+
+class SessionRecorder:
+    """Records a game session to a file, without ever waiting for the disk
+
+    Records are appended to a preallocated chunk of CHUNK_SIZE records, and full chunks
+    are handed to a writer thread, which also opens and closes the files. At most
+    MAX_PENDING_CHUNKS chunks wait for it: when the disk cannot keep up, further chunks
+    are dropped and counted in `dropped` rather than buffered without bound. Recording
+    is off until a `directory` is set, and any thread can record.
+    """
+
+    CHUNK_SIZE = 4096
+    MAX_PENDING_CHUNKS = 64
+
+    def __init__(self, directory: Optional[str] = None, player: str = "anonymous"):
+        self.directory = directory
+        self.player = player
+        self._lock = threading.Lock()
+        self._chunk = None
+        self._count = 0
+        self._recording = False
+        self._dropped = 0
+        self._error: Optional[OSError] = None
+        self._sessions = 0
+        self._commands = queue.Queue()
+        self._pending = threading.Semaphore(self.MAX_PENDING_CHUNKS)
+        self._thread = None
+
+    @property
+    def recording(self) -> bool:
+        return self._recording
+
+    @property
+    def dropped(self) -> int:
+        """Records dropped because the writer fell behind"""
+        return self._dropped
+
+    def start(self, name: str, metadata: dict):
+        """Starts a session file named after `name`, ending the current one"""
+        if self.directory is None:
+            return
+        self.stop()
+        started = time.time()
+        self._sessions += 1
+        name = re.sub(r"[^\w.-]+", "_", name)
+        path = os.path.join(
+            self.directory,
+            f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(started))}"
+            f"-{os.getpid()}-{self._sessions}-{name}{SESSION_EXTENSION}",
+        )
+        header = _header(
+            {
+                **metadata,
+                "player": self.player,
+                "started": started,
+                "record_size": SESSION_RECORD_DTYPE.itemsize,
+            }
+        )
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._write, name="session recorder", daemon=True
+                )
+                self._thread.start()
+            self._commands.put(("open", path, header))
+            self._chunk = np.zeros(self.CHUNK_SIZE, dtype=SESSION_RECORD_DTYPE)
+            self._count = 0
+            self._recording = True
+
+    def stop(self):
+        """Ends the current session, its file is finished in the background"""
+        with self._lock:
+            if not self._recording:
+                return
+            self._flush()
+            self._commands.put(("close",))
+            self._recording = False
+
+    def close(self, timeout: Optional[float] = None):
+        """Ends the current session and waits until everything is on disk
+
+        Raises the first error the writer thread ran into, if any.
+        """
+        self.stop()
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._commands.put(None)
+        if thread is not None:
+            thread.join(timeout)
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def record(
+        self,
+        kind: RecordKind,
+        timestamp: Optional[float],
+        xpos: float = np.nan,
+        ypos: float = np.nan,
+        value: float = np.nan,
+        target: int = 0,
+    ):
+        if not self._recording:
+            return
+        with self._lock:
+            if not self._recording:
+                return
+            self._chunk[self._count] = (
+                np.nan if timestamp is None else timestamp,
+                xpos,
+                ypos,
+                value,
+                kind,
+                target,
+            )
+            self._count += 1
+            if self._count == self.CHUNK_SIZE:
+                self._flush()
+
+    def record_gaze(
+        self,
+        timestamps: np.ndarray,
+        xpos: np.ndarray,
+        ypos: np.ndarray,
+        valid: np.ndarray,
+    ):
+        """Records a batch of gaze samples in one go"""
+        if not self._recording:
+            return
+        with self._lock:
+            if not self._recording:
+                return
+            start = 0
+            while start < len(timestamps):
+                count = min(len(timestamps) - start, self.CHUNK_SIZE - self._count)
+                records = self._chunk[self._count : self._count + count]
+                end = start + count
+                records["timestamp"] = timestamps[start:end]
+                records["x"] = xpos[start:end]
+                records["y"] = ypos[start:end]
+                records["value"] = valid[start:end]
+                records["kind"] = RecordKind.GAZE
+                records["target"] = 0
+                self._count += count
+                start = end
+                if self._count == self.CHUNK_SIZE:
+                    self._flush()
+
+    def _flush(self):
+        """Hands the chunk to the writer thread, called with the lock held"""
+        if self._count == 0:
+            return
+        if self._pending.acquire(blocking=False):
+            self._commands.put(("write", self._chunk[: self._count]))
+            self._chunk = np.zeros(self.CHUNK_SIZE, dtype=SESSION_RECORD_DTYPE)
+        else:
+            self._dropped += self._count
+        self._count = 0
+
+    def _write(self):
+        writer = None
+        while True:
+            command = self._commands.get()
+            if command is None:
+                break
+            try:
+                if command[0] == "open":
+                    _, path, header = command
+                    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                    writer = open(path, "wb")  # pylint: disable=consider-using-with
+                    writer.write(header)
+                elif command[0] == "write":
+                    if writer is not None:
+                        writer.write(command[1].tobytes())
+                elif writer is not None:
+                    writer.close()
+                    writer = None
+            except OSError as error:
+                # The session is lost, the error is raised again by close()
+                self._error = error
+                writer = None
+            finally:
+                if command[0] == "write":
+                    self._pending.release()
+        if writer is not None:
+            writer.close()
+
+
+session_recorder = SessionRecorder()
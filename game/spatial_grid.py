@@ -0,0 +1,62 @@
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import pygame
+
+
+class SpatialGrid:
+    """Buckets rects into square cells, to find what is under a point without a full scan
+
+    Items are stored with a rect and an order. When several rects contain the point, the
+    item with the highest order wins, e.g. the one drawn on top.
+    """
+
+    def __init__(self, cell_size: int = 128):
+        self._cell_size = cell_size
+        self._cells: Dict[Tuple, Dict[Hashable, Tuple]] = {}
+        self._items: Dict[Hashable, List[Tuple]] = {}
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, item: Hashable):
+        return item in self._items
+
+    def insert(self, item: Hashable, rect: pygame.rect.Rect, order: int = 0):
+        """Adds an item, or moves it if it is already in the grid"""
+        self.remove(item)
+        rect = pygame.rect.Rect(rect)
+        if rect.width <= 0 or rect.height <= 0:
+            return
+        first = self._cell(rect.topleft)
+        last = self._cell((rect.right - 1, rect.bottom - 1))
+        cells = [
+            (column, row)
+            for column in range(first[0], last[0] + 1)
+            for row in range(first[1], last[1] + 1)
+        ]
+        for cell in cells:
+            self._cells.setdefault(cell, {})[item] = (rect, order)
+        self._items[item] = cells
+
+    def remove(self, item: Hashable):
+        for cell in self._items.pop(item, ()):
+            bucket = self._cells[cell]
+            del bucket[item]
+            if not bucket:
+                del self._cells[cell]
+
+    def query(self, point: Tuple) -> Optional[Hashable]:
+        """Returns the top item whose rect contains `point`, if any"""
+        bucket = self._cells.get(self._cell(point))
+        if not bucket:
+            return None
+        found = None
+        found_order = None
+        for item, (rect, order) in bucket.items():
+            if rect.collidepoint(point) and (found is None or order > found_order):
+                found = item
+                found_order = order
+        return found
+
+    def _cell(self, point: Tuple) -> Tuple:
+        return (int(point[0] // self._cell_size), int(point[1] // self._cell_size))
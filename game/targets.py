@@ -0,0 +1,330 @@
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import math
+import os
+import pathlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+import pygame
+
+from game.scene_catalog import scene_size
+from game.scenes import scene_image_path
+from game.transforms import CoordinateTransforms, Space
+
+# Index of Waldo among a scene's targets, he is always the first
+WALDO = 0
+
+# Returned by the lookups where there is no target
+NO_TARGET = -1
+
+LABELS_EXTENSION = ".labels.npz"
+# Changed whenever label images are built differently, to rebuild the cached ones
+LABELS_VERSION = 4
+
+# Labels are stored as 8 bit values, 0 being no target
+MAX_TARGETS = 255
+
+# Label images of larger scenes are scaled down to this many pixels, so they take as
+# little memory for a poster as for a screen sized scene
+MAX_LABEL_PIXELS = 1 << 22
+
+
+def scene_targets(scene: Dict) -> List[Dict]:
+    """The targets of a scene, Waldo first
+
+    Waldo is placed by the scene's `waldo_location` rect, and any other target is listed
+    in its `targets`, each with a `name` and one of:
+
+    - `x`, `y`, `width` and `height`, a rect
+    - `polygon`, a list of [x, y] points
+    - `mask`, the path of an image whose opaque, or else light, pixels are the target,
+      placed with its top left corner at `x`, `y` (0, 0 by default)
+
+    Everything is in scene image pixels.
+    """
+    return [{"name": "Waldo", **scene["waldo_location"]}] + list(
+        scene.get("targets", [])
+    )
+
+
+def label_size(size: Tuple) -> Tuple[int, int]:
+    """The size of the label image of a scene `size` big"""
+    width, height = size
+    scale = min(1.0, math.sqrt(MAX_LABEL_PIXELS / (width * height)))
+    return (max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale)))
+
+
+# Fractional bits of the polygon points, so scaled down polygons keep their shape
+_POLYGON_SHIFT = 4
+
+
+def _draw_target(labels: np.ndarray, label: int, target: Dict, scale: Tuple):
+    """Draws a target given in scene pixels, `scale` being label pixels per scene pixel
+
+    A target only partly covering a label pixel gets the whole pixel, so small targets
+    never disappear.
+    """
+    scale_x, scale_y = scale
+    if "polygon" in target:
+        points = np.asarray(target["polygon"], dtype=np.float64) * (scale_x, scale_y)
+        points = np.round(points * (1 << _POLYGON_SHIFT)).astype(np.int32)
+        cv2.fillPoly(labels, [points], label, shift=_POLYGON_SHIFT)
+    elif "mask" in target:
+        mask = cv2.imread(target["mask"], cv2.IMREAD_UNCHANGED)
+        if mask is None:
+            raise ValueError(f"cannot read target mask {target['mask']}")
+        if mask.ndim == 3 and mask.shape[2] == 4:
+            inside = mask[..., 3] > 127
+        else:
+            gray = mask if mask.ndim == 2 else cv2.cvtColor(mask, cv2.COLOR_BGR2GRAY)
+            inside = gray > 127
+        left = math.floor(target.get("x", 0) * scale_x)
+        top = math.floor(target.get("y", 0) * scale_y)
+        if scale != (1.0, 1.0):
+            size = (
+                max(1, math.ceil(inside.shape[1] * scale_x)),
+                max(1, math.ceil(inside.shape[0] * scale_y)),
+            )
+            inside = (
+                cv2.resize(
+                    inside.astype(np.uint8) * 255, size, interpolation=cv2.INTER_AREA
+                )
+                > 0
+            )
+        # Clipped to the scene, a mask may hang over its edges
+        right = min(labels.shape[1], left + inside.shape[1])
+        bottom = min(labels.shape[0], top + inside.shape[0])
+        if right <= max(0, left) or bottom <= max(0, top):
+            return
+        inside = inside[max(0, -top) : bottom - top, max(0, -left) : right - left]
+        region = labels[max(0, top) : bottom, max(0, left) : right]
+        region[inside] = label
+    else:
+        # Clipped to the scene, negative ends would wrap around
+        left = max(0, min(labels.shape[1], math.floor(target["x"] * scale_x)))
+        top = max(0, min(labels.shape[0], math.floor(target["y"] * scale_y)))
+        right = target["x"] + target["width"]
+        right = max(0, min(labels.shape[1], math.ceil(right * scale_x)))
+        bottom = target["y"] + target["height"]
+        bottom = max(0, min(labels.shape[0], math.ceil(bottom * scale_y)))
+        if right > left and bottom > top:
+            labels[top:bottom, left:right] = label
+
+
+def _target_bounds(labels: np.ndarray, count: int, scale: Tuple) -> np.ndarray:
+    """The x, y, width, height of every target in scene pixels, all 0 if none shows
+
+    One pass over the labelled pixels, whatever the number of targets.
+    """
+    rows, columns = np.nonzero(labels)
+    targets = labels[rows, columns].astype(np.intp) - 1
+    first_column = np.full(count, labels.shape[1], dtype=np.int64)
+    first_row = np.full(count, labels.shape[0], dtype=np.int64)
+    last_column = np.full(count, -1, dtype=np.int64)
+    last_row = np.full(count, -1, dtype=np.int64)
+    np.minimum.at(first_column, targets, columns)
+    np.minimum.at(first_row, targets, rows)
+    np.maximum.at(last_column, targets, columns)
+    np.maximum.at(last_row, targets, rows)
+
+    bounds = np.zeros((count, 4), dtype=np.int32)
+    shown = last_column >= 0
+    # From label pixels back to the scene pixels they cover
+    left = np.floor(first_column[shown] / scale[0])
+    top = np.floor(first_row[shown] / scale[1])
+    bounds[shown, 0] = left
+    bounds[shown, 1] = top
+    bounds[shown, 2] = np.ceil((last_column[shown] + 1) / scale[0]) - left
+    bounds[shown, 3] = np.ceil((last_row[shown] + 1) / scale[1]) - top
+    return bounds
+
+
+def build_label_image(scene: Dict) -> Tuple[np.ndarray, np.ndarray]:
+    """Draws the scene's targets into an image the size of the scene, see label_size
+
+    Each pixel holds the index of the target it belongs to plus one, or 0 outside of
+    every target. Where targets overlap, the one listed first wins. Scenes over
+    MAX_LABEL_PIXELS get a scaled down image, the targets are never drawn at full size.
+    Returned with the bounds of the targets, see _target_bounds.
+    """
+    targets = scene_targets(scene)
+    if len(targets) > MAX_TARGETS:
+        raise ValueError(
+            f"{scene_image_path(scene)} has {len(targets)} targets, "
+            f"at most {MAX_TARGETS} are supported"
+        )
+    width, height = scene_size(scene)
+    label_width, label_height = label_size((width, height))
+    scale = (label_width / width, label_height / height)
+    labels = np.zeros((label_height, label_width), dtype=np.uint8)
+    for index in reversed(range(len(targets))):
+        _draw_target(labels, index + 1, targets[index], scale)
+    return labels, _target_bounds(labels, len(targets), scale)
+
+
+def label_image_path(scene: Dict) -> str:
+    """Where the scene's label image is cached, next to the scene's image"""
+    path = pathlib.PurePosixPath(scene_image_path(scene))
+    return str(path.with_name(path.stem + LABELS_EXTENSION))
+
+
+def _label_key(scene: Dict) -> str:
+    """Hash of everything the label image is built from"""
+    targets = scene_targets(scene)
+    masks = {
+        target["mask"]: os.stat(target["mask"]).st_mtime_ns
+        for target in targets
+        if "mask" in target
+    }
+    description = json.dumps(
+        {
+            "version": LABELS_VERSION,
+            "size": scene_size(scene),
+            "targets": targets,
+            "masks": masks,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha1(description.encode("utf8")).hexdigest()
+
+
+def _read_label_image(path: str, key: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    try:
+        with np.load(path) as cached:
+            if str(cached["key"]) == key:
+                return cached["labels"], cached["bounds"]
+    except (OSError, ValueError, KeyError):
+        pass  # Missing or damaged, it is rebuilt
+    return None
+
+
+def load_label_image(scene: Dict) -> Tuple[np.ndarray, np.ndarray, bool]:
+    """Returns the scene's label image, its target bounds and whether it had to be built
+
+    The cached image is used unless the targets, the scene's size or a mask changed
+    since it was built. A rebuilt image is cached again, when the directory allows.
+    """
+    path = label_image_path(scene)
+    key = _label_key(scene)
+    cached = _read_label_image(path, key)
+    if cached is not None:
+        return (*cached, False)
+
+    labels, bounds = build_label_image(scene)
+    # Written under a temporary name so other processes never read half a file
+    temporary_path = f"{path}.{os.getpid()}.npz"
+    try:
+        np.savez_compressed(
+            temporary_path, labels=labels, bounds=bounds, key=np.array(key)
+        )
+        os.replace(temporary_path, path)
+    except OSError:
+        pass  # Built again next time
+    return labels, bounds, True
+
+
+def _update_label_image(scene: Dict) -> bool:
+    return load_label_image(scene)[2]
+
+
+def update_label_images(scenes: Sequence[Dict], workers: Optional[int] = None) -> Dict:
+    """Builds the label images of the catalog that are missing or out of date
+
+    Returns how many were built and how many were already up to date.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        built = sum(executor.map(_update_label_image, scenes))
+    return {"built": built, "cached": len(scenes) - built}
+
+
+class TargetArea:
+    """One target of a TargetMap, hit tested like a rect, see FixationDwell"""
+
+    def __init__(self, target_map: "TargetMap", index: int):
+        self._target_map = target_map
+        self._index = index
+
+    def collidepoint(self, point: Tuple) -> bool:
+        return self._target_map.target_at(point) == self._index
+
+
+class TargetMap:
+    """Finds the scene target under draw surface positions, one lookup per position
+
+    Positions are mapped to scene image pixels and looked up in the scene's label
+    image, so the cost does not depend on the number or the shape of the targets. The
+    label image may be smaller than the scene, see label_size.
+    """
+
+    def __init__(
+        self,
+        names: Sequence[str],
+        labels: np.ndarray,
+        bounds: np.ndarray,
+        transforms: CoordinateTransforms,
+    ):
+        self._names = list(names)
+        self._labels = labels
+        self._bounds = bounds
+        self._transforms = transforms
+        scene_width, scene_height = transforms.size(Space.SCENE)
+        # Label pixels per scene pixel
+        self._scale = (labels.shape[1] / scene_width, labels.shape[0] / scene_height)
+        self._areas = [TargetArea(self, index) for index in range(len(self._names))]
+
+    @classmethod
+    def for_scene(cls, scene: Dict, transforms: CoordinateTransforms) -> "TargetMap":
+        """The scene's targets, `transforms` having its SCENE space"""
+        labels, bounds, _ = load_label_image(scene)
+        names = [target["name"] for target in scene_targets(scene)]
+        return cls(names, labels, bounds, transforms)
+
+    @property
+    def names(self) -> List[str]:
+        return self._names
+
+    def area(self, index: int) -> TargetArea:
+        return self._areas[index]
+
+    def set_transforms(self, transforms: CoordinateTransforms):
+        """Follows the scene view of `transforms`, e.g. after a zoom"""
+        self._transforms = transforms
+
+    def lookup(self, xpos: np.ndarray, ypos: np.ndarray) -> np.ndarray:
+        """The target index under each position, NO_TARGET where there is none"""
+        columns, rows = self._transforms.xy(
+            np.asarray(xpos, dtype=np.float64),
+            np.asarray(ypos, dtype=np.float64),
+            Space.SURFACE,
+            Space.SCENE,
+        )
+        columns = columns * self._scale[0]
+        rows = rows * self._scale[1]
+        height, width = self._labels.shape
+        # NaN positions, like dropouts, fail every comparison and land outside
+        inside = (columns >= 0) & (columns < width) & (rows >= 0) & (rows < height)
+        targets = np.zeros(len(inside), dtype=np.int16)
+        targets[inside] = self._labels[
+            rows[inside].astype(np.intp), columns[inside].astype(np.intp)
+        ]
+        # Labels are the target index plus one, 0 outside of every target
+        return targets - 1
+
+    def target_at(self, point: Tuple) -> int:
+        column, row = self._transforms.point(point, Space.SURFACE, Space.SCENE)
+        column *= self._scale[0]
+        row *= self._scale[1]
+        height, width = self._labels.shape
+        if not (0 <= column < width and 0 <= row < height):
+            return NO_TARGET
+        return int(self._labels[int(row), int(column)]) - 1
+
+    def bounds(self, index: int) -> Optional[pygame.rect.Rect]:
+        """The scene image rect around a target, None if none of it is visible"""
+        left, top, width, height = self._bounds[index].tolist()
+        if width == 0:
+            return None
+        return pygame.rect.Rect(left, top, width, height)
@@ -0,0 +1,60 @@
+import functools
+from typing import Optional, Tuple
+
+import pygame
+import pygame.freetype
+
+TEXT_CACHE_SIZE = 256
+
+
+def render_text(
+    font: pygame.freetype.Font,
+    text: str,
+    color: Tuple,
+    outline_color: Optional[Tuple] = None,
+    outline_size: int = 0,
+) -> pygame.surface.Surface:
+    """Renders text, optionally outlined, reusing earlier renders of the same text
+
+    The returned surface is shared with every other caller asking for the same text, so it
+    must not be drawn on.
+    """
+    if outline_color is None:
+        outline_size = 0
+    return _render_text(
+        font,
+        text,
+        tuple(color),
+        tuple(outline_color) if outline_size > 0 else None,
+        int(round(outline_size)),
+    )
+
+
+def text_cache_info():
+    """Hits, misses and size of the rendered text cache"""
+    return _render_text.cache_info()
+
+
+@functools.lru_cache(maxsize=TEXT_CACHE_SIZE)
+def _render_text(font, text, color, outline_color, outline_size):
+    text_surface, _ = font.render(text, color, None)
+    if outline_size <= 0:
+        return text_surface
+
+    # Dilating the glyph coverage by a disc draws the whole outline in one pass
+    outline_mask = pygame.mask.from_surface(text_surface).convolve(
+        _disc_mask(outline_size)
+    )
+    surface = outline_mask.to_surface(setcolor=outline_color, unsetcolor=(0, 0, 0, 0))
+    surface.blit(text_surface, (outline_size, outline_size))
+    return surface
+
+
+@functools.lru_cache(maxsize=None)
+def _disc_mask(radius: int) -> pygame.mask.Mask:
+    disc = pygame.mask.Mask((2 * radius + 1, 2 * radius + 1))
+    for x in range(2 * radius + 1):
+        for y in range(2 * radius + 1):
+            if (x - radius) ** 2 + (y - radius) ** 2 <= radius * (radius + 1):
+                disc.set_at((x, y))
+    return disc
@@ -0,0 +1,103 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import hashlib
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import pygame
+
+from game.scene_pyramid import ScenePyramid, load_overview
+from game.scenes import scene_image_path
+
+logger = logging.getLogger(__name__)
+
+
+class ThumbnailCache:
+    """Builds scene thumbnails once and keeps them on disk
+
+    Thumbnails are stored under `cache_dir`, named after a hash of the image's path,
+    modification time and size and of the thumbnail size, so an edited or replaced image
+    gets a new thumbnail. They are scaled from the scene's pyramid, never from the whole
+    image, on a small pool of worker threads.
+    """
+
+    CACHE_DIR = "data/cache/thumbnails"
+    MAX_WORKERS = 2
+
+    def __init__(self, size: Tuple, cache_dir: str = CACHE_DIR):
+        self._size = tuple(size)
+        self._cache_dir = cache_dir
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.MAX_WORKERS, thread_name_prefix="thumbnails"
+        )
+        self._pending: Dict[str, Future] = {}
+        # Images that could not be loaded, not tried again
+        self._failed = set()
+        self._lock = threading.Lock()
+
+    def cache_path(self, path: str) -> str:
+        stat = os.stat(path)
+        key = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{self._size}"
+        digest = hashlib.sha1(key.encode("utf8")).hexdigest()
+        return os.path.join(self._cache_dir, f"{digest}.png")
+
+    def load(self, scene: Dict) -> pygame.surface.Surface:
+        """Loads the thumbnail of a scene, building and caching it if needed"""
+        path = scene_image_path(scene)
+        cache_path = self.cache_path(path)
+        if os.path.exists(cache_path):
+            try:
+                return pygame.image.load(cache_path)
+            except pygame.error:
+                pass  # A damaged cache entry is simply rebuilt
+
+        thumbnail = load_overview(ScenePyramid.build_async(scene).result(), self._size)
+        os.makedirs(self._cache_dir, exist_ok=True)
+        # Written under a temporary name so other processes never read half a file
+        temporary_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.png"
+        pygame.image.save(thumbnail, temporary_path)
+        os.replace(temporary_path, cache_path)
+        return thumbnail
+
+    def request(self, scene: Dict) -> Optional[Future]:
+        """Starts loading a thumbnail in the background, if it is not already loading
+
+        Returns None for an image that failed to load before. The other methods take the
+        scene's image path.
+        """
+        path = scene_image_path(scene)
+        with self._lock:
+            if path in self._failed:
+                return None
+            future = self._pending.get(path)
+            if future is None or future.cancelled():
+                future = self._executor.submit(self.load, scene)
+                self._pending[path] = future
+            return future
+
+    def poll(self, path: str) -> Optional[pygame.surface.Surface]:
+        """Returns a requested thumbnail once it is ready, and None until then
+
+        A thumbnail is handed out once. An image that cannot be loaded, e.g. a missing
+        or corrupt one, is logged and stays None, it is called from the frame loop.
+        """
+        with self._lock:
+            future = self._pending.get(path)
+            if future is None or not future.done():
+                return None
+            del self._pending[path]
+            error = future.exception()
+            if error is not None:
+                self._failed.add(path)
+        if error is not None:
+            logger.warning("no thumbnail for %s: %s", path, error)
+            return None
+        return future.result()
+
+    def cancel(self, path: str):
+        """Drops a request that has not started yet"""
+        with self._lock:
+            future = self._pending.get(path)
+            if future is not None and future.cancel():
+                del self._pending[path]
@@ -1,10 +1,16 @@
 import pygame
 from game.adhawk_control import AdHawkControl
+from game.assets import assets
 from game.level_selector import LevelSelector
+from game.renderer import Renderer
+from game.scene_manager import Screen, scene_manager
 from game.ui import UI
 
 
-class TitleScreen:
+class TitleScreen(Screen):
+
+    name = "title_screen"
+
     def __init__(
         self,
         screen: pygame.surface.Surface,
@@ -12,15 +18,13 @@ class TitleScreen:
         cursor: pygame.surface.Surface,
         adhawk_control: AdHawkControl,
     ):
-        self._running = True
         self._screen = screen
         self._draw_surface = draw_surface
-        self._bg = pygame.transform.scale(
-            pygame.image.load("data/title_screen/bg.png"), draw_surface.get_size()
-        )
+        self._bg = assets.image("data/title_screen/bg.png", draw_surface.get_size())
         self._cursor = cursor
-        self._clock = pygame.time.Clock()
-        self._ui = UI(self._screen, self._draw_surface, self._clock)
+        self._renderer = Renderer(self._screen, self._draw_surface)
+        self._renderer.set_background(self._bg, adhawk_control.get_overlay())
+        self._ui = UI(self._screen, self._draw_surface, self._renderer)
         play_button = self._ui.create_button("Play", (750, 400), (300, 100))
         quit_button = self._ui.create_button("Quit", (750, 525), (300, 100))
 
@@ -29,47 +33,42 @@ class TitleScreen:
 
         self._adhawk_control = adhawk_control
         self._ui.set_cursor(cursor)
+        # Built on first use and kept, so going back to it is instant
+        self._level_selector = None
 
-    def run(self):
-        self._running = True
-
-        while self._running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT or (
-                    event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE
-                ):
-                    self._running = False
-                    break
-                else:
-                    self._ui.handle_event(event)
-
-            self._draw_surface.blit(self._bg, (0, 0))
+    def enter(self):
+        self._renderer.invalidate()
+        # little hack to make sure cursor goes back to actual pointer position on returning
+        self._ui.handle_event(
+            pygame.event.Event(pygame.MOUSEMOTION, {"pos": pygame.mouse.get_pos()})
+        )
 
-            self._adhawk_control.draw()
-            self._ui.update_screen_tracker(self._adhawk_control.get_coords())
-            self._ui.render()
+    def handle_event(self, event: pygame.event.Event):
+        if event.type == pygame.QUIT or (
+            event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE
+        ):
+            scene_manager.pop()
+        else:
+            self._ui.handle_event(event)
 
-            self._screen.blit(
-                pygame.transform.scale(
-                    self._draw_surface,
-                    (
-                        (
-                            self._screen.get_width(),
-                            self._screen.get_height(),
-                        )
-                    ),
-                ),
-                (0, 0),
-            )
+    def draw(self) -> bool:
+        self._ui.render()
+        return self._renderer.present()
 
-            pygame.display.flip()
-            self._clock.tick(30)
+    def update(self):
+        self._adhawk_control.update()
+        self._ui.update_screen_tracker(
+            self._adhawk_control.get_coords(),
+            self._adhawk_control.get_fixations(),
+            self._adhawk_control.get_timestamp(),
+        )
 
     def _start_game(self, _):
-        level_selector = LevelSelector(self._screen, self._draw_surface, self._cursor, self._adhawk_control)
-        level_selector.run()
-        self._ui.handle_event(pygame.event.Event(pygame.MOUSEMOTION, {"pos": pygame.mouse.get_pos()}))
-
+        if self._level_selector is None:
+            self._level_selector = LevelSelector(
+                self._screen, self._draw_surface, self._cursor, self._adhawk_control
+            )
+        scene_manager.push(self._level_selector)
 
     def _quit_game(self, _):
-        self._running = False
+        scene_manager.pop()
@@ -0,0 +1,148 @@
+import enum
+import functools
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pygame
+
+
+class Space(enum.Enum):
+    """The coordinate spaces positions move between, each covering the whole screen"""
+
+    # 0..1 across the screen, as the headset reports the gaze
+    NORMALISED = "normalised"
+    # Pixels of the display, as pygame reports the mouse
+    SCREEN = "screen"
+    # Pixels of the draw surface the screens are laid out on
+    SURFACE = "surface"
+    # Pixels of the scene image, the part of it in view is stretched over the screen
+    SCENE = "scene"
+
+
+class CoordinateTransforms:
+    """Affine transforms between the coordinate spaces of the display
+
+    Each space is mapped to NORMALISED by a 3x3 matrix, and the matrices between every
+    pair of spaces are composed once, up front, so a transform is one matrix product for
+    a whole batch of positions. The SCENE space is there once a scene size is given, see
+    `with_scene`, with the whole scene in view unless a `scene_view` rect of it is.
+    """
+
+    def __init__(
+        self,
+        screen_size: Tuple,
+        surface_size: Tuple,
+        scene_size: Optional[Tuple] = None,
+        scene_view: Optional[Tuple] = None,
+    ):
+        sizes = {
+            Space.NORMALISED: (1, 1),
+            Space.SCREEN: screen_size,
+            Space.SURFACE: surface_size,
+        }
+        if scene_size is not None:
+            sizes[Space.SCENE] = scene_size
+        self._sizes = {space: tuple(size) for space, size in sizes.items()}
+
+        to_normalised = {
+            space: np.diag([1 / size[0], 1 / size[1], 1.0])
+            for space, size in self._sizes.items()
+        }
+        self._scene_view = None
+        if scene_size is not None:
+            self._scene_view = (
+                (0, 0, *self._sizes[Space.SCENE])
+                if scene_view is None
+                else tuple(scene_view)
+            )
+            left, top, width, height = self._scene_view
+            to_normalised[Space.SCENE] = np.array(
+                [
+                    [1 / width, 0, -left / width],
+                    [0, 1 / height, -top / height],
+                    [0, 0, 1.0],
+                ]
+            )
+        self._matrices: Dict[Tuple[Space, Space], np.ndarray] = {}
+        # The same matrices as plain floats, for single points without numpy overhead
+        self._affine: Dict[Tuple[Space, Space], Tuple] = {}
+        for source, source_matrix in to_normalised.items():
+            for target, target_matrix in to_normalised.items():
+                matrix = np.linalg.inv(target_matrix) @ source_matrix
+                matrix.flags.writeable = False
+                self._matrices[source, target] = matrix
+                self._affine[source, target] = tuple(matrix[:2].ravel().tolist())
+
+    def size(self, space: Space) -> Tuple:
+        return self._sizes[space]
+
+    @property
+    def scene_view(self) -> Optional[Tuple]:
+        """The (x, y, width, height) of the scene in view, in scene pixels"""
+        return self._scene_view
+
+    def with_scene(
+        self, scene_size: Tuple, scene_view: Optional[Tuple] = None
+    ) -> "CoordinateTransforms":
+        """The same transforms, plus SCENE for a scene image `scene_size` big
+
+        `scene_view` is the part of the scene in view, all of it by default.
+        """
+        if scene_view is None:
+            return display_transforms(
+                self._sizes[Space.SCREEN], self._sizes[Space.SURFACE], tuple(scene_size)
+            )
+        # Views change with every pan and zoom, they are not worth caching
+        return CoordinateTransforms(
+            self._sizes[Space.SCREEN],
+            self._sizes[Space.SURFACE],
+            scene_size,
+            scene_view,
+        )
+
+    def matrix(self, source: Space, target: Space) -> np.ndarray:
+        """The read only 3x3 matrix taking positions from source to target"""
+        return self._matrices[source, target]
+
+    def points(self, points: np.ndarray, source: Space, target: Space) -> np.ndarray:
+        """Transforms an (N, 2) array of positions"""
+        matrix = self._matrices[source, target]
+        return np.asarray(points, dtype=np.float64) @ matrix[:2, :2].T + matrix[:2, 2]
+
+    def xy(
+        self, xpos: np.ndarray, ypos: np.ndarray, source: Space, target: Space
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Transforms positions held as separate x and y arrays, like record fields"""
+        a, b, c, d, e, f = self._affine[source, target]
+        return (a * xpos + b * ypos + c, d * xpos + e * ypos + f)
+
+    def point(self, point: Tuple, source: Space, target: Space) -> Tuple:
+        a, b, c, d, e, f = self._affine[source, target]
+        return (a * point[0] + b * point[1] + c, d * point[0] + e * point[1] + f)
+
+    def rect(self, rect, source: Space, target: Space) -> pygame.rect.Rect:
+        """The rect covering `rect`, anything pygame takes as a rect, in target"""
+        rect = pygame.rect.Rect(rect)
+        corners = self.points(
+            [rect.topleft, rect.bottomright, rect.topright, rect.bottomleft],
+            source,
+            target,
+        )
+        left, top = np.round(corners.min(axis=0)).astype(int).tolist()
+        right, bottom = np.round(corners.max(axis=0)).astype(int).tolist()
+        return pygame.rect.Rect(left, top, max(1, right - left), max(1, bottom - top))
+
+
+@functools.lru_cache(maxsize=64)
+def display_transforms(
+    screen_size: Tuple, surface_size: Tuple, scene_size: Optional[Tuple] = None
+) -> CoordinateTransforms:
+    """The shared transforms for a display, built once per set of sizes"""
+    return CoordinateTransforms(screen_size, surface_size, scene_size)
+
+
+def surface_transforms(
+    screen: pygame.surface.Surface, draw_surface: pygame.surface.Surface
+) -> CoordinateTransforms:
+    """The transforms between `screen`, `draw_surface` and the normalised space"""
+    return display_transforms(screen.get_size(), draw_surface.get_size())
@@ -1,22 +1,47 @@
-from typing import Optional, Tuple
+import threading
+from typing import Optional, Sequence, Tuple
 
 import pygame
 
-from game.screen_tools import point_screen_to_surface
+from game.fixation import Fixation
+from game.renderer import Renderer
+from game.spatial_grid import SpatialGrid
+from game.transforms import Space, surface_transforms
 
 from .button import Button
 
+# Posted when the logic thread completes a dwell, so the click runs on the main thread
+DWELL_CLICK = pygame.event.custom_type()
+
 
 class UI:
-    def __init__(self, screen: pygame.surface.Surface, surface: pygame.surface.Surface, clock: pygame.time.Clock):
+    """Buttons and cursor of a screen
+
+    The gaze is handled by the logic thread and everything else by the main thread, so
+    the UI's state is guarded by a lock and dwell clicks are posted as DWELL_CLICK events
+    that handle_event turns into button clicks.
+    """
+
+    def __init__(
+        self,
+        screen: pygame.surface.Surface,
+        surface: pygame.surface.Surface,
+        renderer: Renderer,
+    ):
         self._screen = screen
         self._draw_surface = surface
+        self._transforms = surface_transforms(screen, surface)
         self._buttons = []
+        # Only visible buttons are indexed, hidden ones never receive input
+        self._button_grid = SpatialGrid()
+        self._dwelling_buttons = []
+        self._pressed_button = None
         self._mouse_position = (0, 0)
         self._tracker_position = (0, 0)
         self._cursor = None
-        self._clock = clock
+        self._renderer = renderer
         self._use_tracker = True
+        self._lock = threading.RLock()
 
     def create_button(
         self,
@@ -30,46 +55,115 @@ class UI:
         new_button = Button(
             self._screen,
             self._draw_surface,
-            self._clock,
+            self._renderer,
             text,
             position,
             size,
             image,
             visible,
             font_size,
+            self._lock,
         )
-        self._buttons.append(new_button)
+        with self._lock:
+            order = len(self._buttons)
+            self._buttons.append(new_button)
+            new_button.visibility_changed.add_callback(
+                lambda visible, button=new_button, order=order: (
+                    self._button_visibility_changed(button, order, visible)
+                )
+            )
+            if visible:
+                self._button_grid.insert(new_button, new_button.get_rect(), order)
         return new_button
 
+    def _button_visibility_changed(self, button: Button, order: int, visible: bool):
+        # Called by Button.set_visible with the lock held
+        if visible:
+            self._button_grid.insert(button, button.get_rect(), order)
+            button.set_mouse_position(self._mouse_position)
+        else:
+            self._button_grid.remove(button)
+            if button is self._pressed_button:
+                self._pressed_button = None
+
     def set_cursor(self, cursor: pygame.surface.Surface):
         self._cursor = cursor
-        self._mouse_position = point_screen_to_surface(
-            pygame.mouse.get_pos(), self._screen, self._draw_surface
+        self._mouse_position = self._transforms.point(
+            pygame.mouse.get_pos(), Space.SCREEN, Space.SURFACE
         )
 
     def handle_event(self, event: pygame.event.Event):
-        if event.type == pygame.MOUSEMOTION:
-            self._mouse_position = point_screen_to_surface(
-                event.pos, self._screen, self._draw_surface
+        """Passes mouse events to the buttons they concern
+
+        Those are the buttons the pointer leaves or enters, and the one it presses.
+        """
+        if event.type == DWELL_CLICK:
+            if event.ui is self:
+                event.target.button_clicked.Notify(event.position)
+        elif event.type == pygame.MOUSEMOTION:
+            left = self._button_grid.query(self._mouse_position)
+            self._mouse_position = self._transforms.point(
+                event.pos, Space.SCREEN, Space.SURFACE
             )
-        for button in self._buttons:
-            button.handle_event(event)
+            entered = self._button_grid.query(self._mouse_position)
+            if left is not None:
+                left.handle_event(event)
+            if entered is not None and entered is not left:
+                entered.handle_event(event)
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            self._pressed_button = self._button_grid.query(self._mouse_position)
+            if self._pressed_button is not None:
+                self._pressed_button.handle_event(event)
+        elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+            pressed = self._pressed_button
+            self._pressed_button = None
+            if pressed is not None:
+                pressed.handle_event(event)
+
+    def update_screen_tracker(
+        self,
+        position: Tuple,
+        fixations: Sequence[Fixation],
+        timestamp: Optional[float],
+    ):
+        """Moves the gaze cursor to `position` and lets the buttons dwell on `fixations`
 
-    def update_screen_tracker(self, position):
-        self._tracker_position = position
-        for button in self._buttons:
-            button.update_screen_tracker(position)
+        `fixations` are the fixations since the previous frame, in draw surface
+        coordinates like `position`, and `timestamp` the time of the latest gaze sample,
+        which the dwell times follow. Only the buttons under the
+        fixations and the ones already being dwelt on are updated. Runs on the logic
+        thread.
+        """
+        with self._lock:
+            self._tracker_position = position
+            buttons = list(self._dwelling_buttons)
+            for fixation in fixations:
+                button = self._button_grid.query(fixation.center)
+                if button is not None and button not in buttons:
+                    buttons.append(button)
+            for button in buttons:
+                click_position = button.update_screen_tracker(fixations, timestamp)
+                if click_position is not None:
+                    pygame.event.post(
+                        pygame.event.Event(
+                            DWELL_CLICK, ui=self, target=button, position=click_position
+                        )
+                    )
+            self._dwelling_buttons = [
+                button for button in buttons if button.get_dwelling()
+            ]
 
 
     def render(self):
-        for button in self._buttons:
-            button.draw()
-
-        if self._cursor:
-            if self._use_tracker:
-                tracker_rect = self._cursor.get_rect(center=self._tracker_position)
-                self._draw_surface.blit(self._cursor, tracker_rect)
-            else:
-                cursor_rect = self._cursor.get_rect(center=self._mouse_position)
-                self._draw_surface.blit(self._cursor, cursor_rect)
+        with self._lock:
+            for button in self._buttons:
+                button.draw()
+
+            if self._cursor:
+                if self._use_tracker:
+                    tracker_rect = self._cursor.get_rect(center=self._tracker_position)
+                    self._renderer.blit(self._cursor, tracker_rect)
+                else:
+                    cursor_rect = self._cursor.get_rect(center=self._mouse_position)
+                    self._renderer.blit(self._cursor, cursor_rect)
 
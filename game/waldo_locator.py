@@ -0,0 +1,199 @@
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from game.scene_catalog import PLACEHOLDER_LOCATION
+from game.scenes import scene_image_path
+
+# Templates are not downsampled below this many pixels on their shorter side
+MIN_TEMPLATE_SIZE = 12
+
+
+def is_annotated(scene: Dict) -> bool:
+    return scene.get("waldo_location", PLACEHOLDER_LOCATION) != PLACEHOLDER_LOCATION
+
+
+def load_image(path: str) -> np.ndarray:
+    """Reads an image in grayscale, which is what the matching works on"""
+    image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError(f"cannot read image {path}")
+    return image
+
+
+def annotated_crop(scene: Dict) -> np.ndarray:
+    """Cuts Waldo out of an annotated scene, to be used as a template"""
+    image = load_image(scene_image_path(scene))
+    location = scene["waldo_location"]
+    left, top = max(0, location["x"]), max(0, location["y"])
+    right = location["x"] + location["width"]
+    bottom = location["y"] + location["height"]
+    return image[top:bottom, left:right].copy()
+
+
+def rotated(template: np.ndarray, angle: float) -> np.ndarray:
+    """Rotates a template by `angle` degrees around its center, keeping its size
+
+    The corners that come from outside of the template repeat its border, which
+    matches better than a flat colour would.
+    """
+    if angle == 0:
+        return template
+    height, width = template.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(
+        template, matrix, (width, height), borderMode=cv2.BORDER_REPLICATE
+    )
+
+
+def template_variants(
+    templates: Iterable[np.ndarray], scales: Sequence[float], angles: Sequence[float]
+) -> List[Dict]:
+    """Every template at every scale and angle"""
+    variants = []
+    for index, template in enumerate(templates):
+        for scale in scales:
+            size = (
+                max(1, int(round(template.shape[1] * scale))),
+                max(1, int(round(template.shape[0] * scale))),
+            )
+            interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+            resized = cv2.resize(template, size, interpolation=interpolation)
+            for angle in angles:
+                variants.append(
+                    {
+                        "template": index,
+                        "scale": scale,
+                        "angle": angle,
+                        "pixels": rotated(resized, angle),
+                    }
+                )
+    return variants
+
+
+def _peaks(scores: np.ndarray, count: int, spacing: Tuple) -> List[Tuple]:
+    """The `count` best scores, at least `spacing` (width, height) apart
+
+    Returns (score, x, y) tuples, best first.
+    """
+    scores = scores.copy()
+    peaks = []
+    for _ in range(count):
+        _, best, _, (xpos, ypos) = cv2.minMaxLoc(scores)
+        if not np.isfinite(best) or best <= -1:
+            break
+        peaks.append((best, xpos, ypos))
+        scores[
+            max(0, ypos - spacing[1]) : ypos + spacing[1] + 1,
+            max(0, xpos - spacing[0]) : xpos + spacing[0] + 1,
+        ] = -1
+    return peaks
+
+
+def _overlap(first: Dict, second: Dict) -> float:
+    """Intersection over union of two rects"""
+    width = min(first["x"] + first["width"], second["x"] + second["width"]) - max(
+        first["x"], second["x"]
+    )
+    height = min(first["y"] + first["height"], second["y"] + second["height"]) - max(
+        first["y"], second["y"]
+    )
+    if width <= 0 or height <= 0:
+        return 0.0
+    intersection = width * height
+    union = (
+        first["width"] * first["height"]
+        + second["width"] * second["height"]
+        - intersection
+    )
+    return intersection / union
+
+
+def locate(
+    image: np.ndarray,
+    variants: List[Dict],
+    levels: int = 2,
+    candidates: int = 5,
+    coarse_peaks: int = 8,
+) -> List[Dict]:
+    """Finds the rects of `image` that look most like one of the template variants
+
+    The image and the templates are first matched at 1 / 2 ** `levels` of their size,
+    or less deep for templates that would get smaller than MIN_TEMPLATE_SIZE. Only the
+    `coarse_peaks` best places of each variant are then matched again at full size, in
+    a window around them a few coarse pixels wide, which is where nearly all of the
+    time would otherwise go.
+
+    Returns up to `candidates` rects in image pixels, with the normalised correlation
+    of their best match as `score`, best first and not overlapping each other by more
+    than half.
+    """
+    pyramid = [image]
+    for _ in range(levels):
+        pyramid.append(cv2.pyrDown(pyramid[-1]))
+
+    found = []
+    for variant in variants:
+        template = variant["pixels"]
+        height, width = template.shape
+        if height > image.shape[0] or width > image.shape[1]:
+            continue
+        level = 0
+        while level < levels and min(height, width) >> (level + 1) >= MIN_TEMPLATE_SIZE:
+            level += 1
+        coarse_template = template
+        for _ in range(level):
+            coarse_template = cv2.pyrDown(coarse_template)
+        coarse = cv2.matchTemplate(
+            pyramid[level], coarse_template, cv2.TM_CCOEFF_NORMED
+        )
+        spacing = (coarse_template.shape[1] // 2, coarse_template.shape[0] // 2)
+
+        factor = 1 << level
+        margin = 2 * factor
+        for _, coarse_x, coarse_y in _peaks(coarse, coarse_peaks, spacing):
+            left = max(0, coarse_x * factor - margin)
+            top = max(0, coarse_y * factor - margin)
+            right = min(image.shape[1], coarse_x * factor + width + margin)
+            bottom = min(image.shape[0], coarse_y * factor + height + margin)
+            if right - left < width or bottom - top < height:
+                continue
+            fine = cv2.matchTemplate(
+                image[top:bottom, left:right], template, cv2.TM_CCOEFF_NORMED
+            )
+            _, score, _, (xpos, ypos) = cv2.minMaxLoc(fine)
+            if not np.isfinite(score):
+                continue
+            found.append(
+                {
+                    "x": left + xpos,
+                    "y": top + ypos,
+                    "width": width,
+                    "height": height,
+                    "score": float(score),
+                    "template": variant["template"],
+                    "scale": variant["scale"],
+                    "angle": variant["angle"],
+                }
+            )
+
+    found.sort(key=lambda candidate: candidate["score"], reverse=True)
+    best: List[Dict] = []
+    for candidate in found:
+        if all(_overlap(candidate, kept) <= 0.5 for kept in best):
+            best.append(candidate)
+            if len(best) == candidates:
+                break
+    return best
+
+
+def to_location(candidate: Dict) -> Dict:
+    """A candidate as a rect like `waldo_location`, with its score"""
+    return {
+        "x": candidate["x"],
+        "y": candidate["y"],
+        "width": candidate["width"],
+        "height": candidate["height"],
+        "score": round(candidate["score"], 4),
+    }
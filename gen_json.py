@@ -1,13 +1,60 @@
+"""Updates the scene catalog from the images in the scenes directory.
+
+Only new and changed images are inspected, on a pool of worker processes, and the
+annotations of every scene, like its `waldo_location`, are kept. New scenes get a
+placeholder location to be annotated. The catalog is replaced in one step, so the game
+never reads half of it, and left alone when nothing in it changed. The label images the
+game hit tests the scenes' targets with (see game.targets) are then brought up to date
+next to the scenes, and the tiled pyramids it zooms into the scenes from (see
+game.scene_pyramid) are built for the new images:
+
+    python gen_json.py --directory data/scenes
+"""
+import argparse
 import json
-import pathlib
+import os
+
+from game.scene_catalog import (
+    load_stats,
+    update_catalog,
+    write_catalog,
+    write_stats,
+)
+from game.scenes import SCENES_FILE, load_scenes
+from game.scene_pyramid import update_pyramids
+from game.targets import update_label_images
+
 
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--directory",
+        default=os.path.dirname(SCENES_FILE),
+        help="directory searched for scene images (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--catalog",
+        default=SCENES_FILE,
+        help="catalog to update (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="worker processes (default: one per CPU)"
+    )
+    return parser.parse_args()
 
-scenes = []
-for file in pathlib.Path('data/scenes').glob('*'):
-    if file.suffix in ['.png', '.jpg']:
-        scenes.append({"filename": str(file), "waldo_location": {"x": 0, "y": 0, "width": 10, "height": 10}})
 
+def main():
+    args = parse_args()
+    scenes = load_scenes(args.catalog) if os.path.exists(args.catalog) else []
+    stats = load_stats()
+    catalog, counts = update_catalog(scenes, args.directory, args.workers, stats)
+    if catalog != scenes:
+        write_catalog(catalog, args.catalog)
+    write_stats(stats)
+    counts["label_images"] = update_label_images(catalog, args.workers)
+    counts["pyramids"] = update_pyramids(catalog, args.workers)
+    print(json.dumps(counts))
 
-with open('data/scenes/scenes.json', 'w', encoding='utf-8') as f:
-    f.write(json.dumps(scenes, ensure_ascii=False, indent="  "))
 
+if __name__ == "__main__":
+    main()
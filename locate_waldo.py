@@ -0,0 +1,158 @@
+"""Finds Waldo in the catalog's scenes by template matching.
+
+Matches crops of Waldo at several scales, and optionally angles, against every scene
+that still has a placeholder location (see game.waldo_locator.locate), on a pool of
+worker processes. The best matches are written to each scene's `waldo_candidates` in
+the catalog, with their score, for someone to review and copy to `waldo_location`:
+
+    python locate_waldo.py crops/waldo*.png --from-annotations --angles -10 0 10
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import sys
+
+import cv2
+import numpy as np
+
+from game.scenes import SCENES_FILE, load_scenes, scene_image_path
+from game.scene_catalog import write_catalog
+from game.waldo_locator import (
+    annotated_crop,
+    is_annotated,
+    load_image,
+    locate,
+    template_variants,
+    to_location,
+)
+
+# Set in each worker process by _start_worker
+_variants = []
+_options = {}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("templates", nargs="*", help="images of Waldo, cropped tight")
+    parser.add_argument(
+        "--from-annotations",
+        action="store_true",
+        help="also use Waldo as cut out of every annotated scene",
+    )
+    parser.add_argument(
+        "--catalog",
+        default=SCENES_FILE,
+        help="catalog to update (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="also search the annotated scenes, to check how well matching does",
+    )
+    parser.add_argument("--min-scale", type=float, default=0.5)
+    parser.add_argument("--max-scale", type=float, default=2.0)
+    parser.add_argument(
+        "--scale-steps",
+        type=int,
+        default=9,
+        help="scales tried, spaced evenly by ratio (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--angles",
+        type=float,
+        nargs="+",
+        default=[0.0],
+        help="rotations tried, in degrees (default: 0)",
+    )
+    parser.add_argument(
+        "--levels",
+        type=int,
+        default=2,
+        help="pyramid levels the coarse search is made at (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=5,
+        help="candidates kept per scene (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="worker processes (default: one per CPU)"
+    )
+    return parser.parse_args()
+
+
+def _start_worker(variants, options):
+    # One process per core already, OpenCV's own threads would only compete
+    cv2.setNumThreads(1)
+    _variants[:] = variants
+    _options.update(options)
+
+
+def _locate_scene(job):
+    path, excluded_template = job
+    try:
+        image = load_image(path)
+    except ValueError as error:
+        return {"path": path, "error": str(error)}
+    variants = [
+        variant for variant in _variants if variant["template"] != excluded_template
+    ]
+    candidates = locate(image, variants, **_options)
+    return {"path": path, "candidates": list(map(to_location, candidates))}
+
+
+def main():
+    args = parse_args()
+    scenes = load_scenes(args.catalog)
+
+    templates = [load_image(path) for path in args.templates]
+    # The scene each template was cut out of, so it is not matched against itself
+    sources = [None] * len(templates)
+    if args.from_annotations:
+        for scene in filter(is_annotated, scenes):
+            templates.append(annotated_crop(scene))
+            sources.append(scene_image_path(scene))
+    if not templates:
+        sys.exit("no templates, give crops of Waldo or --from-annotations")
+
+    scales = np.geomspace(args.min_scale, args.max_scale, args.scale_steps)
+    variants = template_variants(templates, scales.tolist(), args.angles)
+    options = {"levels": args.levels, "candidates": args.candidates}
+
+    jobs = []
+    for scene in scenes:
+        if args.all or not is_annotated(scene):
+            path = scene_image_path(scene)
+            jobs.append((path, sources.index(path) if path in sources else None))
+    if not jobs:
+        print("every scene is annotated, use --all to search them anyway")
+        return
+
+    workers = args.workers or os.cpu_count()
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_start_worker, initargs=(variants, options)
+    ) as executor:
+        results = {
+            result["path"]: result for result in executor.map(_locate_scene, jobs)
+        }
+
+    for scene in scenes:
+        result = results.get(scene_image_path(scene))
+        if result is None:
+            continue
+        if "error" in result:
+            print(f"skipped {result['path']}: {result['error']}", file=sys.stderr)
+            continue
+        scene["waldo_candidates"] = result["candidates"]
+        best = result["candidates"][0] if result["candidates"] else None
+        line = {"scene": result["path"], "best": best}
+        if args.all and is_annotated(scene):
+            line["annotated"] = scene["waldo_location"]
+        print(json.dumps(line))
+    write_catalog(scenes, args.catalog)
+
+
+if __name__ == "__main__":
+    main()
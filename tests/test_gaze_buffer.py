@@ -0,0 +1,56 @@
+import math
+
+import numpy as np
+import pytest
+
+from game.gaze_buffer import GazeRingBuffer
+
+
+def test_drain_returns_samples_in_order():
+    buffer = GazeRingBuffer(8)
+    for index in range(5):
+        buffer.push(index, index * 10, index * 20)
+
+    samples = buffer.drain()
+
+    assert samples["timestamp"].tolist() == [0, 1, 2, 3, 4]
+    assert samples["x"].tolist() == [0, 10, 20, 30, 40]
+    assert samples["valid"].all()
+    assert len(buffer.drain()) == 0
+
+
+def test_drain_wraps_around():
+    buffer = GazeRingBuffer(4)
+    for index in range(3):
+        buffer.push(index, 0, 0)
+    buffer.drain()
+    for index in range(3, 6):
+        buffer.push(index, 0, 0)
+
+    assert buffer.drain()["timestamp"].tolist() == [3, 4, 5]
+    assert buffer.dropped == 0
+
+
+def test_overwritten_samples_are_dropped():
+    buffer = GazeRingBuffer(4)
+    for index in range(10):
+        buffer.push(index, 0, 0)
+
+    # The slot after the newest sample is never read, the producer may be writing it
+    assert buffer.drain()["timestamp"].tolist() == [7, 8, 9]
+    assert buffer.dropped == 7
+
+
+def test_nan_samples_are_invalid():
+    buffer = GazeRingBuffer(4)
+    buffer.push(0, math.nan, 1)
+    buffer.push(1, 1, 1)
+
+    assert buffer.drain()["valid"].tolist() == [False, True]
+
+
+def test_capacity_is_checked():
+    with pytest.raises(ValueError):
+        GazeRingBuffer(1)
+    assert GazeRingBuffer(2).capacity == 2
+    assert isinstance(GazeRingBuffer().drain(), np.ndarray)
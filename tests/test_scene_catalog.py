@@ -0,0 +1,102 @@
+import os
+
+import pygame
+import pytest
+
+from game.scene_catalog import PLACEHOLDER_LOCATION, update_catalog
+
+
+def _save_image(path, size, color):
+    image = pygame.surface.Surface(size)
+    image.fill(color)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pygame.image.save(image, path)
+
+
+@pytest.fixture(name="scenes_dir")
+def fixture_scenes_dir(tmp_path, monkeypatch):
+    # Catalog paths are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    _save_image("scenes/a.png", (40, 30), (255, 0, 0))
+    _save_image("scenes/b.png", (20, 10), (0, 255, 0))
+    return "scenes"
+
+
+def _annotated(catalog):
+    for index, scene in enumerate(catalog):
+        scene["waldo_location"] = {"x": index, "y": 1, "width": 2, "height": 3}
+    return {scene["filename"]: scene["waldo_location"] for scene in catalog}
+
+
+def test_new_images_get_placeholders(scenes_dir):
+    catalog, counts = update_catalog([], scenes_dir, workers=1)
+
+    assert [scene["filename"] for scene in catalog] == ["scenes/a.png", "scenes/b.png"]
+    assert [(scene["width"], scene["height"]) for scene in catalog] == [
+        (40, 30),
+        (20, 10),
+    ]
+    assert all(scene["waldo_location"] == PLACEHOLDER_LOCATION for scene in catalog)
+    assert counts["added"] == 2
+
+
+def test_annotations_survive_updates_and_removals(scenes_dir):
+    stats = {}
+    catalog, _ = update_catalog([], scenes_dir, workers=1, stats=stats)
+    locations = _annotated(catalog)
+
+    _save_image("scenes/a.png", (60, 50), (0, 0, 255))
+    os.remove("scenes/b.png")
+    _save_image("scenes/c.png", (10, 10), (255, 255, 0))
+    catalog, counts = update_catalog(catalog, scenes_dir, workers=1, stats=stats)
+
+    assert [scene["filename"] for scene in catalog] == ["scenes/a.png", "scenes/c.png"]
+    assert catalog[0]["waldo_location"] == locations["scenes/a.png"]
+    assert (catalog[0]["width"], catalog[0]["height"]) == (60, 50)
+    assert catalog[1]["waldo_location"] == PLACEHOLDER_LOCATION
+    assert counts == {
+        "added": 1,
+        "updated": 1,
+        "moved": 0,
+        "removed": 1,
+        "unchanged": 0,
+    }
+    assert set(stats) == {"scenes/a.png", "scenes/c.png"}
+
+
+def test_renamed_images_keep_their_entry(scenes_dir):
+    stats = {}
+    catalog, _ = update_catalog([], scenes_dir, workers=1, stats=stats)
+    locations = _annotated(catalog)
+
+    os.makedirs("scenes/moved")
+    os.rename("scenes/b.png", "scenes/moved/renamed.png")
+    catalog, counts = update_catalog(catalog, scenes_dir, workers=1, stats=stats)
+
+    assert [scene["filename"] for scene in catalog] == [
+        "scenes/a.png",
+        "scenes/moved/renamed.png",
+    ]
+    assert catalog[1]["waldo_location"] == locations["scenes/b.png"]
+    assert counts["moved"] == 1
+    assert counts["removed"] == 0
+    assert counts["unchanged"] == 1
+
+
+def test_unchanged_images_keep_their_entries(scenes_dir):
+    stats = {}
+    catalog, _ = update_catalog([], scenes_dir, workers=1, stats=stats)
+
+    again, counts = update_catalog(catalog, scenes_dir, workers=1, stats=stats)
+
+    assert again == catalog
+    assert counts["unchanged"] == 2
+
+
+def test_absolute_directory_keeps_paths_relative(scenes_dir):
+    catalog, _ = update_catalog([], scenes_dir, workers=1)
+
+    again, counts = update_catalog(catalog, os.path.abspath(scenes_dir), workers=1)
+
+    assert again == catalog
+    assert counts["unchanged"] == 2
@@ -0,0 +1,89 @@
+import math
+
+import numpy as np
+import pygame
+
+from game.targets import (
+    MAX_LABEL_PIXELS,
+    NO_TARGET,
+    WALDO,
+    TargetMap,
+    build_label_image,
+    scene_targets,
+)
+from game.transforms import CoordinateTransforms
+
+
+def _scene(width=400, height=200, targets=()):
+    return {
+        "filename": "scenes/test.png",
+        "width": width,
+        "height": height,
+        "waldo_location": {"x": 10, "y": 20, "width": 30, "height": 40},
+        "targets": list(targets),
+    }
+
+
+def _target_map(scene, screen_size=(800, 400)):
+    labels, bounds = build_label_image(scene)
+    names = [target["name"] for target in scene_targets(scene)]
+    transforms = CoordinateTransforms(screen_size, screen_size).with_scene(
+        (scene["width"], scene["height"])
+    )
+    return TargetMap(names, labels, bounds, transforms)
+
+
+def test_rect_and_polygon_targets():
+    scene = _scene(
+        targets=[
+            {"name": "Wenda", "polygon": [[100, 100], [200, 100], [150, 180]]},
+            {"name": "Odlaw", "x": 300, "y": 0, "width": 50, "height": 50},
+        ]
+    )
+    # Twice the scene's size on the draw surface
+    target_map = _target_map(scene)
+
+    assert target_map.target_at((50, 100)) == WALDO
+    assert target_map.target_at((300, 240)) == 1
+    assert target_map.target_at((650, 50)) == 2
+    assert target_map.target_at((300, 390)) == NO_TARGET
+    assert target_map.lookup(
+        np.array([50, 300, 650, math.nan, -5]), np.array([100, 240, 50, 10, 10])
+    ).tolist() == [WALDO, 1, 2, NO_TARGET, NO_TARGET]
+
+
+def test_first_listed_target_wins_overlaps():
+    scene = _scene(
+        targets=[{"name": "Wenda", "x": 0, "y": 0, "width": 100, "height": 100}]
+    )
+    target_map = _target_map(scene)
+
+    assert target_map.target_at((50, 100)) == WALDO
+    assert target_map.target_at((150, 150)) == 1
+
+
+def test_bounds_are_clipped_to_the_scene():
+    scene = _scene(
+        targets=[
+            {"name": "Wenda", "x": 380, "y": 150, "width": 100, "height": 100},
+            {"name": "Odlaw", "x": 500, "y": 0, "width": 10, "height": 10},
+        ]
+    )
+    target_map = _target_map(scene)
+
+    assert target_map.bounds(WALDO) == pygame.rect.Rect(10, 20, 30, 40)
+    assert target_map.bounds(1) == pygame.rect.Rect(380, 150, 20, 50)
+    assert target_map.bounds(2) is None
+
+
+def test_large_scenes_get_smaller_label_images():
+    scene = _scene(width=8000, height=4000)
+
+    labels, bounds = build_label_image(scene)
+
+    assert labels.size <= MAX_LABEL_PIXELS * 1.01
+    assert labels.shape[1] < 8000
+    target_map = _target_map(scene, (1280, 640))
+    # Waldo's middle, at scene pixel (25, 40)
+    assert target_map.target_at((25 * 0.16, 40 * 0.16)) == WALDO
+    assert pygame.rect.Rect(bounds[WALDO].tolist()).contains((10, 20, 30, 40))
@@ -0,0 +1,59 @@
+import numpy as np
+import pygame
+import pytest
+
+from game.transforms import CoordinateTransforms, Space, display_transforms
+
+
+@pytest.fixture(name="transforms")
+def fixture_transforms():
+    return CoordinateTransforms((1920, 1080), (1280, 720), (2560, 1440))
+
+
+def test_point_between_spaces(transforms):
+    assert transforms.point((640, 360), Space.SURFACE, Space.SCREEN) == (960, 540)
+    assert transforms.point((0.5, 0.25), Space.NORMALISED, Space.SCENE) == (1280, 360)
+    assert transforms.point((1920, 0), Space.SCREEN, Space.NORMALISED) == (1, 0)
+
+
+def test_batches_match_single_points(transforms):
+    points = np.array([[0, 0], [100, 50], [1280, 720]])
+
+    moved = transforms.points(points, Space.SURFACE, Space.SCENE)
+    xpos, ypos = transforms.xy(points[:, 0], points[:, 1], Space.SURFACE, Space.SCENE)
+
+    expected = [transforms.point(p, Space.SURFACE, Space.SCENE) for p in points]
+    np.testing.assert_allclose(moved, expected)
+    np.testing.assert_allclose(np.column_stack((xpos, ypos)), expected)
+
+
+def test_round_trip(transforms):
+    points = np.array([[12.5, 700.25], [-3, 1300]])
+
+    there = transforms.points(points, Space.SCREEN, Space.SCENE)
+
+    np.testing.assert_allclose(
+        transforms.points(there, Space.SCENE, Space.SCREEN), points
+    )
+
+
+def test_rect(transforms):
+    rect = transforms.rect((10, 20, 100, 50), Space.SURFACE, Space.SCREEN)
+
+    assert rect == pygame.rect.Rect(15, 30, 150, 75)
+
+
+def test_scene_view(transforms):
+    zoomed = transforms.with_scene((2560, 1440), (640, 360, 1280, 720))
+
+    # The view is stretched over the whole screen
+    assert zoomed.point((0, 0), Space.SURFACE, Space.SCENE) == (640, 360)
+    assert zoomed.point((1280, 720), Space.SURFACE, Space.SCENE) == (1920, 1080)
+    assert zoomed.scene_view == (640, 360, 1280, 720)
+
+
+def test_display_transforms_are_shared():
+    first = display_transforms((1920, 1080), (1280, 720))
+
+    assert display_transforms((1920, 1080), (1280, 720)) is first
+    assert first.with_scene((100, 100)).size(Space.SCENE) == (100, 100)
@@ -1,9 +1,17 @@
-from ctypes import windll
+import argparse
+import sys
 
 import pygame
 
 from game.title_screen import TitleScreen
 from game.adhawk_control import AdHawkControl
+from game.fixation import FIXATION_DETECTORS, create_fixation_detector
+from game.frame_scheduler import FrameScheduler, frame_scheduler
+from game.gaze_filters import FILTERS, create_filter
+from game.gaze_source import ReplayGazeSource, SyntheticGazeSource
+from game.renderer import Renderer
+from game.scene_manager import scene_manager
+from game.session_recorder import session_recorder
 
 
 def generate_cursor() -> pygame.surface.Surface:
@@ -16,7 +24,15 @@ def generate_cursor() -> pygame.surface.Surface:
     return cursor
 
 
+# Assumed where the display cannot be asked, e.g. off Windows
+DEFAULT_DPI = (96, 96)
+
+
 def get_dpi():
+    if sys.platform != "win32":
+        return DEFAULT_DPI
+    from ctypes import windll  # pylint: disable=import-outside-toplevel
+
     LOGPIXELSX = 88
     LOGPIXELSY = 90
     user32 = windll.user32
@@ -29,7 +45,88 @@ def get_dpi():
     return dots_per_inch
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Try to find waldo in the scenes.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument(
+        "--replay",
+        metavar="FILE",
+        help="play back gaze samples from FILE instead of using the headset",
+    )
+    source.add_argument(
+        "--synthetic",
+        action="store_true",
+        help="drive the gaze with a synthetic path instead of using the headset",
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="playback speed of the replayed or synthetic gaze (default: real time)",
+    )
+    parser.add_argument(
+        "--gaze-filter",
+        choices=FILTERS,
+        default="one_euro",
+        help="filter that smooths the gaze (default: one_euro), "
+        "see evaluate_filters.py for their latency and jitter",
+    )
+    parser.add_argument(
+        "--fixation-detector",
+        choices=FIXATION_DETECTORS,
+        default="ivt",
+        help="how fixations are told apart from saccades: velocity (ivt, default) or "
+        "dispersion (idt) threshold",
+    )
+    parser.add_argument(
+        "--full-redraw",
+        action="store_true",
+        help="redraw the whole frame every tick instead of only the dirty rectangles",
+    )
+    parser.add_argument(
+        "--fps",
+        type=float,
+        default=FrameScheduler.FPS,
+        help=f"frame rate cap (default: {FrameScheduler.FPS})",
+    )
+    parser.add_argument(
+        "--idle-fps",
+        type=float,
+        default=FrameScheduler.IDLE_FPS,
+        help="frame rate once nothing has moved on screen for a while "
+        f"(default: {FrameScheduler.IDLE_FPS})",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="DIR",
+        help="record every game to a session file in DIR, see analyze_sessions.py",
+    )
+    parser.add_argument(
+        "--player",
+        default="anonymous",
+        help="name the recorded sessions are filed under (default: anonymous)",
+    )
+    return parser.parse_args()
+
+
+def create_gaze_source(args):
+    if args.replay:
+        return ReplayGazeSource(args.replay, speed=args.speed)
+    if args.synthetic:
+        return SyntheticGazeSource(
+            SyntheticGazeSource.circle(), noise=0.005, speed=args.speed
+        )
+    return None
+
+
 def main():
+    args = parse_args()
+    Renderer.USE_DIRTY_RECTS = not args.full_redraw
+    frame_scheduler.fps = args.fps
+    frame_scheduler.idle_fps = args.idle_fps
+    session_recorder.directory = args.record
+    session_recorder.player = args.player
+
     pygame.init()
     pygame.font.init()
     pygame.mouse.set_visible(False)
@@ -37,15 +134,25 @@ def main():
     screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
     draw_surface = pygame.surface.Surface([1280, 720])
 
-    adhawk_control = AdHawkControl(screen, draw_surface, get_dpi())
+    gaze_source = create_gaze_source(args)
+    # Only the headset needs the screen's physical size
+    adhawk_control = AdHawkControl(
+        screen,
+        draw_surface,
+        get_dpi() if gaze_source is None else DEFAULT_DPI,
+        gaze_source,
+        create_filter(args.gaze_filter),
+        create_fixation_detector(args.fixation_detector),
+    )
 
     try:
         title_screen = TitleScreen(
             screen, draw_surface, generate_cursor(), adhawk_control
         )
-        title_screen.run()
+        scene_manager.run(title_screen)
     finally:
         adhawk_control.shutdown()
+        session_recorder.close()
 
 
 if __name__ == "__main__":